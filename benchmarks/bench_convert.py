@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+変換パイプラインの所要時間比較
+合成クリップに対して、1パス（split）・従来の2パス・分割並列・差分フレームの
+ウォールタイムと出力サイズを計測します。
+
+    python benchmarks/bench_convert.py --duration 20
+    python benchmarks/bench_convert.py --duration 60 --verify
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from dataclasses import replace
+from typing import Callable, Dict, List, Tuple
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(CURRENT_DIR), "source")
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from clips import CLIP_SOURCES, generate_clip  # noqa: E402
+from gif_converter.core.converter import ConversionTask, Converter  # noqa: E402
+from gif_converter.core.gif import frame_delays  # noqa: E402
+
+
+def _convert(task: ConversionTask) -> None:
+    Converter().convert(task)
+
+
+VARIANTS: Dict[str, Callable[[ConversionTask], None]] = {
+    "two_pass": lambda t: _convert(replace(t, single_pass=False)),
+    "single_pass": lambda t: _convert(replace(t, single_pass=True)),
+    "segmented": lambda t: _convert(
+        replace(t, single_pass=False, segments=os.cpu_count() or 4)
+    ),
+    "diff": lambda t: _convert(replace(t, single_pass=True, diff_frames=True)),
+    "decimate": lambda t: _convert(replace(t, single_pass=True, decimate=True)),
+}
+
+# これらの変種は single_pass との差（サイズ・時間）も表示する
+COMPARE_BASE = "single_pass"
+COMPARED = ("diff", "decimate")
+
+
+def frame_hashes(gif: Path) -> List[str]:
+    # デコード後の各フレームのMD5（画素が一致するかの確認用）
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", str(gif), "-f", "framemd5", "-"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return [
+        line.rsplit(",", 1)[-1].strip()
+        for line in out.splitlines()
+        if line and not line.startswith("#")
+    ]
+
+
+def verify_same_frames(a: Path, b: Path) -> List[str]:
+    """フレーム数・表示時間・画素を比較し、相違点を返す（空なら一致）"""
+    problems: List[str] = []
+    da, db = frame_delays(a), frame_delays(b)
+    if len(da) != len(db):
+        problems.append(f"フレーム数 {len(da)} != {len(db)}")
+    elif da != db:
+        diff = sum(1 for x, y in zip(da, db) if x != y)
+        problems.append(f"表示時間が {diff} フレームで不一致")
+    if sum(da) != sum(db):
+        problems.append(f"総再生時間 {sum(da)} != {sum(db)} (1/100秒)")
+    ha, hb = frame_hashes(a), frame_hashes(b)
+    if len(ha) == len(hb) and ha != hb:
+        diff = sum(1 for x, y in zip(ha, hb) if x != y)
+        problems.append(f"画素が {diff} フレームで不一致")
+    return problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--duration", type=float, default=10.0, help="クリップ長（秒）")
+    ap.add_argument("--repeat", type=int, default=3, help="計測回数（最小値を採用）")
+    ap.add_argument("--clips", nargs="*", default=list(CLIP_SOURCES))
+    ap.add_argument("--variants", nargs="*", default=list(VARIANTS))
+    ap.add_argument("--fps", type=int, default=10)
+    ap.add_argument("--width", type=int, default=640)
+    ap.add_argument("--colors", type=int, default=128)
+    ap.add_argument(
+        "--verify",
+        action="store_true",
+        help="分割並列の出力が2パスとフレーム単位で一致するか確認する",
+    )
+    args = ap.parse_args()
+    if args.verify:
+        for name in ("two_pass", "segmented"):
+            if name not in args.variants:
+                args.variants.append(name)
+    failed = False
+
+    with tempfile.TemporaryDirectory(prefix="gifbench_") as td:
+        work = Path(td)
+        print(f"{'clip':<10} {'variant':<12} {'wall(s)':>8} {'size(KB)':>10}")
+        for kind in args.clips:
+            src = generate_clip(kind, work / "clips", args.duration)
+            measured: Dict[str, Tuple[float, int]] = {}
+            for name in args.variants:
+                task = ConversionTask(
+                    input_path=src,
+                    output_dir=work,
+                    fps=args.fps,
+                    width=args.width,
+                    colors=args.colors,
+                    start=0.0,
+                    duration=0.0,
+                    output_path=work / f"{kind}_{name}.gif",
+                    use_palette_cache=False,  # 毎回パレット生成まで計測する
+                )
+                best = float("inf")
+                for _ in range(max(1, args.repeat)):
+                    t0 = time.perf_counter()
+                    VARIANTS[name](task)
+                    best = min(best, time.perf_counter() - t0)
+                size = task.output_path.stat().st_size
+                measured[name] = (best, size)
+                print(f"{kind:<10} {name:<12} {best:>8.2f} {size / 1024:>10.1f}")
+            for name in COMPARED:
+                if name not in measured or COMPARE_BASE not in measured:
+                    continue
+                (t_base, s_base), (t_var, s_var) = measured[COMPARE_BASE], measured[name]
+                print(
+                    f"{kind:<10} {name + '比較':<12} "
+                    f"{(s_base - s_var) / 1024:.1f} KB 削減"
+                    f"（{100.0 * (s_base - s_var) / max(1, s_base):.1f}%）/ "
+                    f"時間 {t_var / t_base:.2f} 倍（{COMPARE_BASE} 比）"
+                )
+            if args.verify:
+                problems = verify_same_frames(
+                    work / f"{kind}_two_pass.gif", work / f"{kind}_segmented.gif"
+                )
+                failed = failed or bool(problems)
+                verdict = "NG: " + ", ".join(problems) if problems else "OK"
+                print(f"{kind:<10} {'verify':<12} {verdict}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+GUI 起動時間のベンチマーク
+別プロセスで GUI を起動し、import（gif_converter.main の読み込み）・最初の描画・
+設定と履歴を読み終えるまで（ready）の時間を計り、予算（BUDGET）を超えたら終了コード1。
+最初の描画の時点で読み込まれていてはいけないモジュール（LAZY_MODULES）も確かめます。
+
+    python benchmarks/bench_startup.py                 # 計測して予算と比較
+    python benchmarks/bench_startup.py --runs 10 --budget-scale 2
+    python benchmarks/bench_startup.py --profile 25    # python -X importtime の上位25件
+
+既定では画面を出さずに計測します（QT_QPA_PLATFORM=offscreen）。実際の画面で計るときは
+--platform "" を指定してください。設定の読み書きは一時フォルダに閉じ込めます。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(CURRENT_DIR), "source")
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+
+METRICS = ("import", "paint", "ready")
+# 子プロセスの開始からの秒数（インタプリタ自体の起動は含まない）
+BUDGET: Dict[str, float] = {
+    "import": 0.25,
+    "paint": 0.50,
+    "ready": 1.00,
+}
+# 最初の描画までに読み込まないモジュール（変換本体・ワーカー・任意依存）
+LAZY_MODULES = (
+    "gif_converter.core.batch",
+    "gif_converter.core.converter",
+    "gif_converter.core.jobs",
+    "gif_converter.core.metadata",
+    "gif_converter.core.preview",
+    "gif_converter.gui.workers",
+    "PIL",
+    "numpy",
+    "concurrent.futures",
+)
+# ready まで待つ上限（秒）
+READY_TIMEOUT = 10.0
+
+
+def run_child() -> Dict[str, Any]:
+    """GUI を起動して各時点を計る（--run-child で起動した子プロセス内で呼ぶ）"""
+    t0 = time.perf_counter()
+    import gif_converter.main  # noqa: F401  起動時と同じ読み込みを計る
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from gif_converter.gui.main_window import MainWindow
+
+    result: Dict[str, Any] = {"import": time.perf_counter() - t0}
+    app = QApplication([sys.argv[0]])
+    window = MainWindow()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):  # type: ignore[override]
+            if event.type() == QEvent.Paint and obj is window and "paint" not in result:
+                result["paint"] = time.perf_counter() - t0
+                result["loaded"] = [m for m in LAZY_MODULES if m in sys.modules]
+            return False
+
+    def poll() -> None:
+        if window._state_restored and "paint" in result:
+            result["ready"] = time.perf_counter() - t0
+            app.quit()
+        elif time.perf_counter() - t0 > READY_TIMEOUT:
+            app.quit()
+        else:
+            QTimer.singleShot(1, poll)
+
+    watcher = FirstPaint()
+    window.installEventFilter(watcher)
+    window.show()
+    poll()
+    app.exec_()
+    window.close()
+    if "ready" not in result:
+        raise RuntimeError(f"{READY_TIMEOUT:.0f}秒以内に起動が終わりませんでした")
+    return result
+
+
+def _child_env(work: Path, platform: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (SOURCE_DIR, env.get("PYTHONPATH", "")) if p
+    )
+    env["APPDATA"] = str(work)  # Windows の設定フォルダ
+    if platform:
+        env["QT_QPA_PLATFORM"] = platform
+    return env
+
+
+def measure(runs: int, platform: str) -> Tuple[Dict[str, float], List[str]]:
+    """runs 回起動し、各指標の中央値と最初の描画までに読み込まれた LAZY_MODULES を返す"""
+    samples: Dict[str, List[float]] = {m: [] for m in METRICS}
+    loaded: List[str] = []
+    for _ in range(max(1, runs)):
+        # 毎回まっさらな設定フォルダで起動する（再開の確認などを出さない）
+        with tempfile.TemporaryDirectory(prefix="gifstartup_") as td:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-child"],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                cwd=td,
+                env=_child_env(Path(td), platform),
+            )
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            reason = lines[-1] if lines else f"終了コード {proc.returncode}"
+            raise RuntimeError(f"計測に失敗しました: {reason}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        for m in METRICS:
+            samples[m].append(result[m])
+        loaded = sorted(set(loaded) | set(result["loaded"]))
+    return {m: statistics.median(v) for m, v in samples.items()}, loaded
+
+
+def over_budget(
+    results: Dict[str, float], budget: Dict[str, float], scale: float = 1.0
+) -> List[str]:
+    """予算を超えた指標を説明する行のリスト"""
+    lines = []
+    for m, limit in budget.items():
+        value = results.get(m)
+        if value is not None and value > limit * scale:
+            lines.append(
+                f"{m}: {value * 1000:.0f} ms（予算 {limit * scale * 1000:.0f} ms）"
+            )
+    return lines
+
+
+def parse_importtime(text: str) -> List[Tuple[str, int, int]]:
+    """python -X importtime の出力を (モジュール, 自身の µs, 累計の µs) のリストにする"""
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        entries.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return entries
+
+
+def by_package(entries: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """最上位パッケージごとの自身の時間の合計（µs、多い順）"""
+    totals: Dict[str, int] = {}
+    for name, self_us, _ in entries:
+        top = name.split(".")[0]
+        totals[top] = totals.get(top, 0) + self_us
+    return dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def profile_imports(top: int) -> None:
+    """gif_converter.main を読み込むときの import 時間を多い順に表示する"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import gif_converter.main"],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        env=_child_env(Path(tempfile.gettempdir()), ""),
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(f"読み込みに失敗しました: {lines[-1] if lines else ''}")
+    entries = parse_importtime(proc.stderr)
+    total = sum(self_us for _, self_us, _ in entries)
+    print(f"import 合計: {total / 1000:.1f} ms（{len(entries)} モジュール）")
+    print(f"\n{'累計(ms)':>9} {'自身(ms)':>9}  module")
+    slowest = sorted(entries, key=lambda e: e[2], reverse=True)[:top]
+    for name, self_us, cum_us in slowest:
+        print(f"{cum_us / 1000:>9.1f} {self_us / 1000:>9.1f}  {name}")
+    print(f"\n{'自身(ms)':>9}  package")
+    for name, us in list(by_package(entries).items())[:top]:
+        print(f"{us / 1000:>9.1f}  {name}")
+
+
+def main() -> None:
+    if len(sys.argv) == 2 and sys.argv[1] == "--run-child":
+        print(json.dumps(run_child()))
+        return
+
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5, help="起動回数（中央値を採用）")
+    ap.add_argument(
+        "--budget-scale", type=float, default=1.0, help="予算の倍率（遅いマシン向け）"
+    )
+    ap.add_argument("--platform", default="offscreen", help="QT_QPA_PLATFORM の値")
+    ap.add_argument(
+        "--profile", type=int, metavar="N", help="import 時間の上位 N 件を表示して終わる"
+    )
+    ap.add_argument("--json", type=Path, help="計測結果を JSON で保存する")
+    args = ap.parse_args()
+
+    if args.profile:
+        profile_imports(args.profile)
+        return
+
+    results, loaded = measure(args.runs, args.platform)
+    print(f"{'metric':<8} {'median(ms)':>11} {'budget(ms)':>11}")
+    for m in METRICS:
+        limit = BUDGET[m] * args.budget_scale
+        print(f"{m:<8} {results[m] * 1000:>11.0f} {limit * 1000:>11.0f}")
+    if args.json:
+        data = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "runs": args.runs,
+            "results": results,
+            "loaded_before_paint": loaded,
+        }
+        args.json.write_text(
+            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+    problems = over_budget(results, BUDGET, args.budget_scale)
+    problems += [f"最初の描画までに読み込まれています: {m}" for m in loaded]
+    if problems:
+        print("起動時間の予算を満たしていません:")
+        for line in problems:
+            print(f"  {line}")
+        sys.exit(1)
+    print("予算内です")
+
+
+if __name__ == "__main__":
+    main()
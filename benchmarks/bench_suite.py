@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+プリセット × エンジンの回帰ベンチマーク
+合成クリップ（デスクトップ相当・動きの激しい映像・長尺）を config.presets の各プリセットと
+各エンジンで変換し、ウォールタイム・CPU時間・ピークメモリ・出力サイズを記録して
+保存済みの基準（baseline.json）と比べます。ネットワークは使いません。
+
+    python benchmarks/bench_suite.py --save-baseline   # 現在の結果を基準として保存
+    python benchmarks/bench_suite.py                   # 計測して基準と比較（悪化で終了コード1）
+    python benchmarks/bench_suite.py --require-baseline  # CI向け。基準が無ければ終了コード1
+    python benchmarks/bench_suite.py --scale 0.2 --engines ffmpeg
+
+1ケースごとに別プロセスで計測するので、ピークメモリが前のケースの影響を受けません。
+CPU時間とピークメモリは ffmpeg 子プロセスの分を含みます（POSIXのみ。Windowsは本体のみ）。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(CURRENT_DIR), "source")
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from clips import SUITE_CLIPS, generate_clip  # noqa: E402
+from gif_converter.config import presets  # noqa: E402
+
+# エンジン名 → ConversionTask に上書きする値（"tune" は tuning.tune_task を通す）
+ENGINES: Dict[str, Dict[str, Any]] = {
+    "ffmpeg": {},
+    "tuned": {"tune": True},
+    "segmented": {"segments": 4},
+    "numpy": {"engine": "numpy"},
+}
+
+METRICS = ("wall", "cpu", "peak_rss", "size")
+BASELINE_PATH = Path(CURRENT_DIR) / "baseline.json"
+BASELINE_VERSION = 1
+# 基準からこの割合を超えて悪化したら回帰とみなす
+DEFAULT_THRESHOLD = 0.15
+# 計測のばらつきで誤検知しないよう、これ未満の差は割合に関係なく無視する
+MIN_DELTA: Dict[str, float] = {
+    "wall": 0.05,  # 秒
+    "cpu": 0.05,  # 秒
+    "peak_rss": 8 * 1024 * 1024,  # バイト
+    "size": 1024,  # バイト
+}
+
+
+def case_key(clip: str, preset: str, engine: str) -> str:
+    return f"{clip}/{preset}/{engine}"
+
+
+def _peak_rss() -> int:
+    """このプロセスと回収済みの子プロセスのピークRSS（バイト）。取れなければ0"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil  # 任意依存（Windows）
+
+            return int(psutil.Process().memory_info().peak_wset)
+        except Exception:
+            return 0
+    # Linux は KiB、macOS はバイト単位
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def run_case(spec: Dict[str, Any]) -> Dict[str, float]:
+    """1ケースを変換して計測値を返す（--run-case で起動した子プロセス内で呼ぶ）"""
+    from gif_converter.core.converter import ConversionTask, Converter
+    from gif_converter.core.tuning import tune_task
+
+    preset = presets[spec["preset"]]
+    overrides = dict(ENGINES[spec["engine"]])
+    tune = overrides.pop("tune", False)
+    task = ConversionTask(
+        input_path=Path(spec["input"]),
+        output_dir=Path(spec["output"]).parent,
+        fps=int(preset["fps"]),
+        width=int(preset["width"]),
+        colors=int(preset["colors"]),
+        start=0.0,
+        duration=0.0,
+        output_path=Path(spec["output"]),
+        use_palette_cache=False,  # 毎回パレット生成まで計測する
+        **overrides,
+    )
+    before = os.times()
+    t0 = time.perf_counter()
+    converter = Converter()
+    out = converter.convert(tune_task(task) if tune else task)
+    wall = time.perf_counter() - t0
+    after = os.times()
+    cpu = sum(after[:4]) - sum(before[:4])  # user/system とその子プロセス分
+    tel = converter.last_telemetry
+    ffmpeg_rss = tel.peak_rss_bytes if tel else 0
+    return {
+        "wall": wall,
+        "cpu": cpu,
+        "peak_rss": max(_peak_rss(), ffmpeg_rss),
+        "size": out.stat().st_size,
+    }
+
+
+def measure(spec: Dict[str, Any], repeat: int, cwd: Path) -> Dict[str, float]:
+    """別プロセスで repeat 回計測し、各指標の最小値を返す"""
+    best: Dict[str, float] = {}
+    for _ in range(max(1, repeat)):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(spec)],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            cwd=cwd,  # 設定/キャッシュの書き込みを作業フォルダに閉じ込める
+        )
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            reason = lines[-1] if lines else f"終了コード {proc.returncode}"
+            raise RuntimeError(f"計測に失敗しました（{spec['engine']}）: {reason}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        for m in METRICS:
+            best[m] = min(best.get(m, float("inf")), result[m])
+    return best
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """基準より threshold を超えて悪化した指標を返す（基準に無いケース/指標は比べない）"""
+    regressions: List[str] = []
+    for key, cur in current.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base.get("duration") != cur.get("duration"):
+            continue  # クリップ長が違う計測とは比べない
+        for m in METRICS:
+            b, c = base.get(m), cur.get(m)
+            if not b or c is None:
+                continue
+            if c - b > max(b * threshold, MIN_DELTA[m]):
+                pct = 100.0 * (c - b) / b
+                regressions.append(
+                    f"{key} {m}: {_fmt(m, b)} → {_fmt(m, c)}（+{pct:.1f}%）"
+                )
+    return regressions
+
+
+def _fmt(metric: str, value: float) -> str:
+    if metric in ("wall", "cpu"):
+        return f"{value:.2f}s"
+    if metric == "peak_rss":
+        return f"{value / 1024 / 1024:.0f}MB"
+    return f"{value / 1024:.1f}KB"
+
+
+def machine_info() -> Dict[str, Any]:
+    try:
+        ffmpeg = subprocess.run(
+            ["ffmpeg", "-version"], capture_output=True, text=True
+        ).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        ffmpeg = ""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "ffmpeg": ffmpeg,
+    }
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != BASELINE_VERSION:
+        print(f"基準ファイルの形式が異なるため比較しません: {path}", file=sys.stderr)
+        return None
+    return data
+
+
+def _has_numpy() -> bool:
+    try:
+        import numpy  # noqa: F401
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == "--run-case":
+        print(json.dumps(run_case(json.loads(sys.argv[2]))))
+        return
+
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--clips", nargs="*", default=list(SUITE_CLIPS))
+    ap.add_argument("--presets", nargs="*", default=list(presets))
+    ap.add_argument("--engines", nargs="*", default=list(ENGINES))
+    ap.add_argument("--repeat", type=int, default=3, help="計測回数（最小値を採用）")
+    ap.add_argument(
+        "--scale", type=float, default=1.0, help="クリップ長の倍率（0.2 で短く一通り）"
+    )
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    ap.add_argument(
+        "--save-baseline", action="store_true", help="今回の結果を基準として保存する"
+    )
+    ap.add_argument("--clip-dir", type=Path, help="生成したクリップを置く（再利用する）")
+    ap.add_argument(
+        "--require-baseline",
+        action="store_true",
+        help="基準が無ければ失敗にする（比較せずに通らないよう CI で指定する）",
+    )
+    args = ap.parse_args()
+
+    if (
+        args.require_baseline
+        and not args.save_baseline
+        and load_baseline(args.baseline) is None
+    ):
+        # 計測に時間がかかるので、比較できないことは先に知らせる
+        print(f"基準がありません（--save-baseline で作成）: {args.baseline}")
+        sys.exit(1)
+
+    engines = list(args.engines)
+    if "numpy" in engines and not _has_numpy():
+        print("numpy/Pillow が無いため numpy エンジンは省きます", file=sys.stderr)
+        engines.remove("numpy")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="gifsuite_") as td:
+        work = Path(td)
+        clip_dir = args.clip_dir or work / "clips"
+        print(
+            f"{'case':<28} {'wall(s)':>8} {'cpu(s)':>8}"
+            f" {'peak(MB)':>9} {'size(KB)':>10}"
+        )
+        for clip in args.clips:
+            kind, seconds, codec = SUITE_CLIPS[clip]
+            duration = round(seconds * args.scale, 3)
+            src = generate_clip(kind, clip_dir, duration, codec)
+            for preset in args.presets:
+                for engine in engines:
+                    key = case_key(clip, preset, engine)
+                    spec = {
+                        "input": str(src),
+                        "output": str(work / f"{clip}_{engine}_{len(results)}.gif"),
+                        "preset": preset,
+                        "engine": engine,
+                    }
+                    r = measure(spec, args.repeat, work)
+                    r["duration"] = duration
+                    results[key] = r
+                    peak_mb = r["peak_rss"] / 1024 / 1024
+                    print(
+                        f"{key:<28} {r['wall']:>8.2f} {r['cpu']:>8.2f}"
+                        f" {peak_mb:>9.0f} {r['size'] / 1024:>10.1f}"
+                    )
+
+    machine = machine_info()
+    if args.save_baseline:
+        data = {
+            "version": BASELINE_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": machine,
+            "results": results,
+        }
+        args.baseline.write_text(
+            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"基準を保存しました: {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"基準がありません（--save-baseline で作成）: {args.baseline}")
+        return
+    if baseline.get("machine") != machine:
+        print("警告: 基準と計測環境が異なります（時間/メモリの比較は参考値）")
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if regressions:
+        print(f"回帰（基準比 +{args.threshold:.0%} 超）:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"基準（{baseline.get('created_at', '?')}）からの悪化はありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+ベンチマーク用の合成クリップ生成
+ffmpeg の lavfi ソースから決定的な動画を作るので、ネットワークや素材は不要です。
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import subprocess
+from typing import Dict, List, Tuple
+
+# 種類ごとの lavfi ソース（{d} に秒数が入る）
+CLIP_SOURCES: Dict[str, str] = {
+    # 画面キャプチャ相当: ほぼ静止した画面
+    "static": "testsrc2=size=1280x720:rate=30:duration={d}",
+    # 画面録画相当: 背景は固定で、一部だけが動いては数秒止まる
+    "screen": (
+        "smptebars=size=1280x720:rate=30:duration={d}[bg];"
+        "color=c=red:size=200x120:rate=30[box];"
+        "[bg][box]overlay=x='if(lt(mod(t\\,4)\\,2)\\,mod(t*300\\,1000)\\,0)'"
+        ":y=300:shortest=1"
+    ),
+    # スライド/資料の録画相当: 2秒ごとに切り替わり、その間は（圧縮ノイズを除き）静止
+    "slides": "testsrc2=size=1280x720:rate=0.5:duration={d},fps=30",
+    # 動きの激しい映像
+    "motion": "mandelbrot=size=1280x720:rate=30,trim=duration={d}",
+    # 高解像度のカメラ映像相当（大きく縮小する場合の計測用）
+    "fullhd": "testsrc2=size=1920x1080:rate=30:duration={d}",
+}
+
+
+# コーデックごとの出力設定（拡張子, エンコーダ引数）
+CODECS: Dict[str, Tuple[str, List[str]]] = {
+    "h264": (".mp4", ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"]),
+    # 古いカメラ/キャプチャ機器の MJPEG（デコーダ側縮小 lowres に対応）
+    "mjpeg": (".avi", ["-c:v", "mjpeg", "-q:v", "3", "-pix_fmt", "yuvj420p"]),
+}
+
+
+def generate_clip(
+    kind: str, out_dir: Path, duration: float, codec: str = "h264"
+) -> Path:
+    """合成クリップを作成（既にあれば再利用）"""
+    src = CLIP_SOURCES[kind]
+    suffix, encode = CODECS[codec]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{kind}_{duration:g}s"
+    if codec != "h264":
+        name += f"_{codec}"
+    path = out_dir / (name + suffix)
+    if path.exists():
+        return path
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        src.format(d=duration),
+        *encode,
+        str(path),
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+# 回帰ベンチマーク（bench_suite.py）で使うクリップ: 名前 → (種類, 秒数, コーデック)
+SUITE_CLIPS: Dict[str, Tuple[str, float, str]] = {
+    # デスクトップ録画相当（ほぼ静止）
+    "desktop": ("static", 10.0, "h264"),
+    # 動きの激しい映像
+    "motion": ("motion", 10.0, "h264"),
+    # 長尺の画面録画（長さに比例して伸びるか、メモリが一定かを見る）
+    "long": ("screen", 120.0, "h264"),
+    # 1080p から大きく縮小する場合（前段の 1/2 縮小、MJPEG はデコーダ側縮小）
+    "fullhd": ("fullhd", 10.0, "h264"),
+    "camera": ("fullhd", 10.0, "mjpeg"),
+}
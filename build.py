@@ -2,6 +2,9 @@
 """
 GIF Converter ビルドスクリプト
 このスクリプトを実行することで、正しい手順でコンパイルできます。
+
+    python build.py            # 1ファイルの exe（起動のたびに一時フォルダへ展開する）
+    python build.py --onedir   # フォルダ形式（展開が要らないので起動が速い）
 """
 
 import subprocess
@@ -31,6 +34,7 @@ def run_command(command, description):
 
 
 def main():
+    onedir = "--onedir" in sys.argv[1:]
     print("🚀 GIF Converter ビルドプロセス開始")
     print("=" * 50)
 
@@ -60,14 +64,15 @@ def main():
             print(f"削除: {path}")
 
     # 4. PyInstallerでのコンパイル
+    mode = "--onedir" if onedir else "--onefile"
     if not run_command(
-        'pyinstaller --onefile --windowed --name "GifMaker" run.py',
+        f'pyinstaller {mode} --windowed --name "GifMaker" run.py',
         "PyInstallerでのコンパイル",
     ):
         return False
 
     # 5. 結果確認
-    exe_path = Path("dist/GifMaker.exe")
+    exe_path = Path("dist/GifMaker/GifMaker.exe" if onedir else "dist/GifMaker.exe")
     if exe_path.exists():
         size_mb = exe_path.stat().st_size / (1024 * 1024)
         print(f"🎉 ビルド完了！")
@@ -9,9 +9,15 @@ setup(
         "PyQt5>=5.15.9",
         "Pillow>=10.0.0",
     ],
+    extras_require={
+        # プロセス内パイプライン（--engine numpy）用
+        "numpy": ["numpy>=1.24"],
+    },
     entry_points={
         "console_scripts": [
             "gif_converter=gif_converter.main:main",
+            "gif_converter_cli=gif_converter.cli:main",
+            "gif_converter_server=gif_converter.server:main",
         ],
     },
 )
@@ -0,0 +1,429 @@
+"""
+ヘッドレス変換用のコマンドライン入口（Qtを読み込まない）
+
+    python -m gif_converter.cli "captures/*.mp4" -o out --preset 軽量
+    python -m gif_converter.cli a.mp4 --preset 高品質 --preset 標準 --preset 軽量
+    python -m gif_converter.cli --watch captures   # 監視フォルダ（Ctrl+C で終了）
+    python -m gif_converter.cli a.mp4 -o - > a.gif  # 標準出力へ書き出す
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .config import DEFAULT_TEMPLATE, load_config, presets
+from .core.batch import BatchScheduler
+from .core.converter import ConversionTask, Converter, resolve_output_path
+from .core.jobs import JobQueue
+from .core.telemetry import BatchReport, now_iso, write_report
+from .core.tuning import tune_task
+from .core.utils import VIDEO_SUFFIXES, build_output_filename, ensure_output_dir
+from .core.watch import WATCH_BUSY_LOAD, WATCH_SETTLE_SECONDS, FolderWatcher
+
+
+def expand_inputs(patterns: List[str]) -> List[Path]:
+    # Windowsのシェルはグロブを展開しないため自前で展開する
+    files: List[Path] = []
+    seen = set()
+    for pat in patterns:
+        matches = glob.glob(pat, recursive=True) if glob.has_magic(pat) else [pat]
+        for m in sorted(matches):
+            p = Path(m)
+            if p.is_dir():
+                continue
+            key = str(p.resolve())
+            if key not in seen:
+                seen.add(key)
+                files.append(p)
+    return files
+
+
+def dedupe_output_path(path: Path, used: Set[str]) -> Path:
+    """
+    同じ出力先が既に割り当てられていれば末尾に _2, _3 ... を付ける。
+    （再帰グロブで同名ファイルが複数あると、並列変換で同じGIFに書き込んでしまうため）
+    """
+    candidate = path
+    n = 2
+    while str(candidate.resolve()).lower() in used:
+        candidate = path.with_name(f"{path.stem}_{n}{path.suffix}")
+        n += 1
+    used.add(str(candidate.resolve()).lower())
+    return candidate
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="gif_converter.cli", description="MP4などの動画をGIFに一括変換します"
+    )
+    ap.add_argument("inputs", nargs="*", help="入力ファイルまたはグロブ")
+    ap.add_argument(
+        "-o",
+        "--output-dir",
+        help="出力フォルダ（省略時はカレント。--watch では前回GUIで使ったフォルダ）。"
+        "- で標準出力へ書き出す（入力1つ・プリセット1つのみ）",
+    )
+    ap.add_argument(
+        "--preset",
+        choices=list(presets),
+        action="append",
+        help="品質プリセット（省略時は標準。--watch ではGUIのカスタム設定）。"
+        "複数指定すると1回のデコードで全部を書き出す",
+    )
+    ap.add_argument("--fps", type=int, help="FPS（プリセットを上書き）")
+    ap.add_argument("--width", type=int, help="幅px（プリセットを上書き）")
+    ap.add_argument("--colors", type=int, help="色数（プリセットを上書き）")
+    ap.add_argument("--start", type=float, default=0.0, help="開始秒")
+    ap.add_argument("--duration", type=float, default=0.0, help="長さ秒（0で最後まで）")
+    ap.add_argument("--template", help="出力ファイル名テンプレート")
+    ap.add_argument("-j", "--jobs", type=int, default=0, help="同時変換数（0で自動）")
+    ap.add_argument("--two-pass", action="store_true", help="従来の2パス変換を使う")
+    ap.add_argument(
+        "--engine",
+        choices=["ffmpeg", "numpy"],
+        default="ffmpeg",
+        help="numpy: ffmpegはデコードのみ、減色とGIF化をPython側で行う",
+    )
+    ap.add_argument(
+        "--segments", type=int, default=0, help="時間軸をN分割して並列変換（長尺向け）"
+    )
+    ap.add_argument(
+        "--diff",
+        action="store_true",
+        help="変化した部分だけを透過付きで書き出し、同一フレームを統合する（画面キャプチャ向け）",
+    )
+    ap.add_argument(
+        "--decimate",
+        action="store_true",
+        help="ほぼ同じ連続フレームを間引き、表示時間に含める（静止の多い画面キャプチャ向け）",
+    )
+    ap.add_argument(
+        "--target-size",
+        type=float,
+        default=0.0,
+        metavar="MB",
+        help="出力をこのサイズ(MB)に収める（fps/幅/色数は上限として自動で下げる）",
+    )
+    ap.add_argument(
+        "--no-tune",
+        action="store_true",
+        help="スレッド数の調整とデコード側の縮小を行わない（比較用）",
+    )
+    ap.add_argument(
+        "--report",
+        metavar="DIR",
+        help="工程ごとの所要時間などの計測レポート（JSON/CSV）をこのフォルダに保存する",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="前回中断した一括変換（GUI/CLI）の残りを再開する",
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="同じ入力・同じ設定で作った出力が残っていても変換し直す",
+    )
+    ap.add_argument(
+        "--watch",
+        action="append",
+        metavar="DIR",
+        help="このフォルダを監視し、書き終わった動画を変換し続ける（複数指定可）",
+    )
+    ap.add_argument(
+        "--settle",
+        type=float,
+        default=WATCH_SETTLE_SECONDS,
+        metavar="SEC",
+        help="--watch: サイズが変わらなくなってから変換を始めるまでの秒数",
+    )
+    ap.add_argument(
+        "--max-load",
+        type=float,
+        default=WATCH_BUSY_LOAD,
+        metavar="LOAD",
+        help="--watch: 1コアあたりの負荷がこれを超える間は変換を増やさない",
+    )
+    ap.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    return ap
+
+
+def watch_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """監視モードの設定: GUIのカスタム設定を基に、指定があればプリセット/引数で上書き"""
+    cfg = load_config()
+    settings = dict(cfg.custom_settings)
+    if args.preset:
+        settings.update(presets[args.preset[-1]])
+    for key in ("fps", "width", "colors"):
+        value = getattr(args, key)
+        if value is not None:
+            settings[key] = value
+    if args.segments:
+        settings["segments"] = args.segments
+    if args.diff:
+        settings["diff_frames"] = True
+    if args.decimate:
+        settings["decimate"] = True
+    if args.target_size:
+        settings["target_mb"] = args.target_size
+    settings["template"] = args.template or cfg.filename_template
+    settings["output_dir"] = args.output_dir or cfg.last_output_dir
+    settings["jobs"] = args.jobs or cfg.max_concurrency
+    return settings
+
+
+def run_watch(args: argparse.Namespace) -> int:
+    settings = watch_settings(args)
+    out_dir = ensure_output_dir(Path(settings["output_dir"]))
+    template = settings["template"]
+    used: Set[str] = set()
+    assigned: Dict[Path, Path] = {}
+
+    def make_task(path: Path) -> ConversionTask:
+        # 同じ入力が上書きされて再変換する場合は、前回と同じ出力に書く
+        if path not in assigned:
+            name = build_output_filename(template, path, settings)
+            assigned[path] = dedupe_output_path(out_dir / name, used)
+        # 録画の開始/長さはファイルごとに違うので、切り出しは適用しない
+        return ConversionTask(
+            input_path=path,
+            output_dir=out_dir,
+            fps=int(settings["fps"]),
+            width=int(settings["width"]),
+            colors=int(settings["colors"]),
+            start=0.0,
+            duration=0.0,
+            output_path=assigned[path],
+            single_pass=not args.two_pass,
+            segments=int(settings.get("segments", 0)),
+            engine=args.engine,
+            diff_frames=bool(settings.get("diff_frames", False)),
+            decimate=bool(settings.get("decimate", False)),
+            target_bytes=int(float(settings.get("target_mb", 0.0)) * 1024 * 1024),
+        )
+
+    def on_log(text: str) -> None:
+        if not args.quiet:
+            print(text, file=sys.stderr, flush=True)
+
+    def on_done(file: str, ok: bool, out_path: str, err: str) -> None:
+        if ok:
+            print(f"完了: {out_path}", flush=True)
+        else:
+            print(f"失敗: {file} -> {err}", file=sys.stderr, flush=True)
+
+    watcher = FolderWatcher(
+        [Path(d) for d in args.watch],
+        make_task,
+        max_workers=int(settings["jobs"]),
+        on_log=on_log,
+        on_done=on_done,
+        settle=args.settle,
+        busy_load=args.max_load,
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\n中断しました", file=sys.stderr)
+        return 130
+    return 0
+
+
+def run_stream(args: argparse.Namespace, task: ConversionTask) -> int:
+    """-o -: GIFを標準出力へ書き出す（メッセージと進捗はすべて標準エラーへ）"""
+    if sys.stdout.isatty():
+        print("GIFを端末には出力できません。リダイレクトかパイプで受けてください", file=sys.stderr)
+        return 2
+
+    progress_shown = [False]  # 進捗の行が改行されずに残っているか
+
+    def on_progress(_file: str, percent: float, _message: str) -> None:
+        if not args.quiet:
+            print(f"\r進捗 {percent:5.1f}%", end="", file=sys.stderr, flush=True)
+            progress_shown[0] = True
+
+    def on_log(text: str) -> None:
+        if not args.quiet:
+            prefix = "\n" if progress_shown[0] else ""
+            progress_shown[0] = False
+            print(prefix + text, file=sys.stderr, flush=True)
+
+    if not args.no_tune:
+        task = tune_task(task)
+    converter = Converter(on_progress=on_progress, on_log=on_log)
+    started_at = now_iso()
+    try:
+        written = converter.convert_to_stream(task, sys.stdout.buffer)
+    except KeyboardInterrupt:
+        # 書き出し中の ffmpeg は convert_to_stream が止める
+        print("\n中断しました", file=sys.stderr)
+        return 130
+    except RuntimeError as e:
+        print(f"\n失敗: {task.input_path} -> {e}", file=sys.stderr)
+        # 読む側が閉じていると終了時の flush でも失敗するので、捨て先に付け替える
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    if not args.quiet:
+        print(f"完了: 標準出力へ {written:,} バイト", file=sys.stderr)
+    tel = converter.last_telemetry
+    if args.report and tel:
+        report = BatchReport(
+            started_at=started_at, wall=tel.wall, concurrency=1, tasks=[tel]
+        )
+        save_report(report, Path(args.report))
+    return 0
+
+
+def save_report(report: BatchReport, report_dir: Path) -> None:
+    try:
+        json_path, csv_path = write_report(report, report_dir)
+        print(f"計測レポート: {json_path} / {csv_path}", file=sys.stderr)
+    except OSError as e:
+        print(f"警告: 計測レポートを保存できませんでした: {e}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    to_stdout = args.output_dir == "-"
+    if args.watch:
+        if to_stdout:
+            print("--watch では標準出力へ書き出せません", file=sys.stderr)
+            return 2
+        missing = [d for d in args.watch if not Path(d).is_dir()]
+        if missing:
+            print(f"監視フォルダが見つかりません: {', '.join(missing)}", file=sys.stderr)
+            return 2
+        if args.preset and len(args.preset) > 1:
+            print("--watch では --preset は1つだけ指定できます", file=sys.stderr)
+            return 2
+        return run_watch(args)
+    if not args.inputs and not args.resume:
+        ap.error("入力ファイルを指定してください（または --watch DIR / --resume）")
+    if to_stdout and args.resume:
+        ap.error("-o - と --resume は同時に指定できません")
+    variants: List[Dict[str, Any]] = []
+    for name in dict.fromkeys(args.preset or ["標準"]):
+        settings = dict(presets[name])
+        for key in ("fps", "width", "colors"):
+            value = getattr(args, key)
+            if value is not None:
+                settings[key] = value
+        variants.append(settings)
+
+    files: List[Path] = []
+    for pat in args.inputs:
+        if glob.has_magic(pat) and not glob.glob(pat, recursive=True):
+            print(f"警告: 一致するファイルがありません: {pat}", file=sys.stderr)
+    for f in expand_inputs(args.inputs):
+        if not f.exists():
+            print(f"警告: 入力ファイルが見つかりません: {f}", file=sys.stderr)
+        elif f.suffix.lower() not in VIDEO_SUFFIXES:
+            print(f"警告: 対応していない形式のためスキップします: {f}", file=sys.stderr)
+        else:
+            files.append(f)
+
+    if to_stdout:
+        if len(files) != 1 or len(variants) != 1:
+            print("-o - では入力とプリセットを1つずつ指定してください", file=sys.stderr)
+            return 2
+        settings = variants[0]
+        return run_stream(
+            args,
+            ConversionTask(
+                input_path=files[0],
+                output_dir=Path("."),
+                fps=int(settings["fps"]),
+                width=int(settings["width"]),
+                colors=int(settings["colors"]),
+                start=args.start,
+                duration=args.duration,
+                single_pass=not args.two_pass,
+                segments=args.segments,
+                engine=args.engine,
+                diff_frames=args.diff,
+                decimate=args.decimate,
+                target_bytes=int(args.target_size * 1024 * 1024),
+            ),
+        )
+
+    jobs = JobQueue()
+    tasks: List[ConversionTask] = []
+    if args.resume:
+        # 再開するものは run() で登録し直す（入力が消えたものはここで片付く）
+        tasks = [t for t in jobs.unfinished() if t.input_path.exists()]
+        jobs.discard_unfinished()
+        print(f"前回中断した {len(tasks)} 件の変換を再開します", file=sys.stderr)
+    if not files and not tasks:
+        print("有効な入力ファイルがありません", file=sys.stderr)
+        return 2
+
+    out_dir = ensure_output_dir(Path(args.output_dir or "."))
+    template = args.template or DEFAULT_TEMPLATE
+    used: Set[str] = {str(resolve_output_path(t).resolve()).lower() for t in tasks}
+    for f, settings in ((f, s) for f in files for s in variants):
+        name = build_output_filename(template, f, settings)
+        output_path = dedupe_output_path(out_dir / name, used)
+        if output_path.name != name:
+            print(
+                f"警告: 出力名が重複するため {output_path.name} に変更します: {f}",
+                file=sys.stderr,
+            )
+        tasks.append(
+            ConversionTask(
+                input_path=f,
+                output_dir=out_dir,
+                fps=int(settings["fps"]),
+                width=int(settings["width"]),
+                colors=int(settings["colors"]),
+                start=args.start,
+                duration=args.duration,
+                output_path=output_path,
+                single_pass=not args.two_pass,
+                segments=args.segments,
+                engine=args.engine,
+                diff_frames=args.diff,
+                decimate=args.decimate,
+                target_bytes=int(args.target_size * 1024 * 1024),
+            )
+        )
+
+    def on_progress(_file: str, _percent: float, aggregate: float) -> None:
+        if not args.quiet:
+            print(f"\r進捗 {aggregate:5.1f}%", end="", file=sys.stderr, flush=True)
+
+    def on_done(file: str, ok: bool, out_path: str, err: str) -> None:
+        if not args.quiet:
+            print("", file=sys.stderr)
+        if ok:
+            print(f"完了: {out_path}")
+        else:
+            print(f"失敗: {file} -> {err}", file=sys.stderr)
+
+    scheduler = BatchScheduler(
+        max_workers=args.jobs,
+        on_progress=on_progress,
+        on_done=on_done,
+        tune=not args.no_tune,
+        jobs=jobs,
+        skip_up_to_date=not args.force,
+    )
+    try:
+        results = scheduler.run(tasks)
+    except KeyboardInterrupt:
+        # スケジューラが実行中の ffmpeg を止め、途中の出力を消してから戻る
+        print("\n中断しました", file=sys.stderr)
+        return 130
+    if args.report and scheduler.report:
+        save_report(scheduler.report, Path(args.report))
+    failed = sum(1 for r in results if not r.ok)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
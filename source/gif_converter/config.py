@@ -40,10 +40,16 @@ class AppConfig:
             "colors": presets[self.last_preset]["colors"],
             "start": 0.0,
             "duration": 0.0,
+            "segments": 0,
+            "diff_frames": False,
+            "decimate": False,
+            "target_mb": 0.0,
         }
         self.filename_template: str = DEFAULT_TEMPLATE
         self.recent_files: List[str] = []
         self.recent_limit: int = 15
+        self.max_concurrency: int = 0  # 同時変換数。0なら自動（コア数から算出）
+        self.batch_presets: List[str] = []  # 一括変換でまとめて書き出すプリセット
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -53,6 +59,8 @@ class AppConfig:
             "filename_template": self.filename_template,
             "recent_files": self.recent_files,
             "recent_limit": self.recent_limit,
+            "max_concurrency": self.max_concurrency,
+            "batch_presets": self.batch_presets,
         }
 
     @classmethod
@@ -64,6 +72,10 @@ class AppConfig:
         cfg.filename_template = data.get("filename_template", cfg.filename_template)
         cfg.recent_files = data.get("recent_files", [])
         cfg.recent_limit = int(data.get("recent_limit", cfg.recent_limit))
+        cfg.max_concurrency = int(data.get("max_concurrency", cfg.max_concurrency))
+        cfg.batch_presets = [
+            p for p in data.get("batch_presets", []) if p in presets
+        ]
         return cfg
 
     def add_recent_file(self, path: Path) -> None:
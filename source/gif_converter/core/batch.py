@@ -0,0 +1,293 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import os
+import threading
+import time
+
+from .cancel import CancelToken, ConversionCancelled
+from .converter import ConversionTask, Converter, LogCallback, resolve_output_path
+from .fanout import group_tasks
+from .jobs import CANCELLED, FAILED, RUNNING, JobQueue
+from .telemetry import BatchReport, TaskTelemetry, now_iso
+from .tuning import tune_task
+from .utils import probe_duration
+
+# 1本のffmpegが使うスレッド数の目安（同時実行数の既定値の算出に使う。
+# 実際のスレッド数は同時実行数から tuning.threads_for で決める）
+FFMPEG_THREADS_PER_TASK = 4
+
+# file, percent[0-100], aggregate percent[0-100]
+BatchProgressCallback = Callable[[str, float, float], None]
+# file, success, output_path, error
+BatchDoneCallback = Callable[[str, bool, str, str], None]
+
+
+def default_concurrency(ffmpeg_threads: int = FFMPEG_THREADS_PER_TASK) -> int:
+    cpus = os.cpu_count() or 1
+    return max(1, cpus // max(1, ffmpeg_threads))
+
+
+@dataclass
+class BatchResult:
+    task: ConversionTask
+    ok: bool
+    output_path: Optional[Path]
+    error: str = ""
+    cancelled: bool = False
+    telemetry: Optional[TaskTelemetry] = None
+    skipped: bool = False  # 出力が最新だったため変換しなかった
+
+
+class BatchScheduler:
+    """複数の ConversionTask を同時実行数の上限付きで並列に変換する（Qt非依存）"""
+
+    def __init__(
+        self,
+        max_workers: int = 0,
+        on_progress: Optional[BatchProgressCallback] = None,
+        on_done: Optional[BatchDoneCallback] = None,
+        on_log: Optional[LogCallback] = None,
+        tune: bool = True,
+        jobs: Optional[JobQueue] = None,
+        skip_up_to_date: bool = True,
+        fanout: bool = True,
+    ) -> None:
+        self.max_workers = max_workers if max_workers > 0 else default_concurrency()
+        # スレッド数・縮小の前処理をタスクごとに決める（core/tuning.py）
+        self.tune = tune
+        # ジョブの記録（再開と、最新の出力の省略に使う）。None なら記録しない
+        self.jobs = jobs
+        self.skip_up_to_date = skip_up_to_date
+        self.fanout = fanout
+        self._resume = False
+        self._concurrency = 1
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_log = on_log
+        self._lock = threading.Lock()
+        # 同じ入力が複数タスクに現れても混ざらないよう id(task) をキーにする
+        self._weights: Dict[int, float] = {}
+        self._percents: Dict[int, float] = {}
+        # 一括停止の要求と、実行中タスクごとのキャンセル（id(task) をキー）
+        self._stopped = threading.Event()
+        self._tokens: Dict[int, CancelToken] = {}
+        # 直近の run() の計測（write_report で JSON/CSV に書き出せる）
+        self.report: Optional[BatchReport] = None
+
+    def cancel(self, resume: bool = False) -> None:
+        """
+        一括停止。実行中の ffmpeg を止め、未着手のタスクは開始せずに終える。
+        resume=True（アプリの終了など）なら、止めたタスクは次回再開できるよう記録に残す
+        """
+        self._resume = self._resume or resume
+        self._stopped.set()
+        with self._lock:
+            tokens = list(self._tokens.values())
+        for token in tokens:
+            token.cancel()
+
+    def cancel_task(self, task: ConversionTask) -> None:
+        """1件だけ止める。空いた枠で次のタスクが始まる"""
+        with self._lock:
+            token = self._tokens.setdefault(id(task), CancelToken())
+        token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._stopped.is_set()
+
+    def _log(self, text: str) -> None:
+        if self.on_log:
+            self.on_log(text)
+
+    def plan(self, tasks: List[ConversionTask]) -> List[ConversionTask]:
+        """尺を調べて長いものから順に並べる（長尺が最後に残って待たされないように）"""
+        workers = max(1, min(self.max_workers, len(tasks)))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            durations = list(ex.map(_task_duration, tasks))
+        self._weights = {}
+        self._percents = {}
+        for task, dur in zip(tasks, durations):
+            self._weights[id(task)] = max(dur, 0.001)
+            self._percents[id(task)] = 0.0
+        order = sorted(range(len(tasks)), key=lambda i: durations[i], reverse=True)
+        return [tasks[i] for i in order]
+
+    def run(self, tasks: List[ConversionTask]) -> List[BatchResult]:
+        """全タスクが終わるまでブロックし、結果を完了順に返す"""
+        self.report = None
+        if not tasks:
+            return []
+        started_at = now_iso()
+        t0 = time.perf_counter()
+        results: List[BatchResult] = []
+        if self.jobs is not None:
+            if self.skip_up_to_date:
+                results = [self._skip(t) for t in tasks if self.jobs.up_to_date(t)]
+                skipped = {id(r.task) for r in results}
+                tasks = [t for t in tasks if id(t) not in skipped]
+            self.jobs.add(tasks)
+        if not tasks:
+            # すべて省略した場合も、前回のものではなく今回のレポートを残す
+            self.report = self._make_report(started_at, t0, 0, results)
+            return results
+        ordered = self.plan(tasks)
+        plan_time = time.perf_counter() - t0
+        # 同じ入力を複数の設定で変換する場合は、1回のデコードでまとめて書き出す
+        groups = group_tasks(ordered) if self.fanout else [[t] for t in ordered]
+        workers = max(1, min(self.max_workers, len(groups)))
+        self._concurrency = workers
+        self._log(f"同時実行数: {workers}")
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="gifconv"
+        ) as ex:
+            futures = [ex.submit(self._run_group, g) for g in groups]
+            try:
+                for fut in as_completed(futures):
+                    results.extend(fut.result())
+            except BaseException:
+                # Ctrl+C 等で抜ける場合も ffmpeg を残さない（別グループで動いているため）。
+                # 止めたタスクは次回再開できるよう記録に残す
+                self.cancel(resume=True)
+                raise
+        self.report = self._make_report(started_at, t0, workers, results, plan_time)
+        return results
+
+    def _make_report(
+        self,
+        started_at: str,
+        t0: float,
+        concurrency: int,
+        results: List[BatchResult],
+        plan: float = 0.0,
+    ) -> BatchReport:
+        return BatchReport(
+            started_at=started_at,
+            wall=time.perf_counter() - t0,
+            concurrency=concurrency,
+            tasks=[r.telemetry for r in results if r.telemetry],
+            plan=plan,
+        )
+
+    def _skip(self, task: ConversionTask) -> BatchResult:
+        out = resolve_output_path(task)
+        self._log(f"{task.input_path.name}: 出力が最新のため変換を省略しました")
+        if self.on_done:
+            self.on_done(str(task.input_path), True, str(out), "")
+        tel = TaskTelemetry(
+            input_path=str(task.input_path),
+            output_path=str(out),
+            ok=True,
+            skipped=True,
+            engine=task.engine,
+            output_bytes=out.stat().st_size if out.exists() else 0,
+        )
+        return BatchResult(task, True, out, skipped=True, telemetry=tel)
+
+    def _record(self, result: BatchResult) -> None:
+        if self.jobs is None:
+            return
+        if result.ok and result.output_path:
+            self.jobs.done(result.task, result.output_path)
+        elif not result.cancelled:
+            self.jobs.mark(result.task, FAILED, result.error)
+        elif not self._resume:
+            self.jobs.mark(result.task, CANCELLED)
+        # resume の中止は pending/running のまま残し、次回の再開対象にする
+
+    def _run_group(self, tasks: List[ConversionTask]) -> List[BatchResult]:
+        """1件、または同じ入力を共有するタスクの組（1回のデコードでまとめて変換）"""
+        if self._stopped.is_set():
+            # 停止後に順番が来たものは始めない（完了通知も出さない）
+            results = [
+                BatchResult(
+                    task,
+                    False,
+                    None,
+                    "キャンセルされました",
+                    True,
+                    TaskTelemetry(
+                        input_path=str(task.input_path),
+                        cancelled=True,
+                        engine=task.engine,
+                    ),
+                )
+                for task in tasks
+            ]
+            for result in results:
+                self._record(result)
+            return results
+        with self._lock:
+            # 組のどれかを cancel_task で止めると組全体が止まる
+            token = next(
+                (self._tokens[id(t)] for t in tasks if id(t) in self._tokens),
+                CancelToken(),
+            )
+            for task in tasks:
+                self._tokens[id(task)] = token
+        if self._stopped.is_set():
+            token.cancel()
+        name = tasks[0].input_path.name
+
+        def on_progress(_file: str, percent: float, _msg: str) -> None:
+            for task in tasks:
+                self._update(task, percent)
+
+        converter = Converter(
+            on_progress=on_progress,
+            on_log=lambda text: self._log(f"{name}: {text}"),
+            cancel_token=token,
+        )
+        if self.jobs is not None:
+            for task in tasks:
+                self.jobs.mark(task, RUNNING)
+        tuned = [tune_task(t, self._concurrency) if self.tune else t for t in tasks]
+        try:
+            if len(tasks) == 1:
+                outs = [converter.convert(tuned[0])]
+            else:
+                outs = converter.convert_many(tuned)
+            results = [BatchResult(t, True, out) for t, out in zip(tasks, outs)]
+        except ConversionCancelled as e:
+            results = [
+                BatchResult(t, False, None, str(e), cancelled=True) for t in tasks
+            ]
+        except Exception as e:
+            results = [BatchResult(t, False, None, str(e)) for t in tasks]
+        finally:
+            with self._lock:
+                for task in tasks:
+                    self._tokens.pop(id(task), None)
+        # 組の計測は1件にまとめて入っている（レポートで二重に数えないよう先頭にだけ付ける）
+        results[0].telemetry = converter.last_telemetry
+        for result in results:
+            self._record(result)
+            self._update(result.task, 100.0)
+            if self.on_done:
+                self.on_done(
+                    str(result.task.input_path),
+                    result.ok,
+                    str(result.output_path) if result.output_path else "",
+                    result.error,
+                )
+        return results
+
+    def _update(self, task: ConversionTask, percent: float) -> None:
+        with self._lock:
+            self._percents[id(task)] = percent
+            total = sum(self._weights.values()) or 1.0
+            aggregate = (
+                sum(self._weights[k] * self._percents.get(k, 0.0) for k in self._weights)
+                / total
+            )
+        if self.on_progress:
+            self.on_progress(str(task.input_path), percent, aggregate)
+
+
+def _task_duration(task: ConversionTask) -> float:
+    if task.duration > 0:
+        return task.duration
+    return max(0.0, probe_duration(task.input_path) - task.start)
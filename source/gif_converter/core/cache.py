@@ -0,0 +1,160 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import hashlib
+import os
+import shutil
+import threading
+
+from ..config import get_config_dir
+
+PALETTE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def get_cache_dir() -> Path:
+    return get_config_dir() / "cache"
+
+
+def file_fingerprint(path: Path) -> str:
+    """内容を読まずに識別できるよう パス/サイズ/更新時刻 から作る指紋"""
+    p = Path(path).resolve()
+    st = p.stat()
+    return f"{p}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def make_key(*parts: object) -> str:
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    サイズ上限付きのLRUディスクキャッシュ。
+    最終利用時刻はファイルの mtime で管理し、上限を超えたら古いものから消す。
+    """
+
+    def __init__(self, root: Path, max_bytes: int, suffix: str = "") -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> Path:
+        # 1ディレクトリにファイルが溜まりすぎないよう先頭2文字で振り分ける
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, src: Path) -> Path:
+        """src をキャッシュへコピーし、そのパスを返す"""
+        dst = self.path_for(key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if Path(src).is_dir():
+            shutil.copytree(src, tmp)
+            if dst.exists():
+                shutil.rmtree(dst, ignore_errors=True)
+            os.replace(tmp, dst)
+        else:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        self.evict()
+        return dst
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        """data をキャッシュへ書き込み、そのパスを返す"""
+        dst = self.path_for(key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dst)
+        self.evict()
+        return dst
+
+    def stats_text(self) -> str:
+        return f"ヒット {self.hits} / ミス {self.misses}"
+
+    def _entries(self) -> Iterable[Tuple[float, int, Path]]:
+        if not self.root.exists():
+            return []
+        entries: List[Tuple[float, int, Path]] = []
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for p in sub.iterdir():
+                if p.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = p.stat()
+                    size = _tree_size(p) if p.is_dir() else st.st_size
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, size, p))
+        return entries
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """上限を超えた分を古い順に削除し、削除したバイト数を返す"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    if path.is_dir():
+                        shutil.rmtree(path)
+                    else:
+                        path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                freed += size
+            return freed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class PaletteCache(DiskCache):
+    """入力の指紋と palettegen までのフィルタ条件をキーにしたパレット画像のキャッシュ"""
+
+    def __init__(
+        self, root: Optional[Path] = None, max_bytes: int = PALETTE_CACHE_MAX_BYTES
+    ) -> None:
+        super().__init__(root or get_cache_dir() / "palettes", max_bytes, ".png")
+
+
+_palette_cache: Optional[PaletteCache] = None
+_palette_cache_lock = threading.Lock()
+
+
+def get_palette_cache() -> PaletteCache:
+    """プロセス内で共有するパレットキャッシュ（ヒット/ミス数も共有される）"""
+    global _palette_cache
+    with _palette_cache_lock:
+        if _palette_cache is None:
+            _palette_cache = PaletteCache()
+        return _palette_cache
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set
+import os
+import signal
+import subprocess
+import threading
+
+
+class ConversionCancelled(RuntimeError):
+    """キャンセルで中断された（失敗とは区別して扱う）"""
+
+
+class CancelToken:
+    """
+    変換のキャンセル要求を伝える。
+    登録中の ffmpeg/ffprobe は cancel() の時点でプロセスツリーごと止め、
+    以降の起動は ConversionCancelled にする。cancel() はどのスレッドから呼んでもよい。
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._procs: Set[subprocess.Popen] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            procs: List[subprocess.Popen] = list(self._procs)
+        for proc in procs:
+            _kill(proc)
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise ConversionCancelled("キャンセルされました")
+
+    def popen(self, cmd: List[str], **kwargs: Any) -> subprocess.Popen:
+        """Popen して登録する。終わったら release() すること"""
+        self.check()
+        proc = subprocess.Popen(cmd, **_group_kwargs(kwargs))
+        with self._lock:
+            self._procs.add(proc)
+        if self._event.is_set():
+            # 登録の直前に cancel() された場合
+            _kill(proc)
+        return proc
+
+    def release(self, proc: subprocess.Popen) -> None:
+        with self._lock:
+            self._procs.discard(proc)
+
+    def run(self, cmd: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+        """subprocess.run 相当。途中でキャンセルされたら ConversionCancelled"""
+        proc = self.popen(cmd, **kwargs)
+        try:
+            out, err = proc.communicate()
+        finally:
+            self.release(proc)
+        self.check()
+        return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+
+def _group_kwargs(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # 子プロセスを別グループで起動し、孫（シェル経由のラッパー等）もまとめて止められるようにする
+    kwargs = dict(kwargs)
+    if os.name == "nt":
+        kwargs.setdefault("creationflags", subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        kwargs.setdefault("start_new_session", True)
+    return kwargs
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    """proc とその子孫を強制終了する"""
+    if os.name == "nt":
+        if proc.poll() is None:
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+    else:
+        # 親が先に終わっていても、同じグループに残った子は止める
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    if proc.poll() is None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+def run_process(
+    cmd: List[str], cancel: Optional[CancelToken] = None, **kwargs: Any
+) -> subprocess.CompletedProcess:
+    """cancel があればキャンセル可能に、無ければ通常の subprocess.run で実行する"""
+    if cancel is None:
+        return subprocess.run(cmd, **kwargs)
+    return cancel.run(cmd, **kwargs)
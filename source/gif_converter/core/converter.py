@@ -1,17 +1,54 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from math import ceil, gcd
 from pathlib import Path
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    List,
+    Optional,
+    Tuple,
+)
+import io
+import os
 import subprocess
 import tempfile
+import threading
+import time
 
-from PyQt5.QtCore import QObject, pyqtSignal
+from .cache import PaletteCache, file_fingerprint, get_palette_cache, make_key
+from .cancel import CancelToken, ConversionCancelled
+from .gif import extend_to_duration, frame_delays, join_gifs, merge_static_frames
+from .progress import FfmpegProgress, ProgressParser, RateLimiter, StderrTail
+from .telemetry import TaskTelemetry, sample_rss, wait_with_rusage
+from .utils import probe_duration, format_seconds_to_timestamp
 
-from .utils import (
-    probe_duration,
-    parse_progress_time_from_line,
-    format_seconds_to_timestamp,
-)
+if TYPE_CHECKING:
+    from .stream import StreamSink
+
+DITHER = "sierra2_4a"
+
+# 1プロセス変換では palettegen が入力末尾に達するまで split の片側を
+# バッファし続けるため、展開後のフレーム総量がこれを超える場合は2パスで処理する
+SINGLE_PASS_MAX_BUFFER_BYTES = 1536 * 1024 * 1024
+
+# 分割並列変換で1区間がこれより短くならないようにする（秒）
+MIN_SEGMENT_SECONDS = 2.0
+
+# 静止フレームの間引き（mpdecimate 相当）のしきい値。8x8ブロックごとの差分和で判定し、
+# HI を超えるブロックが1つでもあるか、LO を超えるブロックが FRAC 以上あれば「変化あり」
+DECIMATE_HI = 64 * 12
+DECIMATE_LO = 64 * 5
+DECIMATE_FRAC = 0.33
+
+# 大きく縮小する場合に lanczos の前に入れる 1/2 縮小（画質への影響が小さく、格段に速い）
+PRESCALE_FILTER = "scale=iw/2:-2:flags=fast_bilinear"
+# 出力先に指定すると、ファイルではなく ffmpeg の標準出力へ書き出させる
+PIPE_OUTPUT = Path("pipe:1")
 
 
 @dataclass
@@ -24,110 +61,813 @@ class ConversionTask:
     start: float  # 秒
     duration: float  # 秒。0なら最後まで
     output_path: Optional[Path] = None
+    single_pass: bool = True  # Falseなら従来の2パス（パレット画像を経由）
+    use_palette_cache: bool = True  # 同条件で生成済みのパレットを再利用する
+    prescaled: bool = False  # 入力が fps/幅 適用済みの中間ファイル（プレビュー用）
+    engine: str = "ffmpeg"  # "numpy" ならプロセス内パイプライン（core/pipeline.py）
+    segments: int = 0  # 2以上なら時間軸をN分割して並列にパレット適用する
+    diff_frames: bool = False  # 変化した矩形だけ再ディザし、同一フレームは統合する
+    decimate: bool = False  # ほぼ同じ連続フレームを間引き、前のフレームの表示時間に含める
+    target_bytes: int = 0  # 0以外なら出力がこのサイズに収まるよう fps/幅/色数 を下げる
+    # デコード側の調整（core/tuning.py の tune_task で決める）
+    threads: int = 0  # ffmpeg 1本あたりのスレッド数。0なら ffmpeg に任せる
+    lowres: int = 0  # デコーダ側で 1/2^n に縮小する（対応コーデックのみ）
+    prescale: bool = False  # lanczos の前に安価な 1/2 縮小を入れる
+
+
+def _decoder_args(task: ConversionTask) -> List[str]:
+    # 入力ごとのデコーダ設定（-i の前に置く）
+    args: List[str] = []
+    if task.threads > 0:
+        args += ["-threads", str(task.threads)]
+    if task.lowres > 0:
+        args += ["-lowres", str(task.lowres)]
+    return args
+
+
+def _thread_args(task: ConversionTask) -> List[str]:
+    # フィルタグラフのスレッド数（-vf/-lavfi と -filter_complex の両方）
+    if task.threads <= 0:
+        return []
+    n = str(task.threads)
+    return ["-filter_threads", n, "-filter_complex_threads", n]
+
+
+def _input_args(task: ConversionTask) -> List[str]:
+    args = _decoder_args(task)
+    if task.start > 0:
+        args += ["-ss", format_seconds_to_timestamp(task.start)]
+    args += ["-i", str(task.input_path)]
+    return args
+
+
+def _duration_args(task: ConversionTask) -> List[str]:
+    if task.duration > 0:
+        return ["-t", format_seconds_to_timestamp(task.duration)]
+    return []
+
+
+def _base_filters(task: ConversionTask) -> List[str]:
+    filters: List[str] = []
+    if not task.prescaled:
+        filters.append(f"fps={task.fps}")
+        if task.prescale:
+            filters.append(PRESCALE_FILTER)
+        filters.append(f"scale={task.width}:-1:flags=lanczos")
+    if task.decimate:
+        # 間引いたフレームの分は残ったフレームの表示時間になる（GIFは可変フレームレート）
+        filters.append(
+            f"mpdecimate=hi={DECIMATE_HI}:lo={DECIMATE_LO}:frac={DECIMATE_FRAC}"
+        )
+    return filters
+
+
+def _palettegen_filter(task: ConversionTask) -> str:
+    # 差分モードでは変化した画素の色を優先してパレットに割り当てる
+    stats = "diff" if task.diff_frames else "full"
+    return f"palettegen=max_colors={task.colors}:stats_mode={stats}"
+
+
+def _paletteuse_filter(task: ConversionTask) -> str:
+    if task.diff_frames:
+        # 変化した矩形の外はディザし直さず、前フレームと同じ番号のまま残す。
+        # GIFエンコーダは既定（gifflags=offsetting+transdiff）で前と同じ番号の画素を
+        # 透過にして変化範囲だけを書くので、ディザの揺らぎが無くなる分だけ小さくなる
+        return f"paletteuse=dither={DITHER}:diff_mode=rectangle"
+    return f"paletteuse=dither={DITHER}"
+
+
+def _output_args(out_path: Path) -> List[str]:
+    if out_path == PIPE_OUTPUT:
+        # パイプでは拡張子から形式を決められない
+        return ["-f", "gif", "pipe:1"]
+    return [str(out_path)]
+
+
+def build_palettegen_cmd(task: ConversionTask, palette: Path) -> List[str]:
+    # 2パス目の前段: パレット画像を書き出す
+    cmd = ["ffmpeg", "-y", *_thread_args(task)]
+    cmd += _input_args(task)
+    cmd += _duration_args(task)
+    cmd += [
+        "-vf",
+        ",".join(_base_filters(task) + [_palettegen_filter(task)]),
+        str(palette),
+    ]
+    return cmd
+
+
+def build_paletteuse_cmd(
+    task: ConversionTask, palette: Path, out_path: Path
+) -> List[str]:
+    cmd = ["ffmpeg", "-y", *_thread_args(task)]
+    cmd += _input_args(task)
+    cmd += ["-i", str(palette)]
+    cmd += _duration_args(task)
+    cmd += [
+        "-lavfi",
+        ",".join(_base_filters(task) + [_paletteuse_filter(task)]),
+    ]
+    cmd += ["-loop", "0", *_output_args(out_path)]
+    return cmd
+
 
+def build_single_pass_cmd(
+    task: ConversionTask, out_path: Path, palette_out: Optional[Path] = None
+) -> List[str]:
+    # 1回のデコードを split で palettegen と paletteuse に分岐させる
+    # palette_out を指定すると、生成したパレットも画像として書き出す（キャッシュ用）
+    graph = (
+        ",".join(_base_filters(task) + ["split"])
+        + "[a][b];"
+        + f"[a]{_palettegen_filter(task)}"
+    )
+    if palette_out:
+        graph += ",split[p][q];"
+    else:
+        graph += "[p];"
+    graph += f"[b][p]{_paletteuse_filter(task)}[out]"
+    cmd = ["ffmpeg", "-y", *_thread_args(task)]
+    cmd += _input_args(task)
+    cmd += _duration_args(task)
+    cmd += [
+        "-filter_complex",
+        graph,
+        "-map",
+        "[out]",
+    ]
+    cmd += ["-loop", "0", *_output_args(out_path)]
+    if palette_out:
+        cmd += ["-map", "[q]", "-frames:v", "1", "-update", "1", str(palette_out)]
+    return cmd
 
-class ConverterWorker(QObject):
-    progress = pyqtSignal(str, float, str)  # file, percent[0-100], message
-    finished = pyqtSignal(str, bool, str, str)  # file, success, output_path, error
-    log = pyqtSignal(str)
 
-    def convert(self, task: ConversionTask) -> None:
+def palette_cache_key(task: ConversionTask) -> str:
+    # palettegen までのフィルタ文字列ごとキーに含め、条件が変われば別エントリになるようにする
+    parts = [
+        file_fingerprint(task.input_path),
+        format_seconds_to_timestamp(task.start),
+        format_seconds_to_timestamp(task.duration),
+        ",".join(_base_filters(task) + [_palettegen_filter(task)]),
+    ]
+    if task.lowres:
+        # デコーダ側の縮小でも画素が変わる（既存のキーは変えないよう、使うときだけ足す）
+        parts.append(f"lowres={task.lowres}")
+    return make_key(*parts)
+
+
+def estimate_buffer_bytes(task: ConversionTask, total_duration: float) -> int:
+    # 高さは未知なので16:9を仮定、split後のフレームは4バイト/画素として概算
+    frames = max(1.0, total_duration * task.fps)
+    height = max(1, task.width * 9 // 16)
+    return int(frames * task.width * height * 4)
+
+
+def gif_pts_cs(frame_index: int, fps: int) -> int:
+    # ffmpegのGIFマクサーと同じく 1/fps → 1/100秒 へ四捨五入で変換
+    return (frame_index * 200 + fps) // (2 * fps)
+
+
+@dataclass
+class Segment:
+    first_frame: int
+    frames: int  # 最終区間は0（範囲の残りすべて）
+    task: ConversionTask
+
+
+def plan_segments(
+    task: ConversionTask, total_duration: float, count: int
+) -> List[Segment]:
+    """
+    出力フレーム単位で区間を分割する。境界は 1/100秒 に乗るフレームに揃え、
+    区間ごとのGIFのタイムスタンプ丸めが通しで変換した場合と一致するようにする。
+    分割できないほど短い場合は空リスト。
+    """
+    count = min(count, int(total_duration // MIN_SEGMENT_SECONDS))
+    if count < 2:
+        return []
+    unit = task.fps // gcd(task.fps, 100)
+    total_frames = int(ceil(total_duration * task.fps))
+    step = (total_frames // count) // unit * unit
+    if step <= 0:
+        return []
+    # 区間は同時に走るので、1本あたりのスレッド数を区間数で割る
+    threads = max(1, task.threads // count) if task.threads > 0 else 0
+    segments: List[Segment] = []
+    for i in range(count):
+        first = i * step
+        last = i == count - 1
+        start = task.start + first / task.fps
+        if not last:
+            # -t はフィルタ後のタイムスタンプで切るので、半フレーム手前で止めて
+            # ちょうど step 枚になるようにする
+            frames = step
+            duration = (step - 0.5) / task.fps
+        elif task.duration > 0:
+            frames = 0
+            duration = task.start + task.duration - start
+        else:
+            frames = 0
+            duration = 0.0
+        segments.append(
+            Segment(
+                first,
+                frames,
+                replace(task, start=start, duration=duration, threads=threads),
+            )
+        )
+    return segments
+
+
+def resolve_output_path(task: ConversionTask) -> Path:
+    return task.output_path or (task.output_dir / (task.input_path.stem + ".gif"))
+
+
+def partial_output_path(out_path: Path) -> Path:
+    """
+    変換中に書く一時ファイル。完成してから out_path へ名前を変えるので、
+    途中で落ちても完成品に見える出力は残らない（拡張子は ffmpeg の形式判定のため .gif）
+    """
+    return out_path.with_name(f"{out_path.stem}.partial.gif")
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+ProgressCallback = Callable[[str, float, str], None]  # file, percent, message
+LogCallback = Callable[[str], None]
+
+
+class Converter:
+    """Qtに依存しない変換本体。進捗/ログはコールバックで通知する"""
+
+    def __init__(
+        self,
+        on_progress: Optional[ProgressCallback] = None,
+        on_log: Optional[LogCallback] = None,
+        palette_cache: Optional[PaletteCache] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ) -> None:
+        self.on_progress = on_progress
+        self.on_log = on_log
+        self.palette_cache = palette_cache
+        self.cancel_token = cancel_token or CancelToken()
+        # 変換中の計測と、直近の convert() の計測結果
+        self.telemetry: Optional[TaskTelemetry] = None
+        self.last_telemetry: Optional[TaskTelemetry] = None
+
+    def cancel(self) -> None:
+        """実行中の ffmpeg を止め、convert() を ConversionCancelled で終わらせる（別スレッドから呼ぶ）"""
+        self.cancel_token.cancel()
+
+    def _log(self, text: str) -> None:
+        if self.on_log:
+            self.on_log(text)
+
+    def stage(self, name: str) -> ContextManager[None]:
+        """計測中なら name の工程として所要時間を記録する"""
+        return self.telemetry.stage(name) if self.telemetry else nullcontext()
+
+    def convert(self, task: ConversionTask) -> Path:
+        """変換して出力パスを返す。失敗時は RuntimeError（中断時は ConversionCancelled）"""
+        if self.telemetry is not None:
+            # 目標サイズの本変換など、変換中の入れ子の呼び出しは同じ計測に含める
+            return self._convert_checked(task)
+        tel = TaskTelemetry(
+            input_path=str(task.input_path),
+            output_path=str(resolve_output_path(task)),
+            engine=task.engine,
+        )
+        return self._measured(tel, lambda: [self._convert_atomic(task)])[0]
+
+    def convert_many(self, tasks: List[ConversionTask]) -> List[Path]:
+        """
+        同じ入力・同じ範囲を複数の設定（プリセット）で変換し、出力パスを tasks の順に返す。
+        ffmpeg エンジンでは1回のデコードを枝分かれさせて全部を書き出す（core/fanout.py）
+        """
+        if len(tasks) == 1:
+            return [self.convert(tasks[0])]
+        from .fanout import convert_fanout
+
+        tel = TaskTelemetry(
+            input_path=str(tasks[0].input_path),
+            output_path=", ".join(str(resolve_output_path(t)) for t in tasks),
+            engine=f"{tasks[0].engine}x{len(tasks)}",
+        )
+        return self._measured(tel, lambda: convert_fanout(self, tasks))
+
+    def convert_to_stream(
+        self, task: ConversionTask, stream: BinaryIO, chunk_size: int = 0
+    ) -> int:
+        """
+        GIFをファイルではなく stream（標準出力などのパイプ）へ書き出し、書いたバイト数を返す。
+        エンコードしながら chunk_size ずつ渡す（書きながら作れない設定は一時ファイルを経由）。
+        task.output_path/output_dir は使わない
+        """
+        from .stream import STREAM_CHUNK_BYTES, StreamSink
+
+        sink = StreamSink(stream, chunk_size or STREAM_CHUNK_BYTES)
+        tel = TaskTelemetry(
+            input_path=str(task.input_path), output_path="-", engine=task.engine
+        )
+        self._measured(tel, lambda: self._stream_checked(task, sink))
+        return sink.written
+
+    def _measured(
+        self, tel: TaskTelemetry, run: Callable[[], List[Path]]
+    ) -> List[Path]:
+        self.telemetry = tel
+        t0 = time.perf_counter()
+        try:
+            outs = run()
+            tel.ok = True
+            if outs:
+                tel.output_path = ", ".join(str(out) for out in outs)
+                tel.output_bytes = sum(_size(out) for out in outs)
+            return outs
+        except ConversionCancelled:
+            tel.cancelled = True
+            raise
+        except Exception as e:
+            tel.error = str(e)
+            raise
+        finally:
+            tel.wall = time.perf_counter() - t0
+            self.telemetry = None
+            self.last_telemetry = tel
+            if tel.ok:
+                self._log(tel.summary())
+
+    def _convert_atomic(self, task: ConversionTask) -> Path:
+        # 一時ファイルに書き上げ、後処理まで終えてから置き換える
+        out_path = resolve_output_path(task)
+        partial = partial_output_path(out_path)
+        self._convert_checked(replace(task, output_path=partial))
+        try:
+            os.replace(partial, out_path)
+        except OSError as e:
+            partial.unlink(missing_ok=True)
+            raise RuntimeError(f"出力ファイルを書き込めません: {out_path}（{e}）")
+        return out_path
+
+    def _convert_checked(self, task: ConversionTask) -> Path:
+        total_duration = self._prepare(task)
+        out_path = resolve_output_path(task)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        before = _mtime(out_path)
+        try:
+            return self._convert(task, out_path, total_duration)
+        except BaseException:
+            # 途中まで書かれた出力は壊れているので残さない（手を付けていない既存ファイルは残す）
+            if _mtime(out_path) != before:
+                out_path.unlink(missing_ok=True)
+            raise
+
+    def _prepare(self, task: ConversionTask) -> float:
+        # 入力を確かめて、変換する尺（秒）を返す
+        self.cancel_token.check()
         inp = task.input_path
         if not inp.exists():
-            self.finished.emit(str(inp), False, "", "入力ファイルが見つかりません")
-            return
-        total_duration = (
-            task.duration if task.duration > 0 else probe_duration(inp) - task.start
-        )
+            raise RuntimeError("入力ファイルが見つかりません")
+        if task.duration > 0:
+            total_duration = task.duration
+        else:
+            with self.stage("probe"):
+                total_duration = probe_duration(inp) - task.start
         total_duration = max(total_duration, 0.00001)
+        tel = self.telemetry
+        if tel is not None:
+            # 入れ子の場合は最後（= 本変換）の条件が残る
+            tel.input_bytes = _size(inp)
+            tel.media_seconds = total_duration
+            tel.frames = int(round(total_duration * task.fps))
+        return total_duration
+
+    def _stream_checked(self, task: ConversionTask, sink: "StreamSink") -> List[Path]:
+        from .stream import can_stream, copy_to_sink
+
+        total_duration = self._prepare(task)
+        if not can_stream(task):
+            self._log("この設定は書き出しながら変換できないため、一時ファイルを経由します")
+            with tempfile.TemporaryDirectory(prefix="gifconv_") as td:
+                out_path = Path(td) / "out.gif"
+                self._convert(
+                    replace(task, output_path=out_path), out_path, total_duration
+                )
+                with self.stage("copy"):
+                    copy_to_sink(out_path, sink)
+        elif task.engine == "numpy":
+            from .pipeline import convert_in_process
+
+            convert_in_process(
+                task,
+                total_duration,
+                self.on_progress,
+                self.on_log,
+                self.cancel_token,
+                self.telemetry,
+                stream=sink,
+            )
+        else:
+            self._encode_stream(task, sink, total_duration)
+        if self.telemetry is not None:
+            self.telemetry.output_bytes = sink.written
+        return []
+
+    def _convert(
+        self, task: ConversionTask, out_path: Path, total_duration: float
+    ) -> Path:
+        if task.target_bytes > 0:
+            # fps/幅/色数 はタスクの値を上限として自動で選ぶ
+            from .sizing import convert_to_target
+
+            return convert_to_target(self, task, total_duration)
+        if task.engine == "numpy":
+            # numpy は任意依存なので使うときだけ読み込む
+            from .pipeline import convert_in_process
+
+            return convert_in_process(
+                task,
+                total_duration,
+                self.on_progress,
+                self.on_log,
+                self.cancel_token,
+                self.telemetry,
+            )
+        self._encode(task, out_path, total_duration)
+        if task.decimate or task.diff_frames:
+            with self.stage("postprocess"):
+                if task.decimate:
+                    self._keep_total_duration(task, out_path, total_duration)
+                if task.diff_frames:
+                    self._merge_static_frames(out_path)
+        return out_path
+
+    def _encode(
+        self, task: ConversionTask, out_path: Path, total_duration: float
+    ) -> None:
+        cached = self._lookup_palette(task)
+        if task.segments > 1:
+            segments = plan_segments(task, total_duration, task.segments)
+            if segments:
+                try:
+                    self._convert_segmented(
+                        task, out_path, total_duration, segments, cached
+                    )
+                    return
+                except ConversionCancelled:
+                    raise
+                except Exception as e:
+                    self._log(f"分割並列変換に失敗したため通常変換で再試行します: {e}")
+            else:
+                self._log("尺が短いため分割せずに変換します")
+        if cached:
+            # パレットが既にあるので1パス目（パレット生成）は不要
+            self._apply_palette(task, cached, out_path, total_duration)
+            return
+        use_single = task.single_pass
+        if (
+            use_single
+            and estimate_buffer_bytes(task, total_duration)
+            > SINGLE_PASS_MAX_BUFFER_BYTES
+        ):
+            self._log("長尺のため2パス変換に切り替えます")
+            use_single = False
+        if use_single:
+            try:
+                self._convert_single_pass(task, out_path, total_duration)
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                # 古いffmpeg等で失敗した場合は従来の2パスで再試行
+                self._log(f"1パス変換に失敗したため2パスで再試行します: {e}")
+                self._convert_two_pass(task, out_path, total_duration)
+        else:
+            self._convert_two_pass(task, out_path, total_duration)
+
+    def _encode_stream(
+        self, task: ConversionTask, sink: "StreamSink", total_duration: float
+    ) -> None:
+        # _encode と同じ選び方で、GIFは ffmpeg の標準出力から sink へ渡す
+        cached = self._lookup_palette(task)
+        if cached:
+            self._apply_palette(task, cached, PIPE_OUTPUT, total_duration, sink=sink)
+            return
+        use_single = task.single_pass
+        if (
+            use_single
+            and estimate_buffer_bytes(task, total_duration)
+            > SINGLE_PASS_MAX_BUFFER_BYTES
+        ):
+            self._log("長尺のため2パス変換に切り替えます")
+            use_single = False
+        if use_single:
+            try:
+                self._convert_single_pass(task, PIPE_OUTPUT, total_duration, sink)
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                # 書き出し済みの分は取り消せないので、まだ何も渡していない場合だけ再試行
+                if sink.written or sink.failed:
+                    raise
+                self._log(f"1パス変換に失敗したため2パスで再試行します: {e}")
+                self._convert_two_pass(task, PIPE_OUTPUT, total_duration, sink)
+        else:
+            self._convert_two_pass(task, PIPE_OUTPUT, total_duration, sink)
+
+    def _keep_total_duration(
+        self, task: ConversionTask, out_path: Path, total_duration: float
+    ) -> None:
+        # 末尾が静止していると最後のフレームが1コマ分で終わるため、元の尺まで延ばす
+        expected = gif_pts_cs(int(round(total_duration * task.fps)), task.fps)
+        try:
+            added = extend_to_duration(out_path, expected)
+        except (OSError, ValueError) as e:
+            self._log(f"末尾フレームの表示時間を補正できませんでした: {e}")
+            return
+        if added:
+            self._log(f"末尾の静止部分 {added / 100:.2f} 秒を最後のフレームに含めました")
 
+    def _merge_static_frames(self, out_path: Path) -> None:
+        try:
+            merged, saved = merge_static_frames(out_path)
+        except (OSError, ValueError) as e:
+            # 統合できなくても出力自体は正しいので失敗扱いにしない
+            self._log(f"同一フレームの統合をスキップしました: {e}")
+            return
+        if merged:
+            self._log(
+                f"同一フレーム {merged} 枚を前のフレームの表示時間に統合しました"
+                f"（{saved:,} バイト削減）"
+            )
+
+    def _cache(self, task: ConversionTask) -> Optional[PaletteCache]:
+        if not task.use_palette_cache:
+            return None
+        return self.palette_cache or get_palette_cache()
+
+    def _lookup_palette(self, task: ConversionTask) -> Optional[Path]:
+        cache = self._cache(task)
+        if not cache:
+            return None
+        try:
+            palette = cache.get(palette_cache_key(task))
+        except OSError:
+            return None
+        state = "ヒット" if palette else "ミス"
+        self._log(f"パレットキャッシュ: {state}（{cache.stats_text()}）")
+        return palette
+
+    def _store_palette(self, task: ConversionTask, palette: Path) -> None:
+        cache = self._cache(task)
+        if not cache or not palette.exists():
+            return
+        try:
+            cache.put(palette_cache_key(task), palette)
+        except OSError as e:
+            # キャッシュに書けなくても変換自体は成功扱い
+            self._log(f"パレットキャッシュへの保存に失敗しました: {e}")
+
+    def _apply_palette(
+        self,
+        task: ConversionTask,
+        palette: Path,
+        out_path: Path,
+        total_duration: float,
+        span: Tuple[float, float] = (0.0, 100.0),
+        sink: Optional["StreamSink"] = None,
+    ) -> None:
+        self._log("GIF生成を開始しました")
+        with self.stage("paletteuse"):
+            self._run_with_progress(
+                build_paletteuse_cmd(task, palette, out_path),
+                task,
+                total_duration,
+                span,
+                sink=sink,
+            )
+
+    def _convert_single_pass(
+        self,
+        task: ConversionTask,
+        out_path: Path,
+        total_duration: float,
+        sink: Optional["StreamSink"] = None,
+    ) -> None:
+        self._log("GIF生成を開始しました（1パス）")
+        with tempfile.TemporaryDirectory(prefix="gifconv_") as td, self.stage(
+            "single_pass"
+        ):
+            palette = Path(td) / "palette.png" if self._cache(task) else None
+            self._run_with_progress(
+                build_single_pass_cmd(task, out_path, palette),
+                task,
+                total_duration,
+                sink=sink,
+            )
+            if palette:
+                self._store_palette(task, palette)
+
+    def _generate_palette(
+        self,
+        task: ConversionTask,
+        palette: Path,
+        total_duration: float,
+        span: Tuple[float, float],
+    ) -> None:
+        self._log("パレット生成を開始しました")
+        with self.stage("palettegen"):
+            self._run_with_progress(
+                build_palettegen_cmd(task, palette), task, total_duration, span
+            )
+        if not palette.exists():
+            raise RuntimeError("パレット生成に失敗しました")
+        self._store_palette(task, palette)
+
+    def _convert_two_pass(
+        self,
+        task: ConversionTask,
+        out_path: Path,
+        total_duration: float,
+        sink: Optional["StreamSink"] = None,
+    ) -> None:
+        with tempfile.TemporaryDirectory(prefix="gifconv_") as td:
+            palette = Path(td) / "palette.png"
+            self._generate_palette(task, palette, total_duration, (0.0, 50.0))
+            self._apply_palette(
+                task, palette, out_path, total_duration, (50.0, 100.0), sink
+            )
+
+    def _convert_segmented(
+        self,
+        task: ConversionTask,
+        out_path: Path,
+        total_duration: float,
+        segments: List[Segment],
+        cached: Optional[Path] = None,
+    ) -> None:
         with tempfile.TemporaryDirectory(prefix="gifconv_") as td:
             tmpdir = Path(td)
-            palette = tmpdir / "palette.png"
-            # 1パス目: パレット生成
-            vf_palette = [
-                f"fps={task.fps}",
-                f"scale={task.width}:-1:flags=lanczos",
-                f"palettegen=max_colors={task.colors}:stats_mode=full",
-            ]
-            cmd1 = [
-                "ffmpeg",
-                "-y",
-            ]
-            if task.start > 0:
-                cmd1 += ["-ss", format_seconds_to_timestamp(task.start)]
-            cmd1 += [
-                "-i",
-                str(inp),
-            ]
-            if task.duration > 0:
-                cmd1 += ["-t", format_seconds_to_timestamp(task.duration)]
-            cmd1 += [
-                "-vf",
-                ",".join(vf_palette),
-                str(palette),
-            ]
+            # パレットは全区間で共通（通しで変換した場合と同じ色になる）
+            if cached:
+                palette = cached
+                base = 0.0
+            else:
+                palette = tmpdir / "palette.png"
+                self._generate_palette(task, palette, total_duration, (0.0, 30.0))
+                base = 30.0
 
-            # 2パス目: パレット適用
-            vf_use = [
-                f"fps={task.fps}",
-                f"scale={task.width}:-1:flags=lanczos",
-                f"paletteuse=dither=sierra2_4a",
-            ]
-            out_path = task.output_path or (task.output_dir / (inp.stem + ".gif"))
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            cmd2 = [
-                "ffmpeg",
-                "-y",
-            ]
-            if task.start > 0:
-                cmd2 += ["-ss", format_seconds_to_timestamp(task.start)]
-            cmd2 += [
-                "-i",
-                str(inp),
-                "-i",
-                str(palette),
-            ]
-            if task.duration > 0:
-                cmd2 += ["-t", format_seconds_to_timestamp(task.duration)]
-            cmd2 += [
-                "-lavfi",
-                ",".join(vf_use),
-                "-loop",
-                "0",
-                str(out_path),
+            self._log(f"{len(segments)} 区間に分割してGIF生成を開始しました")
+            lock = threading.Lock()
+            ratios = [0.0] * len(segments)
+            limiter = RateLimiter()
+
+            def report(index: int, ratio: float) -> None:
+                with lock:
+                    ratios[index] = ratio
+                    done = sum(ratios) / len(ratios)
+                    # 区間ごとの通知をまとめて、全体でも一定間隔に抑える
+                    if not limiter.ready(force=done >= 1.0):
+                        return
+                if self.on_progress:
+                    self.on_progress(
+                        str(task.input_path), base + (100.0 - base) * done, ""
+                    )
+
+            def run(index: int) -> Path:
+                seg = segments[index]
+                part = tmpdir / f"part{index:03d}.gif"
+                seg_total = (
+                    seg.task.duration
+                    if seg.task.duration > 0
+                    else max(total_duration - seg.first_frame / task.fps, 0.00001)
+                )
+                self._run_with_progress(
+                    build_paletteuse_cmd(seg.task, palette, part),
+                    seg.task,
+                    seg_total,
+                    on_ratio=lambda r: report(index, r),
+                )
+                return part
+
+            with self.stage("segments"), ThreadPoolExecutor(
+                max_workers=len(segments)
+            ) as ex:
+                parts = list(ex.map(run, range(len(segments))))
+
+            # 区間末尾のフレームは次区間の先頭までの表示時間に合わせる
+            last_delays = [
+                gif_pts_cs(seg.first_frame + seg.frames, task.fps)
+                - gif_pts_cs(seg.first_frame + seg.frames - 1, task.fps)
+                if seg.frames
+                else None
+                for seg in segments
             ]
+            if task.decimate:
+                # 間引きでフレーム数が変わるので、区間の尺から残りを求める
+                for i, (seg, part) in enumerate(zip(segments, parts)):
+                    if not seg.frames:
+                        continue
+                    end = gif_pts_cs(seg.first_frame + seg.frames, task.fps)
+                    span = end - gif_pts_cs(seg.first_frame, task.fps)
+                    last_delays[i] = max(1, span - sum(frame_delays(part)[:-1]))
+            with self.stage("join"):
+                count = join_gifs(parts, out_path, last_delays)
+            self._log(f"分割GIFを連結しました（{count} フレーム）")
 
-            # 実行と進捗
-            try:
-                self.log.emit("パレット生成を開始しました")
-                self._run_with_progress(cmd1, total_duration)
-                if not palette.exists():
-                    raise RuntimeError("パレット生成に失敗しました")
-                self.log.emit("GIF生成を開始しました")
-                self._run_with_progress(cmd2, total_duration)
-                self.finished.emit(str(inp), True, str(out_path), "")
-            except Exception as e:
-                self.finished.emit(str(inp), False, "", str(e))
-
-    def _run_with_progress(self, cmd: list[str], total_duration: float) -> None:
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-        )
-        # ffmpegはstderrに進捗を出す
-        assert proc.stderr is not None
-        for line in proc.stderr:
-            t = parse_progress_time_from_line(line)
-            if t is not None:
-                percent = max(0.0, min(100.0, (t / total_duration) * 100.0))
-                self.progress.emit(cmd[-1], percent, line.strip())
-        proc.wait()
+    def _run_with_progress(
+        self,
+        cmd: list[str],
+        task: ConversionTask,
+        total_duration: float,
+        span: Tuple[float, float] = (0.0, 100.0),
+        on_ratio: Optional[Callable[[float], None]] = None,
+        sink: Optional["StreamSink"] = None,
+    ) -> None:
+        limiter = RateLimiter()
+        tel = self.telemetry
+        # 2パス時は各パスを span の範囲に割り当てる
+        lo, hi = span
+
+        def report(p: FfmpegProgress) -> None:
+            if not limiter.ready(force=p.done):
+                return
+            if p.done and tel:
+                # wait4 が使えない環境（Windows）は終了直前の値で代用する
+                tel.record_rss(sample_rss(proc))
+            ratio = max(0.0, min(1.0, p.out_time / total_duration))
+            if on_ratio:
+                on_ratio(ratio)
+            elif self.on_progress:
+                self.on_progress(
+                    str(task.input_path), lo + (hi - lo) * ratio, p.summary()
+                )
+
+        if sink is None:
+            # 進捗は -progress で stdout に key=value で出させ、stderr はエラー表示用に末尾だけ残す
+            cmd = [cmd[0], "-hide_banner", "-nostats", "-progress", "pipe:1", *cmd[1:]]
+            proc = self.cancel_token.popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+        else:
+            # stdout はGIFそのものなので、進捗は stderr に混ぜて出させて読み分ける
+            cmd = [cmd[0], "-hide_banner", "-nostats", "-progress", "pipe:2", *cmd[1:]]
+            proc = self.cancel_token.popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        assert proc.stdout is not None and proc.stderr is not None
+        try:
+            if sink is None:
+                tail = StderrTail(proc.stderr)
+                parser = ProgressParser()
+                for line in proc.stdout:
+                    p = parser.feed(line)
+                    if p is not None:
+                        report(p)
+            else:
+                stderr = io.TextIOWrapper(
+                    proc.stderr, encoding="utf-8", errors="replace"
+                )
+                tail = StderrTail(stderr, on_progress=report)
+                self._pipe_to_sink(proc, sink)
+                tail.join()
+            rss = wait_with_rusage(proc)
+            if tel:
+                tel.record_rss(rss)
+        finally:
+            self.cancel_token.release(proc)
+        self.cancel_token.check()
         if proc.returncode != 0:
-            # 失敗時はエラーを読み取る
-            err = proc.stderr.read() if proc.stderr else "ffmpeg failed"
-            raise RuntimeError(f"ffmpegエラー: {err[:400]}...")
+            err = tail.text() or f"終了コード {proc.returncode}"
+            raise RuntimeError(f"ffmpegエラー: {err[-400:]}")
+
+    def _pipe_to_sink(self, proc: subprocess.Popen, sink: "StreamSink") -> None:
+        # エンコードされた分から順に書き出す（書き出し先が詰まれば ffmpeg も待つ）
+        assert proc.stdout is not None
+        try:
+            while True:
+                chunk = proc.stdout.read1(sink.chunk_size)
+                if not chunk:
+                    break
+                sink.write(chunk)
+        except BaseException:
+            # 書き出し先が閉じられた等。残りを作っても渡せないので止める
+            proc.kill()
+            proc.wait()
+            raise
@@ -0,0 +1,257 @@
+"""
+1回のデコードから複数の設定（プリセット）のGIFを書き出す
+
+入力を split で枝分かれさせ、枝ごとに fps/縮小/パレット生成/パレット適用を行って
+すべての出力を1回の ffmpeg で書き出す。プリセットごとに2パスで変換すると
+3プリセットで6回デコードするところが、1回（長尺や2パス指定では2回）で済む。
+"""
+
+from __future__ import annotations
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import os
+import tempfile
+
+from .cancel import ConversionCancelled
+from .converter import (
+    SINGLE_PASS_MAX_BUFFER_BYTES,
+    ConversionTask,
+    _base_filters,
+    _duration_args,
+    _input_args,
+    _palettegen_filter,
+    _paletteuse_filter,
+    _thread_args,
+    estimate_buffer_bytes,
+    partial_output_path,
+    resolve_output_path,
+)
+from .utils import probe_duration
+
+if TYPE_CHECKING:
+    from .converter import Converter
+
+FanoutKey = Tuple[str, float, float, bool, bool, bool]
+
+
+def fanout_key(task: ConversionTask) -> Optional[FanoutKey]:
+    """
+    同じデコードを共有できるタスクは同じキーになる（共有できないものは None）。
+    目標サイズ/NumPyエンジン/分割並列/プレビュー用の中間ファイルは個別に変換する
+    """
+    if task.engine != "ffmpeg" or task.target_bytes > 0 or task.prescaled:
+        return None
+    if task.segments > 1:
+        # 分割並列は区間ごとに別プロセスで変換するので、まとめると並列にならない
+        return None
+    return (
+        os.path.abspath(task.input_path),
+        task.start,
+        task.duration,
+        task.single_pass,
+        task.diff_frames,
+        task.decimate,
+    )
+
+
+def group_tasks(tasks: List[ConversionTask]) -> List[List[ConversionTask]]:
+    """同じデコードを共有できるタスクをまとめる（先に現れた順、まとまらないものは1件ずつ）"""
+    groups: List[List[ConversionTask]] = []
+    index: Dict[FanoutKey, List[ConversionTask]] = {}
+    for task in tasks:
+        key = fanout_key(task)
+        if key is None:
+            groups.append([task])
+        elif key in index:
+            index[key].append(task)
+        else:
+            index[key] = [task]
+            groups.append(index[key])
+    return groups
+
+
+def _split(n: int) -> str:
+    return f"[0:v]split={n}" + "".join(f"[s{i}]" for i in range(n))
+
+
+def build_fanout_cmd(
+    tasks: List[ConversionTask],
+    outputs: List[Path],
+    palettes_out: Optional[List[Path]] = None,
+) -> List[str]:
+    # 1プロセス版: 枝ごとに split → palettegen / paletteuse（build_single_pass_cmd と同じ形）
+    base = tasks[0]
+    graph = [_split(len(tasks))]
+    for i, task in enumerate(tasks):
+        branch = (
+            f"[s{i}]"
+            + ",".join(_base_filters(task) + ["split"])
+            + f"[a{i}][b{i}];[a{i}]{_palettegen_filter(task)}"
+        )
+        branch += f",split[p{i}][q{i}]" if palettes_out else f"[p{i}]"
+        branch += f";[b{i}][p{i}]{_paletteuse_filter(task)}[o{i}]"
+        graph.append(branch)
+    cmd = ["ffmpeg", "-y", *_thread_args(base)]
+    cmd += _input_args(base)
+    cmd += _duration_args(base)
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i, out in enumerate(outputs):
+        cmd += ["-map", f"[o{i}]", "-loop", "0", str(out)]
+    for i, palette in enumerate(palettes_out or []):
+        cmd += ["-map", f"[q{i}]", "-frames:v", "1", "-update", "1", str(palette)]
+    return cmd
+
+
+def build_fanout_palettegen_cmd(
+    tasks: List[ConversionTask], palettes: List[Path]
+) -> List[str]:
+    # 2パス版の1パス目: 1回のデコードで全部のパレット画像を書き出す
+    base = tasks[0]
+    graph = [_split(len(tasks))]
+    for i, task in enumerate(tasks):
+        graph.append(
+            f"[s{i}]" + ",".join(_base_filters(task) + [_palettegen_filter(task)])
+            + f"[p{i}]"
+        )
+    cmd = ["ffmpeg", "-y", *_thread_args(base)]
+    cmd += _input_args(base)
+    cmd += _duration_args(base)
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i, palette in enumerate(palettes):
+        cmd += ["-map", f"[p{i}]", str(palette)]
+    return cmd
+
+
+def build_fanout_paletteuse_cmd(
+    tasks: List[ConversionTask], palettes: List[Path], outputs: List[Path]
+) -> List[str]:
+    # 2パス版の2パス目（パレットが揃っている場合はこれだけで済む）
+    base = tasks[0]
+    cmd = ["ffmpeg", "-y", *_thread_args(base)]
+    cmd += _input_args(base)
+    for palette in palettes:
+        cmd += ["-i", str(palette)]
+    cmd += _duration_args(base)
+    graph = [_split(len(tasks))]
+    for i, task in enumerate(tasks):
+        filters = ",".join(_base_filters(task))
+        graph.append(
+            f"[s{i}]{filters}[v{i}];[v{i}][{i + 1}:v]{_paletteuse_filter(task)}[o{i}]"
+        )
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i, out in enumerate(outputs):
+        cmd += ["-map", f"[o{i}]", "-loop", "0", str(out)]
+    return cmd
+
+
+def _shared_decoder(tasks: List[ConversionTask]) -> List[ConversionTask]:
+    # デコーダ側の縮小は全部の枝で共通になるので、いちばん控えめな段数に揃える
+    lowres = min(t.lowres for t in tasks)
+    return [replace(t, lowres=lowres) for t in tasks]
+
+
+def convert_fanout(converter: "Converter", tasks: List[ConversionTask]) -> List[Path]:
+    """tasks（同じ fanout_key）をまとめて変換し、出力パスを tasks の順に返す"""
+    keys = {fanout_key(t) for t in tasks}
+    if None in keys or len(keys) != 1:
+        raise ValueError("同じ入力・同じ範囲のタスクだけをまとめて変換できます")
+    converter.cancel_token.check()
+    base = tasks[0]
+    if not base.input_path.exists():
+        raise RuntimeError("入力ファイルが見つかりません")
+    if base.duration > 0:
+        total_duration = base.duration
+    else:
+        with converter.stage("probe"):
+            total_duration = probe_duration(base.input_path) - base.start
+    total_duration = max(total_duration, 0.00001)
+    tel = converter.telemetry
+    if tel is not None:
+        tel.input_bytes = os.path.getsize(base.input_path)
+        tel.media_seconds = total_duration
+        tel.frames = sum(int(round(total_duration * t.fps)) for t in tasks)
+
+    tasks = _shared_decoder(tasks)
+    outputs = [resolve_output_path(t) for t in tasks]
+    partials = [partial_output_path(out) for out in outputs]
+    for out in outputs:
+        out.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        _encode(converter, tasks, partials, total_duration)
+        if base.decimate or base.diff_frames:
+            with converter.stage("postprocess"):
+                for task, partial in zip(tasks, partials):
+                    if task.decimate:
+                        converter._keep_total_duration(task, partial, total_duration)
+                    if task.diff_frames:
+                        converter._merge_static_frames(partial)
+        # すべて書き上がってから置き換える
+        for partial, out in zip(partials, outputs):
+            os.replace(partial, out)
+    except BaseException:
+        for partial in partials:
+            partial.unlink(missing_ok=True)
+        raise
+    return outputs
+
+
+def _encode(
+    converter: "Converter",
+    tasks: List[ConversionTask],
+    outputs: List[Path],
+    total_duration: float,
+) -> None:
+    cached = [converter._lookup_palette(t) for t in tasks]
+    if all(cached):
+        # パレットが揃っていればパレット適用の1回だけ
+        converter._log(f"1回のデコードで {len(tasks)} 種類のGIFを生成します（パレット再利用）")
+        palettes = [p for p in cached if p]
+        with converter.stage("paletteuse"):
+            converter._run_with_progress(
+                build_fanout_paletteuse_cmd(tasks, palettes, outputs),
+                tasks[0],
+                total_duration,
+            )
+        return
+    buffered = sum(estimate_buffer_bytes(t, total_duration) for t in tasks)
+    use_single = tasks[0].single_pass and buffered <= SINGLE_PASS_MAX_BUFFER_BYTES
+    if tasks[0].single_pass and not use_single:
+        converter._log("長尺のためパレット生成と適用を分けて変換します")
+    with tempfile.TemporaryDirectory(prefix="gifconv_") as td:
+        palettes = [Path(td) / f"palette{i}.png" for i in range(len(tasks))]
+        if use_single:
+            converter._log(f"1回のデコードで {len(tasks)} 種類のGIFを生成します（1パス）")
+            try:
+                with converter.stage("single_pass"):
+                    converter._run_with_progress(
+                        build_fanout_cmd(tasks, outputs, palettes),
+                        tasks[0],
+                        total_duration,
+                    )
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                # Converter._encode と同じく、古いffmpeg等で失敗した場合は2パスで再試行
+                converter._log(f"1パス変換に失敗したため2パスで再試行します: {e}")
+                use_single = False
+        if not use_single:
+            converter._log(f"2回のデコードで {len(tasks)} 種類のGIFを生成します")
+            with converter.stage("palettegen"):
+                converter._run_with_progress(
+                    build_fanout_palettegen_cmd(tasks, palettes),
+                    tasks[0],
+                    total_duration,
+                    (0.0, 50.0),
+                )
+            if not all(p.exists() for p in palettes):
+                raise RuntimeError("パレット生成に失敗しました")
+            with converter.stage("paletteuse"):
+                converter._run_with_progress(
+                    build_fanout_paletteuse_cmd(tasks, palettes, outputs),
+                    tasks[0],
+                    total_duration,
+                    (50.0, 100.0),
+                )
+        for task, palette in zip(tasks, palettes):
+            converter._store_palette(task, palette)
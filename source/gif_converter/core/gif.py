@@ -0,0 +1,392 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Sequence, Tuple
+import os
+import struct
+
+# GIF のブロック構造を最低限だけ読み書きする（画像データは再圧縮しない）
+
+EXT_INTRODUCER = 0x21
+IMAGE_SEPARATOR = 0x2C
+TRAILER = 0x3B
+LABEL_GCE = 0xF9
+LABEL_APP = 0xFF
+
+
+@dataclass
+class GifFrame:
+    gce: Optional[bytes]  # Graphic Control Extension（ブロック全体）
+    image: bytes  # Image Descriptor + (LCT) + LZW データ
+    extensions: List[bytes] = field(default_factory=list)  # 直前のその他拡張
+
+    @property
+    def delay(self) -> int:
+        """表示時間（1/100秒）。GCEがなければ0"""
+        if not self.gce:
+            return 0
+        return struct.unpack_from("<H", self.gce, 4)[0]
+
+    def with_delay(self, delay: int) -> "GifFrame":
+        gce = self.gce or bytes([EXT_INTRODUCER, LABEL_GCE, 4, 0, 0, 0, 0, 0])
+        gce = gce[:4] + struct.pack("<H", max(0, min(0xFFFF, delay))) + gce[6:]
+        return GifFrame(gce, self.image, list(self.extensions))
+
+
+@dataclass
+class GifFile:
+    header: bytes  # "GIF89a" + Logical Screen Descriptor
+    global_palette: bytes  # Global Color Table（なければ空）
+    app_extensions: List[bytes]  # NETSCAPE ループ指定など
+    frames: List[GifFrame]
+
+    @property
+    def screen_size(self) -> tuple:
+        return struct.unpack_from("<HH", self.header, 6)
+
+
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    while True:
+        n = data[pos]
+        pos += 1
+        if n == 0:
+            return pos
+        pos += n
+
+
+def _color_table_size(packed: int) -> int:
+    return 3 * (1 << ((packed & 0x07) + 1)) if packed & 0x80 else 0
+
+
+def parse_gif(data: bytes) -> GifFile:
+    if data[:3] != b"GIF":
+        raise ValueError("GIFではありません")
+    packed = data[10]
+    gct_len = _color_table_size(packed)
+    header = data[:13]
+    pos = 13
+    global_palette = data[pos : pos + gct_len]
+    pos += gct_len
+
+    app_extensions: List[bytes] = []
+    frames: List[GifFrame] = []
+    pending_gce: Optional[bytes] = None
+    pending_ext: List[bytes] = []
+    while pos < len(data):
+        b = data[pos]
+        if b == TRAILER:
+            break
+        if b == EXT_INTRODUCER:
+            label = data[pos + 1]
+            end = _skip_sub_blocks(data, pos + 2)
+            block = data[pos:end]
+            if label == LABEL_GCE:
+                pending_gce = block
+            elif label == LABEL_APP and not frames:
+                app_extensions.append(block)
+            else:
+                pending_ext.append(block)
+            pos = end
+        elif b == IMAGE_SEPARATOR:
+            img_packed = data[pos + 9]
+            end = pos + 10 + _color_table_size(img_packed)
+            end = _skip_sub_blocks(data, end + 1)  # +1: LZW最小コードサイズ
+            frames.append(GifFrame(pending_gce, data[pos:end], pending_ext))
+            pending_gce = None
+            pending_ext = []
+            pos = end
+        else:
+            raise ValueError(f"不正なブロック: 0x{b:02x} @ {pos}")
+    return GifFile(header, global_palette, app_extensions, frames)
+
+
+def read_gif(path: Path) -> GifFile:
+    return parse_gif(Path(path).read_bytes())
+
+
+def _with_local_palette(image: bytes, palette: bytes) -> bytes:
+    # グローバルパレットを参照しているフレームへローカルパレットとして埋め込む
+    packed = image[9]
+    if packed & 0x80 or not palette:
+        return image
+    size_bits = (len(palette) // 3).bit_length() - 2
+    packed = (packed & 0x78) | 0x80 | (size_bits & 0x07)
+    return image[:9] + bytes([packed]) + palette + image[10:]
+
+
+def serialize_gif(gif: GifFile) -> bytes:
+    out = bytearray(gif.header)
+    out += gif.global_palette
+    for ext in gif.app_extensions:
+        out += ext
+    for fr in gif.frames:
+        for ext in fr.extensions:
+            out += ext
+        if fr.gce:
+            out += fr.gce
+        out += fr.image
+    out.append(TRAILER)
+    return bytes(out)
+
+
+def join_gifs(
+    parts: Sequence[Path],
+    out_path: Path,
+    last_delays: Optional[Sequence[Optional[int]]] = None,
+) -> int:
+    """
+    分割エンコードしたGIFを再圧縮せずに連結する。
+    last_delays[i] を指定すると i 番目の最後のフレームの表示時間を差し替える
+    （分割境界でのタイミングを通しで変換した場合と揃えるため）。
+    戻り値は総フレーム数。
+    """
+    if not parts:
+        raise ValueError("連結するGIFがありません")
+    first = read_gif(parts[0])
+    frames: List[GifFrame] = []
+    for i, part in enumerate(parts):
+        gif = first if i == 0 else read_gif(part)
+        if gif.screen_size != first.screen_size:
+            raise ValueError("分割GIFの画面サイズが一致しません")
+        part_frames = gif.frames
+        if gif.global_palette != first.global_palette:
+            part_frames = [
+                GifFrame(
+                    fr.gce,
+                    _with_local_palette(fr.image, gif.global_palette),
+                    fr.extensions,
+                )
+                for fr in part_frames
+            ]
+        if last_delays and i < len(last_delays) and part_frames:
+            delay = last_delays[i]
+            if delay is not None:
+                part_frames = part_frames[:-1] + [part_frames[-1].with_delay(delay)]
+        frames.extend(part_frames)
+    joined = GifFile(first.header, first.global_palette, first.app_extensions, frames)
+    Path(out_path).write_bytes(serialize_gif(joined))
+    return len(frames)
+
+
+# これ以下の面積のフレームだけ画素を展開して「何も描かないか」を調べる
+# （ffmpeg は前フレームと同一のとき 1x1 の透過フレームを出す）
+EMPTY_FRAME_MAX_AREA = 4096
+
+
+def image_rect(image: bytes) -> Tuple[int, int, int, int]:
+    """Image Descriptor の (左, 上, 幅, 高さ)"""
+    return struct.unpack_from("<HHHH", image, 1)
+
+
+def decode_indices(image: bytes) -> bytes:
+    """フレームのLZWデータを展開し、パレット番号の列を返す（インターレースは未解除）"""
+    pos = 10 + _color_table_size(image[9])
+    min_code = image[pos]
+    pos += 1
+    data = bytearray()
+    while True:
+        n = image[pos]
+        pos += 1
+        if n == 0:
+            break
+        data += image[pos : pos + n]
+        pos += n
+
+    clear = 1 << min_code
+    end = clear + 1
+    table: List[bytes] = [bytes([i]) for i in range(clear)] + [b"", b""]
+    code_size = min_code + 1
+    prev: Optional[bytes] = None
+    out = bytearray()
+    acc = 0
+    nbits = 0
+    for byte in data:
+        acc |= byte << nbits
+        nbits += 8
+        while nbits >= code_size:
+            code = acc & ((1 << code_size) - 1)
+            acc >>= code_size
+            nbits -= code_size
+            if code == clear:
+                del table[clear + 2 :]
+                code_size = min_code + 1
+                prev = None
+                continue
+            if code == end:
+                return bytes(out)
+            if prev is None:
+                entry = table[code]
+            elif code < len(table):
+                entry = table[code]
+                table.append(prev + entry[:1])
+            elif code == len(table):
+                entry = prev + prev[:1]
+                table.append(entry)
+            else:
+                raise ValueError("不正なLZWコード")
+            out += entry
+            prev = entry
+            if len(table) >= (1 << code_size) and code_size < 12:
+                code_size += 1
+    return bytes(out)
+
+
+def _disposal(frame: GifFrame) -> int:
+    return (frame.gce[3] >> 2) & 0x07 if frame.gce else 0
+
+
+def is_empty_frame(frame: GifFrame) -> bool:
+    """全画素が透過色で、前のフレームをそのまま残すだけのフレームか"""
+    gce = frame.gce
+    if not gce or not gce[3] & 0x01 or _disposal(frame) > 1:
+        return False
+    _, _, w, h = image_rect(frame.image)
+    if w * h > EMPTY_FRAME_MAX_AREA:
+        return False
+    try:
+        indices = decode_indices(frame.image)
+    except (IndexError, ValueError):
+        return False
+    return bool(indices) and indices.count(gce[6]) == len(indices)
+
+
+def merge_empty_frames(frames: Sequence[GifFrame]) -> List[GifFrame]:
+    """
+    何も描かないフレームを取り除き、その表示時間を直前のフレームへ足す。
+    直前のフレームが「消去しない」場合に限るので見た目は変わらない。
+    """
+    merged: List[GifFrame] = []
+    for fr in frames:
+        if merged and _disposal(merged[-1]) <= 1 and is_empty_frame(fr):
+            last = merged[-1]
+            if last.delay + fr.delay <= 0xFFFF:
+                merged[-1] = last.with_delay(last.delay + fr.delay)
+                continue
+        merged.append(fr)
+    return merged
+
+
+def merge_static_frames(path: Path) -> Tuple[int, int]:
+    """
+    GIFファイル中の同一（全透過）フレームを前のフレームの表示時間に統合して書き直す。
+    戻り値は (統合したフレーム数, 削減したバイト数)。
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    gif = parse_gif(data)
+    frames = merge_empty_frames(gif.frames)
+    removed = len(gif.frames) - len(frames)
+    if removed == 0:
+        return 0, 0
+    out = serialize_gif(
+        GifFile(gif.header, gif.global_palette, gif.app_extensions, frames)
+    )
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(out)
+    os.replace(tmp, path)
+    return removed, len(data) - len(out)
+
+
+def extend_to_duration(path: Path, total_cs: int) -> int:
+    """
+    総再生時間が total_cs（1/100秒）に満たなければ最後のフレームを延ばして書き直す。
+    戻り値は延ばした時間（1/100秒）。
+    """
+    path = Path(path)
+    gif = read_gif(path)
+    if not gif.frames:
+        return 0
+    short = total_cs - sum(fr.delay for fr in gif.frames)
+    last = gif.frames[-1]
+    if short <= 0 or last.delay + short > 0xFFFF:
+        return 0
+    gif.frames[-1] = last.with_delay(last.delay + short)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(serialize_gif(gif))
+    os.replace(tmp, path)
+    return short
+
+
+def frame_delays(path: Path) -> List[int]:
+    return [fr.delay for fr in read_gif(path).frames]
+
+
+def loop_extension(loop: int = 0) -> bytes:
+    # NETSCAPE2.0 アプリケーション拡張（0で無限ループ）
+    return (
+        bytes([EXT_INTRODUCER, LABEL_APP, 11])
+        + b"NETSCAPE2.0"
+        + bytes([3, 1])
+        + struct.pack("<H", loop)
+        + b"\0"
+    )
+
+
+class GifStreamWriter:
+    """
+    1フレームずつ書き足していくGIFライタ。全フレームを保持しないのでメモリは一定。
+    フレームは単独のGIF（Pillow等で1枚だけ書いたもの）として受け取り、
+    画像ブロックだけを取り出して連結する。
+    最後の1枚だけは書き出しを保留し、extend_last で表示時間を延ばせるようにする。
+    """
+
+    def __init__(self, fp: BinaryIO, loop: int = 0) -> None:
+        self.fp = fp
+        self.loop = loop
+        self.frames = 0
+        self._header: Optional[bytes] = None
+        self._palette = b""
+        self._pending: Optional[GifFrame] = None
+
+    def add_frame(
+        self, single: bytes, delay: int, offset: Tuple[int, int] = (0, 0)
+    ) -> None:
+        """
+        offset を指定すると、画面の一部だけを描く（差分の）フレームとして (左, 上) に置く。
+        その場合 single の画面サイズはパッチの大きさでよい。
+        """
+        gif = parse_gif(single)
+        if not gif.frames:
+            return
+        if self._header is None:
+            if offset != (0, 0):
+                raise ValueError("最初のフレームは画面全体である必要があります")
+            self._header = gif.header
+            self._palette = gif.global_palette
+            self.fp.write(gif.header + gif.global_palette + loop_extension(self.loop))
+        screen_w, screen_h = struct.unpack_from("<HH", self._header, 6)
+        x0, y0 = offset
+        if offset == (0, 0) and gif.screen_size != (screen_w, screen_h):
+            raise ValueError("フレームの画面サイズが一致しません")
+        for fr in gif.frames:
+            image = fr.image
+            if gif.global_palette != self._palette:
+                image = _with_local_palette(image, gif.global_palette)
+            if offset != (0, 0):
+                left, top, w, h = image_rect(image)
+                left, top = left + x0, top + y0
+                if left + w > screen_w or top + h > screen_h:
+                    raise ValueError("フレームが画面からはみ出しています")
+                image = image[:1] + struct.pack("<HH", left, top) + image[5:]
+            self._flush()
+            # 元のGCEは透過色の指定ごと引き継ぎ、表示時間だけ差し替える
+            self._pending = GifFrame(fr.gce, image).with_delay(delay)
+            self.frames += 1
+
+    def extend_last(self, delay: int) -> bool:
+        """直前のフレームの表示時間を延ばす（同一フレームの統合用）。できなければ False"""
+        last = self._pending
+        if last is None or last.delay + delay > 0xFFFF:
+            return False
+        self._pending = last.with_delay(last.delay + delay)
+        return True
+
+    def _flush(self) -> None:
+        if self._pending is not None:
+            self.fp.write((self._pending.gce or b"") + self._pending.image)
+            self._pending = None
+
+    def close(self) -> None:
+        if self._header is not None:
+            self._flush()
+            self.fp.write(bytes([TRAILER]))
@@ -0,0 +1,249 @@
+"""
+一括変換のジョブ記録（設定フォルダの jobs.jsonl、追記のみのジャーナル）
+
+- タスクごとに状態（pending → running → done/failed/cancelled）を1行ずつ追記する。
+  アプリが落ちても、pending/running のまま残ったものを次回の起動で再開できる
+- 完成した出力は 入力の指紋・変換設定・出力のサイズと更新時刻 を記録し、
+  どれも変わっていなければ次の一括変換では変換を省く
+"""
+
+from __future__ import annotations
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import threading
+
+from ..config import get_config_dir
+from .cache import file_fingerprint, make_key
+from .converter import ConversionTask, partial_output_path, resolve_output_path
+
+JOURNAL_VERSION = 1
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DROPPED = "dropped"  # 再開しないことにした
+UNFINISHED = (PENDING, RUNNING)
+
+# 出力の変わらない項目（出力先と、実行環境に合わせて決める調整値）は設定に含めない
+_NON_SETTINGS = frozenset(
+    {
+        "input_path",
+        "output_dir",
+        "output_path",
+        "use_palette_cache",
+        "threads",
+        "lowres",
+        "prescale",
+    }
+)
+# 記録する完成済み出力の上限（古いものから捨てる）
+MAX_OUTPUTS = 5000
+# 行数が生きている記録のこの倍を超えたら、開くときに書き直して縮める
+COMPACT_RATIO = 4
+
+
+def task_to_dict(task: ConversionTask) -> Dict[str, Any]:
+    data = asdict(task)
+    # 別のカレントフォルダから再開しても同じファイルを指すよう絶対パスにする
+    for key in ("input_path", "output_dir", "output_path"):
+        if data[key] is not None:
+            data[key] = os.path.abspath(data[key])
+    return data
+
+
+def task_from_dict(data: Dict[str, Any]) -> ConversionTask:
+    known = {f.name for f in fields(ConversionTask)}
+    kw = {k: v for k, v in data.items() if k in known}
+    for key in ("input_path", "output_dir", "output_path"):
+        if kw.get(key) is not None:
+            kw[key] = Path(kw[key])
+    return ConversionTask(**kw)
+
+
+def settings_key(task: ConversionTask) -> str:
+    """出力の中身を決める設定のキー（どれかが変われば作り直す）"""
+    data = task_to_dict(task)
+    return make_key(*(f"{k}={data[k]}" for k in sorted(data) if k not in _NON_SETTINGS))
+
+
+def job_id(task: ConversionTask) -> str:
+    """同じ出力先・同じ設定のタスクは同じジョブとみなす（再開時に重複させない）"""
+    out = resolve_output_path(task).resolve()
+    return make_key(str(out), settings_key(task))
+
+
+def _output_stat(path: Path) -> Optional[Dict[str, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class JobQueue:
+    """
+    ジョブの状態と完成済み出力の記録。どのスレッドから呼んでもよい。
+    書き込みは1行ずつ追記して fsync するので、途中で落ちても直前の状態までは残る。
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or get_config_dir() / "jobs.jsonl"
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}  # id → {"task", "state"}
+        self._outputs: Dict[str, Dict[str, Any]] = {}  # 出力パス → 完成時の記録
+        self._load()
+
+    # ジャーナルの読み書き
+    def _load(self) -> None:
+        lines = 0
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        # 書きかけで落ちた最後の行などは読み飛ばす
+                        continue
+        except OSError:
+            return
+        live = len(self._jobs) + len(self._outputs)
+        if lines > COMPACT_RATIO * live + 100:
+            self._compact()
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        op = rec["op"]
+        if op == "job":
+            self._jobs[rec["id"]] = {"task": rec["task"], "state": PENDING}
+        elif op == "state":
+            job = self._jobs.get(rec["id"])
+            if job is None:
+                return
+            if rec["state"] in UNFINISHED:
+                job["state"] = rec["state"]
+            else:
+                # 終わったジョブは持ち続けない（出力の記録は "output" 側に残る）
+                del self._jobs[rec["id"]]
+        elif op == "output":
+            self._outputs.pop(rec["path"], None)
+            self._outputs[rec["path"]] = {
+                k: rec[k] for k in ("source", "settings", "size", "mtime_ns")
+            }
+            if len(self._outputs) > MAX_OUTPUTS:
+                del self._outputs[next(iter(self._outputs))]
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        for rec in records:
+            self._apply(rec)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.path.exists():
+                records = [{"op": "version", "version": JOURNAL_VERSION}, *records]
+            with self.path.open("a", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            # 記録できなくても変換自体は続ける（再開/省略が効かなくなるだけ）
+            pass
+
+    def _compact(self) -> None:
+        records: List[Dict[str, Any]] = [{"op": "version", "version": JOURNAL_VERSION}]
+        for path, out in self._outputs.items():
+            records.append({"op": "output", "path": path, **out})
+        for jid, job in self._jobs.items():
+            records.append({"op": "job", "id": jid, "task": job["task"]})
+            if job["state"] != PENDING:
+                records.append({"op": "state", "id": jid, "state": job["state"]})
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with tmp.open("w", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    # ジョブ
+    def add(self, tasks: List[ConversionTask]) -> None:
+        """これから変換するタスクを登録する（同じジョブが残っていれば置き換える）"""
+        records = [
+            {"op": "job", "id": job_id(t), "task": task_to_dict(t)} for t in tasks
+        ]
+        with self._lock:
+            self._append(records)
+
+    def mark(self, task: ConversionTask, state: str, error: str = "") -> None:
+        rec: Dict[str, Any] = {"op": "state", "id": job_id(task), "state": state}
+        if error:
+            rec["error"] = error
+        with self._lock:
+            self._append([rec])
+
+    def done(self, task: ConversionTask, output: Path) -> None:
+        """完成を記録する。以後は入力・設定・出力が変わらない限り up_to_date になる"""
+        records: List[Dict[str, Any]] = [
+            {"op": "state", "id": job_id(task), "state": DONE}
+        ]
+        stat = _output_stat(output)
+        try:
+            source = file_fingerprint(task.input_path)
+        except OSError:
+            source = None
+        if stat and source:
+            records.append(
+                {
+                    "op": "output",
+                    "path": str(Path(output).resolve()),
+                    "source": source,
+                    "settings": settings_key(task),
+                    **stat,
+                }
+            )
+        with self._lock:
+            self._append(records)
+
+    def unfinished(self) -> List[ConversionTask]:
+        """前回 pending/running のまま終わらなかったタスク（登録順）"""
+        with self._lock:
+            tasks = [job["task"] for job in self._jobs.values()]
+        result: List[ConversionTask] = []
+        for data in tasks:
+            try:
+                result.append(task_from_dict(data))
+            except (TypeError, ValueError):
+                continue
+        return result
+
+    def discard_unfinished(self) -> None:
+        """再開しないことにした残りのジョブを片付ける（書きかけの一時ファイルも消す）"""
+        for task in self.unfinished():
+            partial_output_path(resolve_output_path(task)).unlink(missing_ok=True)
+            self.mark(task, DROPPED)
+
+    # 完成済み出力
+    def up_to_date(self, task: ConversionTask) -> bool:
+        """前回と同じ入力・同じ設定で作った出力が、そのまま残っているか"""
+        out = resolve_output_path(task)
+        with self._lock:
+            rec = self._outputs.get(str(out.resolve()))
+        if not rec or rec["settings"] != settings_key(task):
+            return False
+        try:
+            if rec["source"] != file_fingerprint(task.input_path):
+                return False
+        except OSError:
+            return False
+        stat = _output_stat(out)
+        return stat is not None and (stat["size"], stat["mtime_ns"]) == (
+            rec["size"],
+            rec["mtime_ns"],
+        )
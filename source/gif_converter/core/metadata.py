@@ -0,0 +1,209 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+import json
+import os
+import subprocess
+import threading
+
+from .cache import file_fingerprint, get_cache_dir
+
+# ディスク上に残す件数の上限（最も長く使われていないものから捨てる）
+STORE_MAX_ENTRIES = 2000
+
+
+@dataclass
+class VideoInfo:
+    duration: float = 0.0  # 秒
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    codec: str = ""
+    frame_count: int = 0  # コンテナに記録がなければ 尺×fps の概算
+
+    @property
+    def ok(self) -> bool:
+        return self.duration > 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.width}x{self.height} {self.fps:.3g}fps {self.codec} "
+            f"{self.duration:.1f}s ({self.frame_count} frames)"
+        )
+
+
+def _parse_rate(rate: str) -> float:
+    try:
+        if "/" in rate:
+            num, den = rate.split("/", 1)
+            return float(num) / float(den) if float(den) else 0.0
+        return float(rate)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _run_ffprobe(path: Path) -> VideoInfo:
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "format=duration:stream=codec_name,width,height,avg_frame_rate,"
+        "r_frame_rate,nb_frames,duration",
+        "-of",
+        "json",
+        str(path),
+    ]
+    out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+    data = json.loads(out.decode("utf-8", errors="replace") or "{}")
+    stream = (data.get("streams") or [{}])[0]
+    fmt = data.get("format") or {}
+    duration = _parse_rate(fmt.get("duration") or stream.get("duration") or "0")
+    fps = _parse_rate(stream.get("avg_frame_rate") or "0") or _parse_rate(
+        stream.get("r_frame_rate") or "0"
+    )
+    try:
+        frames = int(stream.get("nb_frames") or 0)
+    except ValueError:
+        frames = 0
+    if frames <= 0:
+        frames = int(round(duration * fps))
+    return VideoInfo(
+        duration=duration,
+        width=int(stream.get("width") or 0),
+        height=int(stream.get("height") or 0),
+        fps=fps,
+        codec=str(stream.get("codec_name") or ""),
+        frame_count=frames,
+    )
+
+
+class MetadataStore:
+    """
+    ffprobe の結果を (パス, 更新時刻, サイズ) 単位で保持する。
+    メモリ上の辞書に加え、設定フォルダ配下のJSONにも残して再起動後も使う。
+    辞書は使われた順に並べ、件数が溢れたら先頭（最も長く使われていないもの）から捨てる。
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or get_cache_dir() / "probe.json"
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._inflight: Dict[str, threading.Event] = {}
+        self._dirty = False  # ディスクに書いていない結果がある
+        self._batch_depth = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                # 無い/壊れている場合は空から
+                self._entries = {}
+        return self._entries
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """この中で調べた結果は、抜けるときにまとめて1回だけ書き出す"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self._save()
+
+    def _save(self) -> None:
+        self._dirty = False
+        entries = self._load()
+        if len(entries) > STORE_MAX_ENTRIES:
+            for key in list(entries)[: len(entries) - STORE_MAX_ENTRIES]:
+                del entries[key]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, path: Path) -> VideoInfo:
+        try:
+            key = file_fingerprint(path)
+        except OSError:
+            return VideoInfo()
+        while True:
+            with self._lock:
+                entries = self._load()
+                hit = entries.pop(key, None)
+                if hit is not None:
+                    # 末尾へ移すだけで書き出さない（並び順は次に書き出すときに残る）
+                    entries[key] = hit
+                    return VideoInfo(**hit)
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    # 同じファイルを同時に調べないよう、最初の1件だけが ffprobe を起動する
+                    self._inflight[key] = threading.Event()
+                    break
+            waiter.wait()
+        try:
+            info = _run_ffprobe(path)
+        except Exception:
+            info = VideoInfo()
+        with self._lock:
+            if info.ok:
+                self._load()[key] = asdict(info)
+                self._dirty = True
+                if not self._batch_depth:
+                    self._save()
+            self._inflight.pop(key).set()
+        return info
+
+
+_store: Optional[MetadataStore] = None
+_store_lock = threading.Lock()
+
+
+def get_metadata_store() -> MetadataStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetadataStore()
+        return _store
+
+
+def probe_info(path: Path) -> VideoInfo:
+    """ファイルごとに1度だけ ffprobe し、以降はキャッシュを返す。失敗時は全て0"""
+    return get_metadata_store().get(Path(path))
+
+
+def probe_many(
+    paths: Iterable[Path],
+    max_workers: int = 8,
+    on_result: Optional[Callable[[Path, VideoInfo], None]] = None,
+) -> Dict[Path, VideoInfo]:
+    """複数ファイルをまとめて並列に調べる"""
+    items = [Path(p) for p in paths]
+    results: Dict[Path, VideoInfo] = {}
+    if not items:
+        return results
+
+    def one(p: Path) -> None:
+        info = probe_info(p)
+        results[p] = info
+        if on_result:
+            on_result(p, info)
+
+    # 1件ごとにJSONを書き直さず、全部調べ終えてから1回だけ書き出す
+    with get_metadata_store().batch(), ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(items)))
+    ) as ex:
+        list(ex.map(one, items))
+    return results
@@ -0,0 +1,460 @@
+"""
+プロセス内フレームパイプライン（NumPy エンジン）
+
+ffmpeg にはデコードと縮小だけを任せ、RGB の rawvideo をパイプで受け取って
+減色・ディザ・GIF書き出しを Python 側で行う。各段は個別の関数なので、
+途中のフレームを観察したり別用途に流用したりできる。
+フレームはサイズ上限付きのキューを流れ、GIFも1枚ずつ書き足すため、
+クリップの長さに関係なくメモリ使用量は一定に保たれる。
+
+NumPy と Pillow が必要（無い場合は RuntimeError）。
+"""
+
+from __future__ import annotations
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+import io
+import queue
+import subprocess
+import threading
+import time
+
+from .cancel import CancelToken
+from .converter import (
+    DECIMATE_FRAC,
+    DECIMATE_HI,
+    DECIMATE_LO,
+    PRESCALE_FILTER,
+    ConversionTask,
+    LogCallback,
+    ProgressCallback,
+    _duration_args,
+    _input_args,
+    _thread_args,
+    gif_pts_cs,
+    resolve_output_path,
+)
+from .gif import GifStreamWriter
+from .metadata import probe_info
+from .progress import RateLimiter
+from .telemetry import TaskTelemetry, wait_with_rusage
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# デコード側と量子化側の間に置くフレーム数（= 最大メモリ使用量の目安）
+RING_FRAMES = 8
+# パレット推定に使う画素数の上限と、1フレームから拾う画素数
+MAX_SAMPLES = 200_000
+SAMPLES_PER_FRAME = 4096
+# パレット推定用のデコードは低いfpsで済ませる
+SAMPLE_FPS = 2
+
+
+def _require():
+    try:
+        import numpy
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError(f"NumPyエンジンには numpy と Pillow が必要です: {e}")
+    return numpy, Image
+
+
+@dataclass
+class StageTimes:
+    decode: float = 0.0  # パイプからの読み出し待ちを含む
+    quantize: float = 0.0
+    encode: float = 0.0
+    frames: int = 0
+    extra: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return (
+            f"{self.frames} フレーム / デコード {self.decode:.2f}s"
+            f" / 減色 {self.quantize:.2f}s / 書き出し {self.encode:.2f}s"
+        )
+
+    def record(self, telemetry: TaskTelemetry) -> None:
+        """変換の計測に工程として書き込む（パレット推定は palettegen に相当）"""
+        for name, seconds in self.extra.items():
+            telemetry.add_stage("palettegen" if name == "palette" else name, seconds)
+        telemetry.add_stage("decode", self.decode)
+        telemetry.add_stage("quantize", self.quantize)
+        telemetry.add_stage("encode", self.encode)
+
+
+def frame_size(task: ConversionTask) -> Tuple[int, int]:
+    """出力フレームの (幅, 高さ)。高さは縦横比から求める（scale=幅:-1 相当）"""
+    info = probe_info(task.input_path)
+    if info.width <= 0 or info.height <= 0:
+        raise RuntimeError("動画の解像度を取得できませんでした")
+    height = max(1, int(round(task.width * info.height / info.width)))
+    return task.width, height
+
+
+def build_rawvideo_cmd(
+    task: ConversionTask, size: Tuple[int, int], fps: Optional[float] = None
+) -> List[str]:
+    width, height = size
+    filters = [f"fps={fps or task.fps}"]
+    if task.prescale:
+        filters.append(PRESCALE_FILTER)
+    filters.append(f"scale={width}:{height}:flags=lanczos")
+    cmd = ["ffmpeg", "-v", "error", *_thread_args(task)]
+    cmd += _input_args(task)
+    cmd += _duration_args(task)
+    cmd += [
+        "-vf",
+        ",".join(filters),
+        "-an",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "pipe:1",
+    ]
+    return cmd
+
+
+def iter_frames(
+    task: ConversionTask,
+    size: Tuple[int, int],
+    fps: Optional[float] = None,
+    ring: int = RING_FRAMES,
+    cancel_token: Optional[CancelToken] = None,
+    telemetry: Optional[TaskTelemetry] = None,
+) -> Iterator["np.ndarray"]:
+    """
+    ffmpeg から RGB フレーム (高さ, 幅, 3) を順に取り出す。
+    読み出しは別スレッドで行い、上限付きキュー（リングバッファ）で受け渡す。
+    telemetry があれば ffmpeg のピークRSSを記録する。
+    """
+    np, _ = _require()
+    width, height = size
+    frame_bytes = width * height * 3
+    token = cancel_token or CancelToken()
+    proc = token.popen(
+        build_rawvideo_cmd(task, size, fps),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    buf: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=max(1, ring))
+    stop = threading.Event()
+
+    def reader() -> None:
+        assert proc.stdout is not None
+        try:
+            while not stop.is_set():
+                data = proc.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+                # キューが満杯ならここで待つ（ffmpeg もパイプが詰まって止まる）
+                while not stop.is_set():
+                    try:
+                        buf.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            while True:
+                try:
+                    buf.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    t = threading.Thread(target=reader, name="rawvideo-reader", daemon=True)
+    t.start()
+    finished = False
+    try:
+        while True:
+            frame = buf.get()
+            if frame is None:
+                finished = True
+                break
+            yield frame
+    finally:
+        stop.set()
+        if not finished and proc.poll() is None:
+            # 途中で打ち切られた場合はデコードを止める
+            proc.kill()
+        rss = wait_with_rusage(proc)
+        if telemetry:
+            telemetry.record_rss(rss)
+        t.join(timeout=1.0)
+        token.release(proc)
+    token.check()
+    assert proc.stderr is not None
+    if proc.returncode != 0:
+        err = proc.stderr.read().decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpegエラー: {err[:400]}...")
+
+
+def sample_pixels(
+    frames: Iterator["np.ndarray"],
+    per_frame: int = SAMPLES_PER_FRAME,
+    limit: int = MAX_SAMPLES,
+    seed: int = 0,
+) -> "np.ndarray":
+    """各フレームから画素を無作為に拾い、上限付きのリザーバに溜める (N, 3)"""
+    np, _ = _require()
+    rng = np.random.default_rng(seed)
+    reservoir = np.empty((limit, 3), dtype=np.uint8)
+    filled = 0
+    seen = 0
+    for frame in frames:
+        flat = frame.reshape(-1, 3)
+        picks = flat[rng.integers(0, len(flat), size=min(per_frame, len(flat)))]
+        fit = min(limit - filled, len(picks))
+        if fit > 0:
+            reservoir[filled : filled + fit] = picks[:fit]
+            filled += fit
+            seen += fit
+        rest = picks[fit:]
+        if len(rest):
+            # リザーバサンプリング: 既存の標本を確率的に置き換える
+            idx = rng.integers(0, seen + np.arange(1, len(rest) + 1))
+            keep = idx < limit
+            reservoir[idx[keep]] = rest[keep]
+            seen += len(rest)
+    return reservoir[:filled]
+
+
+def median_cut(samples: "np.ndarray", colors: int) -> "np.ndarray":
+    """メディアンカットでパレットを作る (colors, 3) uint8"""
+    np, _ = _require()
+    if len(samples) == 0:
+        return np.zeros((1, 3), dtype=np.uint8)
+
+    def extent(box: "np.ndarray") -> "np.ndarray":
+        return box.max(axis=0) - box.min(axis=0)
+
+    boxes = [samples.astype(np.int16)]
+    spans = [extent(boxes[0])]
+    while len(boxes) < colors:
+        # 最も広がりの大きい箱を、その軸の中央値で2つに割る
+        widths = [sp.max() if len(b) > 1 else -1 for b, sp in zip(boxes, spans)]
+        i = int(np.argmax(widths))
+        if len(boxes[i]) <= 1 or spans[i].max() <= 0:
+            break
+        box = boxes.pop(i)
+        axis = int(np.argmax(spans.pop(i)))
+        order = np.argsort(box[:, axis], kind="stable")
+        half = len(box) // 2
+        for part in (box[order[:half]], box[order[half:]]):
+            boxes.append(part)
+            spans.append(extent(part))
+    palette = np.array([b.mean(axis=0) for b in boxes], dtype=np.float64)
+    return np.clip(np.rint(palette), 0, 255).astype(np.uint8)
+
+
+def palette_image(palette: "np.ndarray"):
+    """Pillow の quantize に渡すパレット画像。余りは最後の色で埋める"""
+    np, Image = _require()
+    padded = np.empty((256, 3), dtype=np.uint8)
+    padded[: len(palette)] = palette
+    padded[len(palette) :] = palette[-1]
+    img = Image.new("P", (1, 1))
+    img.putpalette(padded.tobytes())
+    return img
+
+
+def is_near_duplicate(frame: "np.ndarray", ref: "np.ndarray") -> bool:
+    """
+    mpdecimate と同じ考え方で、8x8ブロックごとの差分和から「ほぼ同じ」かを判定する。
+    輝度の代わりにRGB平均を使う。
+    """
+    np, _ = _require()
+    h = frame.shape[0] // 8 * 8
+    w = frame.shape[1] // 8 * 8
+    if h == 0 or w == 0:
+        return bool(np.array_equal(frame, ref))
+    cur = frame[:h, :w].astype(np.int16).sum(axis=2)
+    old = ref[:h, :w].astype(np.int16).sum(axis=2)
+    diff = np.abs(cur - old) // 3
+    blocks = diff.reshape(h // 8, 8, w // 8, 8).sum(axis=(1, 3))
+    if (blocks > DECIMATE_HI).any():
+        return False
+    return float((blocks > DECIMATE_LO).mean()) < DECIMATE_FRAC
+
+
+def quantize_frame(frame: "np.ndarray", pal_img, dither: bool = True):
+    """誤差拡散（Floyd-Steinberg）付きでパレットに割り当てた P 画像を返す"""
+    _, Image = _require()
+    mode = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+    return Image.fromarray(frame, "RGB").quantize(palette=pal_img, dither=mode)
+
+
+def encode_frame(indexed, transparency: Optional[int] = None) -> bytes:
+    """1フレームだけのGIFとして書き出す（連結は GifStreamWriter が行う）"""
+    buf = io.BytesIO()
+    if transparency is None:
+        indexed.save(buf, format="GIF", optimize=False)
+    else:
+        # 透過部分は前のフレームを残す（disposal=1: 消去しない）
+        indexed.save(
+            buf,
+            format="GIF",
+            optimize=False,
+            transparency=transparency,
+            disposal=1,
+        )
+    return buf.getvalue()
+
+
+def diff_patch(
+    cur: "np.ndarray", prev: "np.ndarray", transparent: Optional[int]
+) -> Optional[Tuple["np.ndarray", int, int]]:
+    """
+    前のフレーム（パレット番号の配列）から変化した矩形を切り出し、矩形内で変化していない
+    画素を透過番号にした (パッチ, 左, 上) を返す。変化が無ければ None。
+    transparent が None（パレットに空きが無い）なら切り出しだけ行う。
+    """
+    np, _ = _require()
+    changed = cur != prev
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(changed.any(axis=0))
+    y0, y1 = int(rows[0]), int(rows[-1]) + 1
+    x0, x1 = int(cols[0]), int(cols[-1]) + 1
+    patch = cur[y0:y1, x0:x1].copy()
+    if transparent is not None:
+        patch[~changed[y0:y1, x0:x1]] = transparent
+    return patch, x0, y0
+
+
+def patch_image(patch: "np.ndarray", pal_img):
+    _, Image = _require()
+    img = Image.fromarray(patch, "P")
+    img.putpalette(pal_img.getpalette())
+    return img
+
+
+def convert_in_process(
+    task: ConversionTask,
+    total_duration: float,
+    on_progress: Optional[ProgressCallback] = None,
+    on_log: Optional[LogCallback] = None,
+    cancel_token: Optional[CancelToken] = None,
+    telemetry: Optional[TaskTelemetry] = None,
+    stream: Optional[IO[bytes]] = None,
+) -> Path:
+    """stream を渡すと、出力ファイルの代わりにそこへ1フレームずつ書き出す"""
+    np, _ = _require()
+    size = frame_size(task)
+    out_path = resolve_output_path(task)
+    times = StageTimes()
+
+    # 1) 低fps・低解像度で画素を標本化してパレットを推定
+    t0 = time.perf_counter()
+    sample_size = (max(1, size[0] // 2), max(1, size[1] // 2))
+    samples = sample_pixels(
+        iter_frames(
+            task,
+            sample_size,
+            fps=min(float(task.fps), SAMPLE_FPS),
+            cancel_token=cancel_token,
+            telemetry=telemetry,
+        )
+    )
+    palette = median_cut(samples, task.colors)
+    pal_img = palette_image(palette)
+    times.extra["palette"] = time.perf_counter() - t0
+    if on_log:
+        on_log(
+            f"パレットを推定しました（標本 {len(samples)} 画素 → {len(palette)} 色）"
+        )
+
+    # 2) フレームごとに減色して逐次書き出し
+    expected = max(1, int(total_duration * task.fps))
+    tmp = out_path.with_name(out_path.name + ".part")
+    previous: Optional["np.ndarray"] = None
+    # 差分モードの透過番号。パレットに空きが無ければ透過は使わず切り出しのみ
+    transparent = len(palette) if len(palette) < 256 else None
+    reference: Optional["np.ndarray"] = None
+    merged = 0
+    decimated = 0
+    limiter = RateLimiter()
+    try:
+        with nullcontext(stream) if stream is not None else tmp.open("wb") as fp:
+            writer = GifStreamWriter(fp, loop=0)
+            frames = iter_frames(
+                task, size, cancel_token=cancel_token, telemetry=telemetry
+            )
+            while True:
+                t1 = time.perf_counter()
+                frame = next(frames, None)
+                t2 = time.perf_counter()
+                times.decode += t2 - t1
+                if frame is None:
+                    break
+                i = times.frames
+                delay = gif_pts_cs(i + 1, task.fps) - gif_pts_cs(i, task.fps)
+                times.frames += 1
+                if on_progress and limiter.ready():
+                    percent = min(100.0, 100.0 * times.frames / expected)
+                    on_progress(str(task.input_path), percent, "")
+                if (
+                    task.decimate
+                    and reference is not None
+                    and is_near_duplicate(frame, reference)
+                    and writer.extend_last(delay)
+                ):
+                    # 最後に書いたフレームとほぼ同じなら減色もせず表示時間だけ延ばす
+                    decimated += 1
+                    times.quantize += time.perf_counter() - t2
+                    continue
+                reference = frame
+                indexed = quantize_frame(frame, pal_img)
+                t3 = time.perf_counter()
+                if not task.diff_frames:
+                    writer.add_frame(encode_frame(indexed), delay)
+                else:
+                    # 埋め草の番号（最後の色の複製）は本来の番号に寄せ、透過番号を空けておく
+                    cur = np.minimum(np.asarray(indexed), len(palette) - 1)
+                    patch = (
+                        diff_patch(cur, previous, transparent)
+                        if previous is not None
+                        else None
+                    )
+                    if previous is None:
+                        writer.add_frame(encode_frame(indexed), delay)
+                    elif patch is None:
+                        # 前と同じ画素なら書き出さず、前のフレームの表示時間に足す
+                        if writer.extend_last(delay):
+                            merged += 1
+                        else:
+                            writer.add_frame(encode_frame(indexed), delay)
+                    else:
+                        data, x, y = patch
+                        writer.add_frame(
+                            encode_frame(patch_image(data, pal_img), transparent),
+                            delay,
+                            offset=(x, y),
+                        )
+                    previous = cur
+                t4 = time.perf_counter()
+                times.quantize += t3 - t2
+                times.encode += t4 - t3
+            writer.close()
+        if times.frames == 0:
+            raise RuntimeError("フレームを取得できませんでした")
+        if stream is None:
+            tmp.replace(out_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+        if telemetry:
+            times.record(telemetry)
+    if on_log:
+        on_log(f"NumPyエンジン: {times.summary()}")
+        if decimated:
+            on_log(f"ほぼ静止したフレーム {decimated} 枚を間引きました")
+        if merged:
+            on_log(f"同一フレーム {merged} 枚を前のフレームの表示時間に統合しました")
+    return out_path
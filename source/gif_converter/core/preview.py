@@ -0,0 +1,142 @@
+from __future__ import annotations
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Optional
+import subprocess
+import tempfile
+import threading
+
+from .cache import DiskCache, file_fingerprint, get_cache_dir, make_key
+from .cancel import run_process
+from .converter import (
+    ConversionTask,
+    Converter,
+    _base_filters,
+    _duration_args,
+    _input_args,
+    _thread_args,
+)
+from .utils import RgbFrame, extract_frame_rgb, parse_ppm
+
+PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PreviewCache(DiskCache):
+    """プレビュー用の静止画/中間フレーム/GIFをまとめて保持する（キーに拡張子を含める）"""
+
+    def __init__(
+        self, root: Optional[Path] = None, max_bytes: int = PREVIEW_CACHE_MAX_BYTES
+    ) -> None:
+        super().__init__(root or get_cache_dir() / "previews", max_bytes)
+
+
+_preview_cache: Optional[PreviewCache] = None
+_preview_cache_lock = threading.Lock()
+
+
+def get_preview_cache() -> PreviewCache:
+    global _preview_cache
+    with _preview_cache_lock:
+        if _preview_cache is None:
+            _preview_cache = PreviewCache()
+        return _preview_cache
+
+
+def build_frames_cmd(task: ConversionTask, out_path: Path) -> List[str]:
+    # デコード+fps+縮小までを済ませたフレームを可逆(FFV1)で書き出す
+    # （間引きは減色側で行うので中間ファイルは全フレームのまま）
+    task = replace(task, decimate=False)
+    cmd = ["ffmpeg", "-y", *_thread_args(task)]
+    cmd += _input_args(task)
+    cmd += _duration_args(task)
+    cmd += [
+        "-vf",
+        ",".join(_base_filters(task)),
+        "-an",
+        "-c:v",
+        "ffv1",
+        str(out_path),
+    ]
+    return cmd
+
+
+class PreviewRenderer:
+    """
+    プレビューの生成とキャッシュ。
+    GIFは (ファイル, 開始, 長さ, fps, 幅, 色数) 単位で保持し、色数だけが変わった場合は
+    縮小済みの中間フレームを再利用して減色（パレット生成+適用）だけをやり直す。
+    """
+
+    def __init__(
+        self, converter: Converter, cache: Optional[PreviewCache] = None
+    ) -> None:
+        self.converter = converter
+        self.cache = cache or get_preview_cache()
+
+    def _log(self, text: str) -> None:
+        if self.converter.on_log:
+            self.converter.on_log(text)
+
+    def render_frame(self, input_path: Path, time_sec: float, width: int) -> RgbFrame:
+        """開始位置の静止画（RGBの生データ）。失敗時は RuntimeError"""
+        fingerprint = file_fingerprint(input_path)
+        key = make_key(fingerprint, "frame", time_sec, width) + ".ppm"
+        hit = self.cache.get(key)
+        if hit:
+            try:
+                return parse_ppm(hit.read_bytes())
+            except (OSError, ValueError):
+                pass  # 壊れたエントリは作り直す
+        frame = extract_frame_rgb(
+            input_path, time_sec, width, self.converter.cancel_token
+        )
+        if frame is None:
+            raise RuntimeError("静止画の抽出に失敗しました")
+        self.cache.put_bytes(key, frame.to_ppm())
+        return frame
+
+    def render_gif(self, task: ConversionTask) -> Path:
+        fingerprint = file_fingerprint(task.input_path)
+        scaled = (fingerprint, task.start, task.duration, task.fps, task.width)
+        options = (task.colors, task.diff_frames, task.decimate)
+        gif_key = make_key(*scaled, *options) + ".gif"
+        hit = self.cache.get(gif_key)
+        if hit:
+            self._log(f"プレビューキャッシュ: ヒット（{self.cache.stats_text()}）")
+            return hit
+
+        frames_key = make_key(*scaled, "frames") + ".mkv"
+        frames = self.cache.get(frames_key)
+        with tempfile.TemporaryDirectory(prefix="gifprev_") as td:
+            tmpdir = Path(td)
+            if frames:
+                self._log("縮小済みフレームを再利用して減色のみやり直します")
+            else:
+                tmp_frames = tmpdir / "frames.mkv"
+                proc = run_process(
+                    build_frames_cmd(task, tmp_frames),
+                    self.converter.cancel_token,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+                if proc.returncode != 0 or not tmp_frames.exists():
+                    err = proc.stderr.decode("utf-8", errors="replace")
+                    raise RuntimeError(f"ffmpegエラー: {err[-400:]}")
+                frames = self.cache.put(frames_key, tmp_frames)
+            out = tmpdir / "preview.gif"
+            # 中間ファイルは短尺なので、パレットはキャッシュせず毎回作る
+            self.converter.convert(
+                replace(
+                    task,
+                    input_path=frames,
+                    start=0.0,
+                    duration=task.duration,  # 0でなければ尺の再プローブを省ける
+                    output_path=out,
+                    prescaled=True,
+                    lowres=0,
+                    prescale=False,
+                    segments=0,
+                    use_palette_cache=False,
+                )
+            )
+            return self.cache.put(gif_key, out)
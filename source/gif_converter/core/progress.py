@@ -0,0 +1,143 @@
+"""
+ffmpeg の -progress 出力（key=value の行）の読み取りと、進捗通知の間引き
+
+    frame=120
+    fps=59.8
+    out_time_us=4000000
+    total_size=1048576
+    speed=1.99x
+    progress=continue   ← ここで1ブロック分が確定する（最後は progress=end）
+"""
+
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import IO, Callable, Deque, Dict, Optional
+import re
+import threading
+import time
+
+# 進捗コールバックの最短間隔（秒）。GUIへのシグナルが詰まらないよう 10Hz に抑える
+PROGRESS_INTERVAL = 0.1
+
+# エラー表示用に stderr の末尾を保持する行数
+STDERR_TAIL_LINES = 40
+
+# -progress の行（stdout を出力に使うときは stderr に混ぜて出させる）
+_PROGRESS_LINE = re.compile(
+    r"^(frame|fps|stream_\d+_\d+_q|bitrate|total_size|out_time(_us|_ms)?"
+    r"|dup_frames|drop_frames|speed|progress)="
+)
+
+
+@dataclass
+class FfmpegProgress:
+    frame: int = 0
+    fps: float = 0.0
+    speed: float = 0.0  # 実時間に対する倍率
+    out_time_us: int = 0
+    total_size: int = 0  # 出力済みバイト数
+    done: bool = False  # progress=end
+
+    @property
+    def out_time(self) -> float:
+        return self.out_time_us / 1_000_000
+
+    def summary(self) -> str:
+        return (
+            f"frame={self.frame} fps={self.fps:.1f} speed={self.speed:.2f}x "
+            f"size={self.total_size // 1024}KiB"
+        )
+
+
+def _number(value: Optional[str], default: float = 0.0) -> float:
+    # 未確定の値は N/A、speed は "1.5x" の形で来る
+    if not value:
+        return default
+    try:
+        return float(value.strip().rstrip("x"))
+    except ValueError:
+        return default
+
+
+class ProgressParser:
+    """-progress の行を1行ずつ受け取り、ブロックが揃ったら FfmpegProgress を返す"""
+
+    def __init__(self) -> None:
+        self._fields: Dict[str, str] = {}
+
+    def feed(self, line: str) -> Optional[FfmpegProgress]:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        if key != "progress":
+            self._fields[key] = value
+            return None
+        f, self._fields = self._fields, {}
+        # out_time_us が無い古い ffmpeg では out_time_ms（中身はマイクロ秒）を使う
+        out_us = _number(f.get("out_time_us"), _number(f.get("out_time_ms")))
+        return FfmpegProgress(
+            frame=int(_number(f.get("frame"))),
+            fps=_number(f.get("fps")),
+            speed=_number(f.get("speed")),
+            out_time_us=max(0, int(out_us)),
+            total_size=max(0, int(_number(f.get("total_size")))),
+            done=value.strip() == "end",
+        )
+
+
+class RateLimiter:
+    """interval 秒に1回だけ True を返す（force で必ず通す）"""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL) -> None:
+        self.interval = interval
+        self._last = float("-inf")
+
+    def ready(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+class StderrTail:
+    """
+    stderr を別スレッドで読み捨てながら、末尾 max_lines 行だけを保持する。
+    （読まずに放置するとパイプが詰まって ffmpeg が止まる）
+    on_progress を渡すと、stderr に混ざった -progress の行を読み取って通知する
+    （通知は読み取りスレッドから呼ばれる）
+    """
+
+    def __init__(
+        self,
+        stream: IO[str],
+        max_lines: int = STDERR_TAIL_LINES,
+        on_progress: Optional[Callable[[FfmpegProgress], None]] = None,
+    ) -> None:
+        self._lines: Deque[str] = deque(maxlen=max_lines)
+        self._on_progress = on_progress
+        self._parser = ProgressParser()
+        self._thread = threading.Thread(
+            target=self._drain, args=(stream,), name="ffmpeg-stderr", daemon=True
+        )
+        self._thread.start()
+
+    def _drain(self, stream: IO[str]) -> None:
+        for line in stream:
+            line = line.rstrip()
+            if self._on_progress and _PROGRESS_LINE.match(line):
+                p = self._parser.feed(line)
+                if p is not None:
+                    self._on_progress(p)
+            elif line:
+                self._lines.append(line)
+
+    def join(self, timeout: float = 1.0) -> None:
+        """読み終わる（最後の進捗まで通知し終わる）のを待つ"""
+        self._thread.join(timeout)
+
+    def text(self, timeout: float = 1.0) -> str:
+        """読み終わるのを待ってから末尾を返す"""
+        self.join(timeout)
+        return "\n".join(self._lines)
@@ -0,0 +1,315 @@
+"""
+変換サービスの本体（Qt/HTTP に依存しない。asyncio のイベントループ上で使う）
+
+- 変換は max_workers 本までのワーカーで進め、残りは順番待ちにする（上限を超えたら断る）
+- 同じ入力・同じ設定の依頼が実行中/順番待ちなら、新しく変換せず同じジョブにまとめる
+- 完成したGIFは結果キャッシュ（設定フォルダの cache/results）に置き、同じ依頼にはそれを返す
+- アップロードされた動画は内容のハッシュ名で保存し、使うジョブが無くなったら消す
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+
+from .batch import default_concurrency
+from .cache import DiskCache, file_fingerprint, get_cache_dir, make_key
+from .cancel import CancelToken, ConversionCancelled
+from .converter import ConversionTask, Converter, LogCallback
+from .jobs import settings_key
+from .tuning import tune_task
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 順番待ちにできるジョブ数（超えた依頼は ServiceBusy）
+MAX_PENDING_JOBS = 64
+# 状態を問い合わせられるよう残しておく、終わったジョブの数
+KEEP_FINISHED_JOBS = 256
+# 進捗の購読者ごとに溜める数（読むのが遅ければ古いものから捨てる）
+EVENT_QUEUE_SIZE = 16
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class ServiceBusy(RuntimeError):
+    """順番待ちがいっぱいで依頼を受け付けられない"""
+
+
+class ResultCache(DiskCache):
+    """入力と変換設定をキーにした完成GIFのキャッシュ"""
+
+    def __init__(
+        self, root: Optional[Path] = None, max_bytes: int = RESULT_CACHE_MAX_BYTES
+    ) -> None:
+        super().__init__(root or get_cache_dir() / "results", max_bytes, ".gif")
+
+
+def source_id(path: Path) -> str:
+    """ローカルの入力は パス/サイズ/更新時刻 で識別する（アップロードは内容のハッシュ）"""
+    return file_fingerprint(path)
+
+
+def result_key(task: ConversionTask, source: str) -> str:
+    # 出力先や実行環境向けの調整値は結果に影響しないので含めない（jobs.settings_key）
+    return make_key(source, settings_key(task))
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    task: ConversionTask
+    state: str = QUEUED
+    percent: float = 0.0
+    message: str = ""
+    error: str = ""
+    output: Optional[Path] = None
+    cached: bool = False  # 結果キャッシュから返した
+    requests: int = 1  # まとめた依頼の数
+    token: CancelToken = field(default_factory=CancelToken)
+    _listeners: List["asyncio.Queue[Dict[str, Any]]"] = field(default_factory=list)
+    _finished: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "percent": round(self.percent, 1),
+            "message": self.message,
+            "error": self.error,
+            "cached": self.cached,
+            "requests": self.requests,
+        }
+
+    async def wait(self) -> None:
+        await self._finished.wait()
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """今の状態から始めて、変わるたびに状態を返す（終わった状態を返したら止まる）"""
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self._listeners.append(queue)
+        try:
+            snap = self.snapshot()
+            yield snap
+            while snap["state"] not in FINISHED:
+                snap = await queue.get()
+                yield snap
+        finally:
+            self._listeners.remove(queue)
+
+    # 以下はイベントループのスレッドから呼ぶ
+    def _update(self, percent: float, message: str = "") -> None:
+        if self.finished:
+            return
+        self.state = RUNNING
+        self.percent = percent
+        self.message = message
+        self._publish()
+
+    def _finish(self, state: str, error: str = "") -> None:
+        self.state = state
+        self.error = error
+        if state == DONE:
+            self.percent = 100.0
+        self._publish()
+        self._finished.set()
+
+    def _publish(self) -> None:
+        snap = self.snapshot()
+        for queue in self._listeners:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snap)
+
+
+class ConversionService:
+    """
+    変換依頼の受付・順番待ち・重複の集約・結果キャッシュ。
+    submit/cancel/get はイベントループのスレッドから呼ぶ（変換はワーカースレッドで動く）
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 0,
+        cache: Optional[ResultCache] = None,
+        work_dir: Optional[Path] = None,
+        max_pending: int = MAX_PENDING_JOBS,
+        tune: bool = True,
+        on_log: Optional[LogCallback] = None,
+    ) -> None:
+        self.max_workers = max_workers if max_workers > 0 else default_concurrency()
+        self.cache = cache or ResultCache()
+        self.work_dir = Path(work_dir or get_cache_dir() / "service")
+        self.max_pending = max_pending
+        self.tune = tune
+        self.on_log = on_log
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="gifconv-service"
+        )
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}  # key → 順番待ち/実行中のジョブ
+        self._upload_refs: Dict[Path, int] = {}  # アップロード → 使っているジョブ数
+        self._runners: Set["asyncio.Task[None]"] = set()
+
+    @property
+    def upload_dir(self) -> Path:
+        return self.work_dir / "uploads"
+
+    def _log(self, text: str) -> None:
+        if self.on_log:
+            self.on_log(text)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        return sum(1 for job in self._inflight.values() if job.state == QUEUED)
+
+    async def store_upload(
+        self, chunks: AsyncIterator[bytes], suffix: str = ""
+    ) -> Tuple[Path, str]:
+        """
+        アップロードを内容のハッシュ名で保存し、(パス, 入力の識別子) を返す。
+        submit に渡さなかった場合は discard_upload で片付けること
+        """
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha1()
+        fd, tmp_name = tempfile.mkstemp(dir=self.upload_dir, suffix=".tmp")
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            path = self.upload_dir / f"{digest.hexdigest()}{suffix}"
+            # 同じ内容が使用中なら置き換えず、そのまま使う
+            if path.exists():
+                tmp.unlink()
+            else:
+                os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return path, f"sha1:{digest.hexdigest()}"
+
+    def discard_upload(self, path: Path) -> None:
+        """どのジョブも使っていないアップロードを消す"""
+        if path.parent == self.upload_dir and not self._upload_refs.get(path):
+            path.unlink(missing_ok=True)
+
+    def submit(self, task: ConversionTask, source: str) -> Job:
+        """
+        変換を依頼してジョブを返す（終わるのは待たない）。
+        同じ依頼が実行中ならそのジョブを、結果キャッシュにあれば完了済みのジョブを返す
+        """
+        key = result_key(task, source)
+        job = self._inflight.get(key)
+        if job is not None:
+            job.requests += 1
+            self.discard_upload(task.input_path)
+            return job
+        cached = self.cache.get(key)
+        if cached is not None:
+            job = Job(id=uuid.uuid4().hex[:12], key=key, task=task, cached=True)
+            job.output = cached
+            job._finish(DONE)
+            self._remember(job)
+            self.discard_upload(task.input_path)
+            return job
+        if self.pending() >= self.max_pending:
+            self.discard_upload(task.input_path)
+            raise ServiceBusy("順番待ちの変換が多すぎます。しばらくしてから依頼してください")
+        job = Job(id=uuid.uuid4().hex[:12], key=key, task=task)
+        self._inflight[key] = job
+        if task.input_path.parent == self.upload_dir:
+            self._upload_refs[task.input_path] = (
+                self._upload_refs.get(task.input_path, 0) + 1
+            )
+        self._remember(job)
+        runner = asyncio.get_running_loop().create_task(self._run(job))
+        self._runners.add(runner)
+        runner.add_done_callback(self._runners.discard)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """ジョブを止める（まとめた依頼すべてが中断になる）。見つからなければ False"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        if not job.finished:
+            job.token.cancel()
+        return True
+
+    async def close(self) -> None:
+        """実行中の変換を止め、ワーカーを片付ける"""
+        for job in list(self._inflight.values()):
+            job.token.cancel()
+        if self._runners:
+            await asyncio.gather(*self._runners, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        finished = [j.id for j in self._jobs.values() if j.finished]
+        for job_id in finished[: max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+
+        def on_progress(_file: str, percent: float, message: str) -> None:
+            loop.call_soon_threadsafe(job._update, percent, message)
+
+        try:
+            job.output = await loop.run_in_executor(
+                self._executor, self._convert, job, on_progress
+            )
+            job._finish(DONE)
+            self._log(f"変換しました: {job.task.input_path.name} ({job.id})")
+        except ConversionCancelled:
+            job._finish(CANCELLED, "中断しました")
+        except Exception as e:
+            job._finish(FAILED, str(e))
+            self._log(f"変換に失敗しました: {job.task.input_path.name} ({job.id}): {e}")
+        finally:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            inp = job.task.input_path
+            if inp in self._upload_refs:
+                self._upload_refs[inp] -= 1
+                if not self._upload_refs[inp]:
+                    del self._upload_refs[inp]
+                    self.discard_upload(inp)
+            self._remember(job)
+
+    def _convert(
+        self, job: Job, on_progress: Callable[[str, float, str], None]
+    ) -> Path:
+        # ワーカースレッドで動く。順番待ちの間に中断されていればここで終わる
+        job.token.check()
+        on_progress(str(job.task.input_path), 0.0, "")
+        task = tune_task(job.task, self.max_workers) if self.tune else job.task
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="gifconv_", dir=self.work_dir) as td:
+            out = Path(td) / "out.gif"
+            converter = Converter(
+                on_progress=on_progress, on_log=self.on_log, cancel_token=job.token
+            )
+            converter.convert(replace(task, output_dir=Path(td), output_path=out))
+            return self.cache.put(job.key, out)
@@ -0,0 +1,303 @@
+"""
+目標ファイルサイズに収めるための fps/幅/色数 の自動選択
+
+全体を何度も変換し直す代わりに、範囲内から短い区間をいくつか切り出して
+条件を変えながら符号化し、サイズのモデルを当てはめて収まる設定を予測する。
+本変換は1回（外れた場合のみ補正して1回）で済ませる。
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from math import exp, log, log2
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import subprocess
+import tempfile
+
+from ..config import presets
+from .converter import (
+    PRESCALE_FILTER,
+    ConversionTask,
+    Converter,
+    _decoder_args,
+    _thread_args,
+    resolve_output_path,
+)
+from .utils import format_seconds_to_timestamp
+
+# サンプル区間の数と長さ（秒）。範囲がこれより短ければ全体をサンプルにする
+TARGET_SAMPLE_COUNT = 3
+TARGET_SAMPLE_SECONDS = 1.0
+# 予測サイズがこの割合を超えない設定を選ぶ（予測誤差の余裕）
+TARGET_MARGIN = 0.92
+# 本変換のあとに許す補正（やり直し）の回数
+TARGET_MAX_CORRECTIONS = 1
+# 候補の下限
+MIN_TARGET_WIDTH = 160
+MIN_TARGET_FPS = 5
+# 画質の優先度（幅 > fps > 色数）。対数に掛けて候補の良さを比べる
+SCORE_WEIGHTS = (1.0, 2.0, 0.5)  # fps, 幅, 色数（ビット数）
+
+
+def _features(fps: float, width: float, colors: int) -> List[float]:
+    return [1.0, log(fps), log(width), log(log2(max(2, colors)))]
+
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    # 小さな連立一次方程式（部分ピボット付きガウス消去）
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            raise ValueError("サイズモデルを求められません")
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col:
+                f = m[r][col] / m[col][col]
+                for c in range(col, n + 1):
+                    m[r][c] -= f * m[col][c]
+    return [m[i][n] / m[i][i] for i in range(n)]
+
+
+@dataclass
+class SizeModel:
+    """
+    出力1秒あたりのバイト数を log(size) = c0 + c1*log(fps) + c2*log(幅) + c3*log(log2(色数))
+    で近似する。scale は本変換の実測で補正するための係数。
+    """
+
+    coef: Tuple[float, float, float, float]
+    scale: float = 1.0
+
+    @classmethod
+    def fit(cls, samples: Sequence[Tuple[int, int, int, float]]) -> "SizeModel":
+        """samples: (fps, 幅, 色数, 1秒あたりのバイト数) の並び"""
+        rows = [_features(f, w, c) for f, w, c, _ in samples]
+        ys = [log(max(1.0, s)) for *_, s in samples]
+        n = 4
+        # 最小二乗（変化させなかった軸で特異にならないよう、係数側に弱い正則化を入れる）
+        ata = [[sum(r[i] * r[j] for r in rows) for j in range(n)] for i in range(n)]
+        for i in range(1, n):
+            ata[i][i] += 1e-6
+        aty = [sum(r[i] * y for r, y in zip(rows, ys)) for i in range(n)]
+        c0, c1, c2, c3 = _solve(ata, aty)
+        return cls((c0, c1, c2, c3))
+
+    def bytes_per_second(self, fps: float, width: float, colors: int) -> float:
+        x = _features(fps, width, colors)
+        return self.scale * exp(sum(c * v for c, v in zip(self.coef, x)))
+
+    def predict(self, fps: float, width: float, colors: int, seconds: float) -> int:
+        return int(self.bytes_per_second(fps, width, colors) * seconds)
+
+
+def _score(fps: int, width: int, colors: int) -> float:
+    wf, ww, wc = SCORE_WEIGHTS
+    return wf * log(fps) + ww * log(width) + wc * log(log2(max(2, colors)))
+
+
+def candidate_settings(task: ConversionTask) -> List[Tuple[int, int, int]]:
+    """タスクの fps/幅/色数 を上限として、下げ方の組み合わせを列挙する"""
+    fps_options = sorted(
+        {task.fps} | {f for f in (15, 12, 10, 8, 6, MIN_TARGET_FPS) if f < task.fps},
+        reverse=True,
+    )
+    widths = [task.width]
+    w = float(task.width)
+    while True:
+        w *= 0.9
+        step = int(w) // 2 * 2
+        if step < MIN_TARGET_WIDTH:
+            break
+        widths.append(step)
+    color_options = sorted(
+        {task.colors} | {c for c in (128, 64, 32, 16) if c < task.colors},
+        reverse=True,
+    )
+    return [(f, w, c) for f in fps_options for w in widths for c in color_options]
+
+
+def choose_settings(
+    model: SizeModel, task: ConversionTask, seconds: float, limit: int
+) -> Tuple[Tuple[int, int, int], int]:
+    """予測サイズが limit 以下で最も画質の良い設定と、その予測サイズ。無ければ最小のもの"""
+    best: Optional[Tuple[float, Tuple[int, int, int], int]] = None
+    smallest: Optional[Tuple[int, Tuple[int, int, int]]] = None
+    for setting in candidate_settings(task):
+        size = model.predict(*setting, seconds)
+        if smallest is None or size < smallest[0]:
+            smallest = (size, setting)
+        if size <= limit:
+            score = _score(*setting)
+            if best is None or score > best[0]:
+                best = (score, setting, size)
+    if best is not None:
+        return best[1], best[2]
+    assert smallest is not None
+    return smallest[1], smallest[0]
+
+
+def sample_spans(
+    start: float, total: float, count: int = TARGET_SAMPLE_COUNT
+) -> List[Tuple[float, float]]:
+    """範囲を count 等分し、それぞれの中央から TARGET_SAMPLE_SECONDS を取る"""
+    if total <= count * TARGET_SAMPLE_SECONDS * 2:
+        return [(start, total)]
+    spans = []
+    for i in range(count):
+        center = start + total * (i + 0.5) / count
+        spans.append((center - TARGET_SAMPLE_SECONDS / 2, TARGET_SAMPLE_SECONDS))
+    return spans
+
+
+def build_sample_cmd(
+    task: ConversionTask, spans: Sequence[Tuple[float, float]], out_path: Path
+) -> List[str]:
+    # 各区間を入力側でシークして切り出し、上限の fps/幅 にそろえて連結する（FFV1で可逆）
+    cmd = ["ffmpeg", "-y", "-v", "error", *_thread_args(task)]
+    for s, d in spans:
+        cmd += [
+            *_decoder_args(task),
+            "-ss",
+            format_seconds_to_timestamp(s),
+            "-t",
+            format_seconds_to_timestamp(d),
+            "-i",
+            str(task.input_path),
+        ]
+    prescale = f"{PRESCALE_FILTER}," if task.prescale else ""
+    chains = [
+        f"[{i}:v]fps={task.fps},{prescale}scale={task.width}:-2:flags=lanczos,"
+        f"setsar=1[v{i}]"
+        for i in range(len(spans))
+    ]
+    inputs = "".join(f"[v{i}]" for i in range(len(spans)))
+    graph = ";".join(chains) + f";{inputs}concat=n={len(spans)}:v=1:a=0[out]"
+    cmd += ["-filter_complex", graph, "-map", "[out]", "-an", "-c:v", "ffv1"]
+    cmd += [str(out_path)]
+    return cmd
+
+
+def probe_settings(task: ConversionTask) -> List[Tuple[int, int, int]]:
+    """モデルの当てはめに使う設定（各軸を単独で下げたもの + 全部下げたもの）"""
+    low_fps = max(1, min(task.fps, max(MIN_TARGET_FPS, task.fps // 2)))
+    low_width = max(MIN_TARGET_WIDTH, task.width // 2 // 2 * 2)
+    low_colors = max(2, task.colors // 4)
+    settings = [
+        (task.fps, task.width, task.colors),
+        (low_fps, task.width, task.colors),
+        (task.fps, low_width, task.colors),
+        (task.fps, task.width, low_colors),
+        (low_fps, low_width, low_colors),
+    ]
+    return list(dict.fromkeys(settings))
+
+
+def preset_ladder_passes(model: SizeModel, seconds: float, limit: int) -> int:
+    """プリセットを高品質から順に試して収まるまでの本変換回数（予測）"""
+    ladder = sorted(
+        presets.values(),
+        key=lambda p: model.predict(p["fps"], p["width"], p["colors"], seconds),
+        reverse=True,
+    )
+    for i, p in enumerate(ladder, 1):
+        if model.predict(p["fps"], p["width"], p["colors"], seconds) <= limit:
+            return i
+    # どのプリセットにも収まらなければ、さらに手で下げて最低1回は追加
+    return len(ladder) + 1
+
+
+def convert_to_target(
+    converter: Converter, task: ConversionTask, total_duration: float
+) -> Path:
+    """task.target_bytes に収まる設定を予測して変換する。失敗時は RuntimeError"""
+    target = task.target_bytes
+    base = replace(task, target_bytes=0)
+    spans = sample_spans(task.start, total_duration)
+    sample_seconds = sum(d for _, d in spans)
+
+    def log_(text: str) -> None:
+        if converter.on_log:
+            converter.on_log(text)
+
+    # 1) サンプル区間を1本の中間ファイルにまとめ、条件を変えて符号化
+    measured: List[Tuple[int, int, int, float]] = []
+    with tempfile.TemporaryDirectory(prefix="gifsize_") as td, converter.stage(
+        "sample"
+    ):
+        tmpdir = Path(td)
+        sample = tmpdir / "sample.mkv"
+        proc = converter.cancel_token.run(
+            build_sample_cmd(task, spans, sample),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        if proc.returncode != 0 or not sample.exists():
+            err = proc.stderr.decode("utf-8", errors="replace")
+            raise RuntimeError(f"ffmpegエラー: {err[-400:]}")
+        quiet = Converter(
+            palette_cache=converter.palette_cache,
+            cancel_token=converter.cancel_token,
+        )
+        for i, (fps, width, colors) in enumerate(probe_settings(task)):
+            out = tmpdir / f"probe{i}.gif"
+            quiet.convert(
+                replace(
+                    base,
+                    input_path=sample,
+                    start=0.0,
+                    duration=sample_seconds,
+                    fps=fps,
+                    width=width,
+                    colors=colors,
+                    output_path=out,
+                    segments=0,
+                    use_palette_cache=False,
+                    lowres=0,  # サンプルは縮小済みの FFV1
+                    prescale=False,
+                )
+            )
+            measured.append((fps, width, colors, out.stat().st_size / sample_seconds))
+            if converter.telemetry and quiet.last_telemetry:
+                converter.telemetry.record_rss(quiet.last_telemetry.peak_rss_bytes)
+    model = SizeModel.fit(measured)
+    log_(
+        f"目標サイズ {target / 1024 / 1024:.2f}MB: "
+        f"{len(spans)} 区間 計{sample_seconds:.1f}秒を"
+        f" {len(measured)} 条件で試し符号化しました"
+    )
+
+    # 2) 予測で設定を選び本変換。超えた場合は実測で係数を補正して選び直す
+    limit = int(target * TARGET_MARGIN)
+    full_passes = 0
+    out_path = resolve_output_path(task)
+    while True:
+        (fps, width, colors), predicted = choose_settings(
+            model, task, total_duration, limit
+        )
+        log_(
+            f"目標サイズ: {fps}fps / {width}px / {colors}色 を選択"
+            f"（予測 {predicted / 1024 / 1024:.2f}MB）"
+        )
+        converter.convert(
+            replace(base, fps=fps, width=width, colors=colors, output_path=out_path)
+        )
+        full_passes += 1
+        actual = out_path.stat().st_size
+        if actual <= target or full_passes > TARGET_MAX_CORRECTIONS:
+            break
+        model.scale *= actual / max(1, predicted)
+        log_(
+            f"目標サイズ: 実測 {actual / 1024 / 1024:.2f}MB が上限を超えたため補正します"
+        )
+
+    ladder = preset_ladder_passes(model, total_duration, target)
+    log_(
+        f"目標サイズ: 実測 {actual / 1024 / 1024:.2f}MB"
+        f"（本変換 {full_passes} 回。プリセットを順に試す場合の推定 {ladder} 回より"
+        f" {max(0, ladder - full_passes)} 回少ない）"
+    )
+    if actual > target:
+        log_("目標サイズに収まりませんでした。範囲を短くするか上限の設定を下げてください")
+    return out_path
@@ -0,0 +1,61 @@
+"""
+ファイルではなく、ファイルオブジェクトやパイプ（標準出力など）へGIFを書き出す
+
+ffmpeg の出力を pipe:1 にして、エンコードしながら一定量ずつ書き出し先へ渡す。
+書き出しながらでは作れない設定（目標サイズ、書き上げた後に手を加える後処理、分割並列）は
+一時ファイルに変換してから同じように少しずつ書き出す。
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import BinaryIO
+
+from .converter import ConversionTask
+
+# 書き出し先へ渡す1回あたりの量
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class StreamSink:
+    """書き出し先のファイルオブジェクト。渡した量を数え、書けなければ RuntimeError"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = STREAM_CHUNK_BYTES) -> None:
+        self.stream = stream
+        self.chunk_size = max(1, chunk_size)
+        self.written = 0
+        self.failed = False
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        try:
+            self.stream.write(data)
+            # 読む側がすぐ受け取れるよう、書くたびに送り出す
+            flush = getattr(self.stream, "flush", None)
+            if flush:
+                flush()
+        except (OSError, ValueError) as e:
+            # 読む側が先に閉じた（BrokenPipeError）場合など
+            self.failed = True
+            raise RuntimeError(f"出力先に書き込めません: {e}")
+        self.written += len(data)
+
+
+def copy_to_sink(path: Path, sink: StreamSink) -> None:
+    """書き上がったファイルを chunk_size ずつ書き出す"""
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(sink.chunk_size)
+            if not chunk:
+                break
+            sink.write(chunk)
+
+
+def can_stream(task: ConversionTask) -> bool:
+    """エンコードしながら書き出せる設定か（できなければ一時ファイルを経由する）"""
+    if task.target_bytes > 0:
+        return False
+    if task.engine == "numpy":
+        # 逐次書き出しなので、間引きや差分の統合も書きながら済む
+        return True
+    return not (task.decimate or task.diff_frames or task.segments > 1)
@@ -0,0 +1,245 @@
+"""
+変換の計測（工程ごとの所要時間、処理速度、ffmpeg のピークRSS、入出力バイト数）と、
+一括変換ごとの JSON/CSV レポート
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+REPORT_VERSION = 1
+
+# CSV に列として出す工程（それ以外は stage_other にまとめる）
+REPORT_STAGES = (
+    "probe",
+    "sample",
+    "palettegen",
+    "single_pass",
+    "paletteuse",
+    "segments",
+    "join",
+    "postprocess",
+    "decode",
+    "quantize",
+    "encode",
+)
+
+
+@dataclass
+class TaskTelemetry:
+    input_path: str = ""
+    output_path: str = ""
+    ok: bool = False
+    cancelled: bool = False
+    skipped: bool = False  # 出力が最新のため変換しなかった
+    error: str = ""
+    engine: str = ""
+    stages: Dict[str, float] = field(default_factory=dict)  # 工程名 → 秒（累計）
+    wall: float = 0.0
+    media_seconds: float = 0.0  # 変換した範囲の長さ
+    frames: int = 0  # 出力fpsで処理したフレーム数
+    input_bytes: int = 0
+    output_bytes: int = 0
+    peak_rss_bytes: int = 0  # ffmpeg 子プロセスのピークRSS（取れない環境では0）
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - t0)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_rss(self, rss: Optional[int]) -> None:
+        if rss:
+            with self._lock:
+                self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+
+    @property
+    def speed(self) -> float:
+        """実時間に対する倍率（1.0 で再生と同じ速さ）"""
+        return self.media_seconds / self.wall if self.wall > 0 else 0.0
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.wall if self.wall > 0 else 0.0
+
+    def summary(self) -> str:
+        stages = " / ".join(f"{k} {v:.2f}s" for k, v in self.stages.items())
+        rss = (
+            f" / ffmpeg最大RSS {self.peak_rss_bytes / 1024 / 1024:.0f}MB"
+            if self.peak_rss_bytes
+            else ""
+        )
+        return (
+            f"計測: {stages} / 計 {self.wall:.2f}s"
+            f"（{self.speed:.2f}倍速, {self.fps:.1f}fps）"
+            f" / 入力 {self.input_bytes / 1024 / 1024:.1f}MB"
+            f" → 出力 {self.output_bytes / 1024 / 1024:.2f}MB{rss}"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["speed"] = round(self.speed, 4)
+        data["fps"] = round(self.fps, 3)
+        data["stages"] = {k: round(v, 4) for k, v in self.stages.items()}
+        data["wall"] = round(self.wall, 4)
+        return data
+
+
+def wait_with_rusage(proc: subprocess.Popen) -> Optional[int]:
+    """
+    proc の終了を待ち、そのプロセスのピークRSS（バイト）を返す。
+    POSIX は wait4 で子プロセス単体の値を取る（並列実行中でも混ざらない）。
+    取れない場合（Windows、他スレッドが先に回収した等）は通常の wait をして None。
+    """
+    if hasattr(os, "wait4") and proc.returncode is None:
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except ChildProcessError:
+            proc.wait()
+            return None
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # Linux は KiB、macOS はバイト単位
+        scale = 1 if sys.platform == "darwin" else 1024
+        return usage.ru_maxrss * scale
+    proc.wait()
+    return None
+
+
+def sample_rss(proc: subprocess.Popen) -> Optional[int]:
+    """実行中の proc のピークRSS。psutil がある Windows のみ（無ければ None）"""
+    if os.name != "nt":
+        return None
+    try:
+        import psutil  # 任意依存
+
+        return int(psutil.Process(proc.pid).memory_info().peak_wset)
+    except Exception:
+        return None
+
+
+@dataclass
+class BatchReport:
+    started_at: str
+    wall: float
+    concurrency: int
+    tasks: List[TaskTelemetry]
+    plan: float = 0.0  # 尺の事前調査にかかった時間
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": REPORT_VERSION,
+            "started_at": self.started_at,
+            "wall": round(self.wall, 4),
+            "plan": round(self.plan, 4),
+            "concurrency": self.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ok": sum(1 for t in self.tasks if t.ok),
+            "failed": sum(1 for t in self.tasks if not t.ok and not t.cancelled),
+            "cancelled": sum(1 for t in self.tasks if t.cancelled),
+            "skipped": sum(1 for t in self.tasks if t.skipped),
+            "input_bytes": sum(t.input_bytes for t in self.tasks),
+            "output_bytes": sum(t.output_bytes for t in self.tasks),
+            "tasks": [t.to_dict() for t in self.tasks],
+        }
+
+
+def report_rows(report: BatchReport) -> Tuple[List[str], List[List[Any]]]:
+    """CSV 用の見出しと行（1タスク1行、工程は列に展開）"""
+    header = [
+        "input_path",
+        "output_path",
+        "ok",
+        "cancelled",
+        "skipped",
+        "engine",
+        "wall",
+        "speed",
+        "fps",
+        "media_seconds",
+        "frames",
+        "input_bytes",
+        "output_bytes",
+        "peak_rss_bytes",
+        *(f"stage_{s}" for s in REPORT_STAGES),
+        "stage_other",
+        "error",
+    ]
+    rows: List[List[Any]] = []
+    for t in report.tasks:
+        other = sum(v for k, v in t.stages.items() if k not in REPORT_STAGES)
+        rows.append(
+            [
+                t.input_path,
+                t.output_path,
+                int(t.ok),
+                int(t.cancelled),
+                int(t.skipped),
+                t.engine,
+                round(t.wall, 4),
+                round(t.speed, 4),
+                round(t.fps, 3),
+                round(t.media_seconds, 3),
+                t.frames,
+                t.input_bytes,
+                t.output_bytes,
+                t.peak_rss_bytes,
+                *(round(t.stages.get(s, 0.0), 4) for s in REPORT_STAGES),
+                round(other, 4),
+                t.error,
+            ]
+        )
+    return header, rows
+
+
+def write_report(report: BatchReport, directory: Path) -> Tuple[Path, Path]:
+    """
+    directory に batch-<日時>.json と .csv を書き、そのパスを返す。
+    同じ秒に始まった一括変換（監視フォルダと変換サービスの併用など）は -2, -3… を付けて分ける
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    base = "batch-" + report.started_at.replace(":", "").replace("-", "")
+    text = json.dumps(report.to_dict(), ensure_ascii=False, indent=2)
+    n = 1
+    while True:
+        stem = base if n == 1 else f"{base}-{n}"
+        json_path = directory / f"{stem}.json"
+        try:
+            # 排他的に作成して名前を確保する（既存のレポートは上書きしない）
+            with json_path.open("x", encoding="utf-8") as f:
+                f.write(text)
+            break
+        except FileExistsError:
+            n += 1
+    csv_path = directory / f"{stem}.csv"
+    header, rows = report_rows(report)
+    # Excel で文字化けしないよう BOM 付きで書く
+    with csv_path.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return json_path, csv_path
+
+
+def now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
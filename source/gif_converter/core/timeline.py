@@ -0,0 +1,225 @@
+"""
+タイムライン用のサムネイル帯とキーフレーム索引（Qtを読み込まない）
+
+- サムネイル帯: fps フィルタで等間隔に間引いたフレームを tile で1枚に並べ、
+  1回のデコードでPPMとしてパイプで受け取る
+- キーフレーム索引: ffprobe でパケットのフラグだけを読む（デコードしない）
+- どの区間にもキーフレームがある動画では、サムネイル帯はキーフレームだけをデコードする
+  （-skip_frame nokey）。lowres 対応のコーデックはデコーダ側でも縮小する
+どちらもプレビューキャッシュにファイル単位で保持し、開き直したときは ffmpeg を起動しない。
+"""
+
+from __future__ import annotations
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+import json
+import subprocess
+
+from .cache import DiskCache, file_fingerprint, make_key
+from .cancel import CancelToken, run_process
+from .metadata import probe_info
+from .tuning import lowres_level
+from .utils import RgbFrame, parse_ppm
+
+THUMB_COUNT = 40
+THUMB_HEIGHT = 48
+
+
+@dataclass
+class TimelineIndex:
+    duration: float
+    keyframes: List[float]  # 昇順の秒
+    strip: RgbFrame  # サムネイルを横一列に並べた1枚の画像
+    count: int  # サムネイル数
+
+    @property
+    def thumb_width(self) -> int:
+        return self.strip.width // max(1, self.count)
+
+    def snap(self, t: float) -> float:
+        """最も近いキーフレームの時刻（索引が無ければそのまま）"""
+        return nearest_keyframe(self.keyframes, t)
+
+
+def nearest_keyframe(keyframes: List[float], t: float) -> float:
+    # 入力側の -ss はキーフレームから目的の時刻までデコードし直すので、
+    # キーフレーム上ならほぼデコードなしで1枚目が出る
+    if not keyframes:
+        return t
+    i = bisect_left(keyframes, t)
+    candidates = keyframes[max(0, i - 1) : i + 1]
+    return min(candidates, key=lambda k: abs(k - t))
+
+
+def parse_keyframe_csv(text: str) -> List[float]:
+    """ffprobe -of csv=p=0 の 'pts_time,flags' 行からキーフレームの時刻を取り出す"""
+    times: List[float] = []
+    for line in text.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or "K" not in parts[-1]:
+            continue
+        try:
+            times.append(float(parts[0]))
+        except ValueError:
+            continue  # pts_time が N/A のパケット
+    return sorted(set(times))
+
+
+def build_keyframe_cmd(input_path: Path) -> List[str]:
+    return [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+        str(input_path),
+    ]
+
+
+def keyframes_cover(keyframes: List[float], duration: float, count: int) -> bool:
+    """キーフレームの間隔がサムネイル1枚分の区間以下か（キーフレームだけで帯を作れるか）"""
+    if not keyframes or duration <= 0 or count <= 0:
+        return False
+    points = [0.0, *keyframes, duration]
+    gap = max(b - a for a, b in zip(points, points[1:]))
+    return gap <= duration / count
+
+
+def build_strip_cmd(
+    input_path: Path,
+    duration: float,
+    count: int,
+    height: int,
+    keyframes_only: bool = False,
+    lowres: int = 0,
+) -> List[str]:
+    # 最後の1枚がはみ出して2枚目のタイルにならないよう、尺からfpsを決めて1枚だけ取り出す
+    rate = count / max(duration, 0.001)
+    decoder: List[str] = []
+    if keyframes_only:
+        decoder += ["-skip_frame", "nokey"]
+    if lowres > 0:
+        decoder += ["-lowres", str(lowres)]
+    return [
+        "ffmpeg",
+        "-v",
+        "error",
+        *decoder,
+        "-i",
+        str(input_path),
+        "-an",
+        "-sn",
+        "-vf",
+        f"fps={rate:.6f},scale=-2:{height}:flags=bilinear,tile={count}x1",
+        "-frames:v",
+        "1",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "ppm",
+        "pipe:1",
+    ]
+
+
+def read_keyframes(
+    input_path: Path, cancel_token: Optional[CancelToken] = None
+) -> List[float]:
+    try:
+        out = run_process(
+            build_keyframe_cmd(input_path),
+            cancel_token,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ).stdout
+    except OSError:
+        return []
+    return parse_keyframe_csv(out.decode("utf-8", errors="replace"))
+
+
+def read_strip(
+    input_path: Path,
+    duration: float,
+    count: int,
+    height: int,
+    cancel_token: Optional[CancelToken] = None,
+    keyframes: Optional[List[float]] = None,
+) -> RgbFrame:
+    info = probe_info(input_path)
+    proc = run_process(
+        build_strip_cmd(
+            input_path,
+            duration,
+            count,
+            height,
+            keyframes_only=keyframes_cover(keyframes or [], duration, count),
+            lowres=lowres_level(info.codec, info.height, height),
+        ),
+        cancel_token,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if proc.returncode != 0 or not proc.stdout:
+        err = proc.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"サムネイルの生成に失敗しました: {err[-400:]}")
+    try:
+        return parse_ppm(proc.stdout)
+    except ValueError as e:
+        raise RuntimeError(f"サムネイルの読み込みに失敗しました: {e}")
+
+
+def load_timeline(
+    input_path: Path,
+    cache: DiskCache,
+    count: int = THUMB_COUNT,
+    height: int = THUMB_HEIGHT,
+    cancel_token: Optional[CancelToken] = None,
+) -> TimelineIndex:
+    """サムネイル帯とキーフレーム索引を返す。キャッシュにあればそれを使う"""
+    fingerprint = file_fingerprint(input_path)
+    strip_key = make_key(fingerprint, "strip", count, height) + ".ppm"
+    index_key = make_key(fingerprint, "keyframes") + ".json"
+
+    strip: Optional[RgbFrame] = None
+    hit = cache.get(strip_key)
+    if hit:
+        try:
+            strip = parse_ppm(hit.read_bytes())
+        except (OSError, ValueError):
+            strip = None
+    meta = None
+    hit = cache.get(index_key)
+    if hit:
+        try:
+            meta = json.loads(hit.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = None
+
+    if meta is None:
+        duration = probe_info(input_path).duration
+        if duration <= 0:
+            raise RuntimeError("動画の長さを取得できませんでした")
+        keyframes = read_keyframes(input_path, cancel_token)
+        meta = {"duration": duration, "keyframes": keyframes}
+        cache.put_bytes(index_key, json.dumps(meta).encode("utf-8"))
+    if strip is None:
+        strip = read_strip(
+            input_path,
+            float(meta["duration"]),
+            count,
+            height,
+            cancel_token,
+            [float(k) for k in meta["keyframes"]],
+        )
+        cache.put_bytes(strip_key, strip.to_ppm())
+    return TimelineIndex(
+        duration=float(meta["duration"]),
+        keyframes=[float(k) for k in meta["keyframes"]],
+        strip=strip,
+        count=count,
+    )
@@ -0,0 +1,77 @@
+"""
+ハードウェアに依存しないデコード側の高速化
+
+- 同時実行数から ffmpeg 1本あたりのスレッド数を決める（コア数を取り合わないように）
+- 大きく縮小する場合は、lanczos の前に安価な 1/2 縮小を挟む
+- lowres に対応したコーデック（MJPEG/MPEG-4 Part 2 など）はデコーダ側で縮小する
+"""
+
+from __future__ import annotations
+from dataclasses import replace
+import os
+
+from .converter import ConversionTask
+from .metadata import probe_info
+
+# 元の幅が出力幅のこの倍以上なら、先に 1/2 に縮小する。
+# 縮小率が小さいと lanczos 自体が軽く、段を増やす分だけ遅くなることがある
+PRESCALE_MIN_RATIO = 4.0
+
+# デコーダ側縮小（1/2^n）に対応するコーデックと、n の上限。
+# H.264/HEVC/VP9 などは対応していない（指定しても無視される）
+LOWRES_CODECS = frozenset(
+    {
+        "mjpeg",
+        "jpeg2000",
+        "mpeg1video",
+        "mpeg2video",
+        "mpeg4",
+        "h263",
+        "h263p",
+        "msmpeg4v1",
+        "msmpeg4v2",
+        "msmpeg4v3",
+        "wmv1",
+        "wmv2",
+        "dvvideo",
+    }
+)
+MAX_LOWRES = 3
+
+
+def threads_for(concurrency: int) -> int:
+    """同時に concurrency 本動かすときの、1本あたりのスレッド数"""
+    cpus = os.cpu_count() or 1
+    return max(1, cpus // max(1, concurrency))
+
+
+def lowres_level(codec: str, source_width: int, target_width: int) -> int:
+    """出力幅を下回らない範囲で、デコーダ側で縮小できる段数（0なら縮小しない）"""
+    if codec not in LOWRES_CODECS or source_width <= 0 or target_width <= 0:
+        return 0
+    level = 0
+    while level < MAX_LOWRES and (source_width >> (level + 1)) >= target_width:
+        level += 1
+    return level
+
+
+def needs_prescale(source_width: int, target_width: int) -> bool:
+    return target_width > 0 and source_width >= target_width * PRESCALE_MIN_RATIO
+
+
+def tune_task(task: ConversionTask, concurrency: int = 1) -> ConversionTask:
+    """スレッド数と縮小の前処理を決めたタスクを返す（元の task は変更しない）"""
+    threads = threads_for(concurrency)
+    if task.prescaled:
+        # プレビュー用の中間ファイルは縮小済み
+        return replace(task, threads=threads)
+    info = probe_info(task.input_path)
+    if info.width <= 0:
+        return replace(task, threads=threads)
+    lowres = lowres_level(info.codec, info.width, task.width)
+    return replace(
+        task,
+        threads=threads,
+        lowres=lowres,
+        prescale=needs_prescale(info.width >> lowres, task.width),
+    )
@@ -1,10 +1,13 @@
 from __future__ import annotations
+from dataclasses import dataclass
 from pathlib import Path
 import subprocess
-import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-TIME_RE = re.compile(r"time=([0-9:.]+)")
+from .cancel import CancelToken, run_process
+
+# 変換対象として扱う動画の拡張子
+VIDEO_SUFFIXES = {".mp4", ".mov", ".mkv", ".avi"}
 
 
 def parse_time_to_seconds(time_str: str) -> float:
@@ -33,21 +36,11 @@ def format_seconds_to_timestamp(seconds: float) -> str:
 
 
 def probe_duration(input_path: Path) -> float:
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
-        str(input_path),
-    ]
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        return float(out.decode("utf-8").strip())
-    except Exception:
-        return 0.0
+    # 結果はファイル単位でキャッシュされる（詳しくは metadata.probe_info）。
+    # metadata はGUIの起動時に要らないので使うときに読み込む
+    from .metadata import probe_info
+
+    return probe_info(input_path).duration
 
 
 def ensure_output_dir(path: Path) -> Path:
@@ -69,32 +62,83 @@ def build_output_filename(
         return f"{name}.gif"
 
 
-def parse_progress_time_from_line(line: str) -> Optional[float]:
-    m = TIME_RE.search(line)
-    if not m:
-        return None
-    return parse_time_to_seconds(m.group(1))
+@dataclass(frozen=True)
+class RgbFrame:
+    """RGB24 の生フレーム（1行 = 幅*3 バイト、行間の詰め物なし）"""
+
+    width: int
+    height: int
+    data: bytes
+
+    def to_ppm(self) -> bytes:
+        """parse_ppm で読み戻せるバイナリPPM"""
+        return f"P6\n{self.width} {self.height}\n255\n".encode("ascii") + self.data
+
+
+def parse_ppm(blob: bytes) -> RgbFrame:
+    """バイナリPPM(P6, 最大値255)をヘッダとRGBの生データに分ける。不正なら ValueError"""
+    fields: List[bytes] = []
+    pos = 0
+    while len(fields) < 4:
+        while pos < len(blob) and blob[pos : pos + 1].isspace():
+            pos += 1
+        if blob[pos : pos + 1] == b"#":
+            pos = blob.find(b"\n", pos)
+            if pos < 0:
+                raise ValueError("PPMヘッダが途中で切れています")
+            continue
+        end = pos
+        while end < len(blob) and not blob[end : end + 1].isspace():
+            end += 1
+        if end == pos:
+            raise ValueError("PPMヘッダが途中で切れています")
+        fields.append(blob[pos:end])
+        pos = end
+    magic, w, h, maxval = fields
+    if magic != b"P6" or maxval != b"255":
+        raise ValueError("P6/8bit 以外のPPMには対応していません")
+    width, height = int(w), int(h)
+    data = blob[pos + 1 : pos + 1 + width * height * 3]  # ヘッダ直後の空白1文字を飛ばす
+    if len(data) != width * height * 3:
+        raise ValueError("PPMのデータが不足しています")
+    return RgbFrame(width, height, data)
 
 
-def extract_frame_png(
-    input_path: Path, time_sec: float, output_png: Path, width: int
-) -> bool:
-    # 1フレーム抽出
+def extract_frame_rgb(
+    input_path: Path,
+    time_sec: float,
+    width: int,
+    cancel: Optional[CancelToken] = None,
+) -> Optional[RgbFrame]:
+    """
+    1フレームを RGB の生データとしてパイプで受け取る（一時ファイルを作らない）。
+    高さの分からない rawvideo の代わりに、ヘッダに寸法が入る PPM で出力させる。
+    """
     cmd = [
         "ffmpeg",
-        "-y",
+        "-v",
+        "error",
         "-ss",
         format_seconds_to_timestamp(time_sec),
         "-i",
         str(input_path),
-        "-vframes",
+        "-frames:v",
         "1",
         "-vf",
         f"scale={width}:-1:flags=lanczos",
-        str(output_png),
+        "-an",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "ppm",
+        "pipe:1",
     ]
     try:
-        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        return output_png.exists()
-    except Exception:
-        return False
+        proc = run_process(
+            cmd, cancel, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        if proc.returncode != 0 or not proc.stdout:
+            return None
+        return parse_ppm(proc.stdout)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,332 @@
+"""
+監視フォルダ: 録画の書き出し先を見張り、書き終わった動画を自動でGIFにする（Qt非依存）
+
+- 一定間隔でフォルダを調べ、サイズと更新時刻が WATCH_SETTLE_SECONDS 変わらなければ完成とみなす
+- 同時実行数の上限付きで変換し、システムの負荷が高い間は新しい変換の開始を控える
+- 処理したファイルは設定フォルダの watch.json に記録し、再起動しても変換し直さない
+- 失敗したファイルは間隔を延ばしながら数回だけ試し直す（書き込み中・ロック中の失敗に備える）
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import threading
+import time
+
+from ..config import get_config_dir
+from .batch import BatchDoneCallback, default_concurrency
+from .cache import file_fingerprint
+from .cancel import CancelToken, ConversionCancelled
+from .converter import ConversionTask, Converter, LogCallback
+from .tuning import tune_task
+from .utils import VIDEO_SUFFIXES
+
+# フォルダを調べる間隔（秒）
+WATCH_POLL_SECONDS = 2.0
+# サイズと更新時刻がこの秒数変わらなければ書き込み完了とみなす
+WATCH_SETTLE_SECONDS = 5.0
+# 1コアあたりの負荷（1分平均）がこれを超えている間は変換を増やさない
+WATCH_BUSY_LOAD = 1.25
+# 負荷が高いときの待ち時間の上限（秒）。ここまで待っても下がらなければ1本ずつは進める
+WATCH_MAX_BACKOFF = 60.0
+# 失敗したファイルを試す回数（ファイルが更新されれば数え直す）
+WATCH_MAX_ATTEMPTS = 3
+# 失敗したファイルを次に試すまでの待ち（秒）。失敗するたびに倍にする
+WATCH_RETRY_DELAY = 30.0
+# 記録の件数の上限（古いものから捨てる）
+STORE_MAX_ENTRIES = 5000
+
+
+@dataclass
+class _FileState:
+    size: int
+    mtime_ns: int
+    since: float  # この状態になった時刻（monotonic）
+
+
+class StabilityTracker:
+    """ファイルごとにサイズと更新時刻を覚え、settle 秒変化しなかったものを返す"""
+
+    def __init__(self, settle: float = WATCH_SETTLE_SECONDS) -> None:
+        self.settle = settle
+        self._states: Dict[Path, _FileState] = {}
+
+    def update(self, paths: Iterable[Path], now: Optional[float] = None) -> List[Path]:
+        now = time.monotonic() if now is None else now
+        ready: List[Path] = []
+        seen = set()
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen.add(path)
+            prev = self._states.get(path)
+            if prev is None or (prev.size, prev.mtime_ns) != (
+                st.st_size,
+                st.st_mtime_ns,
+            ):
+                self._states[path] = _FileState(st.st_size, st.st_mtime_ns, now)
+                continue
+            if st.st_size > 0 and now - prev.since >= self.settle:
+                ready.append(path)
+        # 消えた/移動したファイルは忘れる
+        for path in list(self._states):
+            if path not in seen:
+                del self._states[path]
+        return ready
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts 回失敗したファイルを次に試すまでの秒数"""
+    return WATCH_RETRY_DELAY * 2 ** max(0, attempts - 1)
+
+
+class ProcessedStore:
+    """
+    処理済みファイルの記録（指紋 = パス/サイズ/更新時刻 → 結果）。
+    上書きされたファイルは指紋が変わるので、もう一度変換の対象になる。
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or get_config_dir() / "watch.json"
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                # 無い/壊れている場合は空から
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        entries = self._load()
+        if len(entries) > STORE_MAX_ENTRIES:
+            for key in list(entries)[: len(entries) - STORE_MAX_ENTRIES]:
+                del entries[key]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(
+                json.dumps(entries, ensure_ascii=False, indent=1), encoding="utf-8"
+            )
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def should_process(self, fingerprint: str, now: Optional[float] = None) -> bool:
+        with self._lock:
+            entry = self._load().get(fingerprint)
+        if entry is None:
+            return True
+        attempts = int(entry.get("attempts", 0))
+        if entry.get("ok") or attempts >= WATCH_MAX_ATTEMPTS:
+            return False
+        # 失敗の直後に続けて試すと、書き込み中/ロック中のファイルで回数を使い切ってしまう
+        now = time.time() if now is None else now
+        return now - float(entry.get("failed_at", 0.0)) >= retry_delay(attempts)
+
+    def record(
+        self,
+        fingerprint: str,
+        ok: bool,
+        output: str,
+        error: str,
+        now: Optional[float] = None,
+    ) -> int:
+        """結果を記録し、これまでに試した回数を返す"""
+        with self._lock:
+            entries = self._load()
+            prev = entries.pop(fingerprint, {})
+            entry = {
+                "ok": ok,
+                "output": output,
+                "error": error,
+                "attempts": int(prev.get("attempts", 0)) + 1,
+                "at": datetime.now().isoformat(timespec="seconds"),
+            }
+            if not ok:
+                entry["failed_at"] = time.time() if now is None else now
+            entries[fingerprint] = entry
+            self._save()
+        return entry["attempts"]
+
+
+def load_factor() -> float:
+    """1コアあたりの負荷（直近1分の平均）。取れない環境では0"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        pass
+    try:
+        import psutil  # 任意依存（Windows）
+
+        return psutil.cpu_percent(interval=None) / 100.0
+    except Exception:
+        return 0.0
+
+
+class FolderWatcher:
+    """
+    dirs 直下の動画を監視して変換する。make_task は入力パスから ConversionTask を作る
+    （出力名や設定を決めるのは呼び出し側）。run() は stop() されるまで戻らない。
+    """
+
+    def __init__(
+        self,
+        dirs: List[Path],
+        make_task: Callable[[Path], ConversionTask],
+        max_workers: int = 0,
+        store: Optional[ProcessedStore] = None,
+        on_log: Optional[LogCallback] = None,
+        on_done: Optional[BatchDoneCallback] = None,
+        poll: float = WATCH_POLL_SECONDS,
+        settle: float = WATCH_SETTLE_SECONDS,
+        busy_load: float = WATCH_BUSY_LOAD,
+        load: Callable[[], float] = load_factor,
+    ) -> None:
+        self.dirs = [Path(d) for d in dirs]
+        self.make_task = make_task
+        self.max_workers = max_workers if max_workers > 0 else default_concurrency()
+        self.store = store or ProcessedStore()
+        self.on_log = on_log
+        self.on_done = on_done
+        self.poll = poll
+        self.busy_load = busy_load
+        self.load = load
+        self.tracker = StabilityTracker(settle)
+        self._lock = threading.Lock()
+        self._running: Dict[Path, CancelToken] = {}
+        self._stopped = threading.Event()
+        self._backoff = 0.0
+
+    def _log(self, text: str) -> None:
+        if self.on_log:
+            self.on_log(text)
+
+    def stop(self) -> None:
+        """監視を終え、実行中の変換も止める（どのスレッドから呼んでもよい）"""
+        self._stopped.set()
+        with self._lock:
+            tokens = list(self._running.values())
+        for token in tokens:
+            token.cancel()
+
+    @property
+    def running(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def scan(self) -> List[Path]:
+        files: List[Path] = []
+        for d in self.dirs:
+            try:
+                entries = list(d.iterdir())
+            except OSError:
+                continue
+            files += [
+                p for p in entries if p.suffix.lower() in VIDEO_SUFFIXES and p.is_file()
+            ]
+        return files
+
+    def _pending(self, ready: List[Path]) -> List[Path]:
+        pending: List[Tuple[int, Path]] = []
+        with self._lock:
+            running = set(self._running)
+        for path in ready:
+            if path in running:
+                continue
+            try:
+                fingerprint = file_fingerprint(path)
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if self.store.should_process(fingerprint):
+                pending.append((mtime, path))
+        # 古い録画から順に
+        return [path for _, path in sorted(pending)]
+
+    def poll_once(self, ex: ThreadPoolExecutor) -> float:
+        """1回分の走査と投入を行い、次に調べるまでの秒数を返す"""
+        pending = self._pending(self.tracker.update(self.scan()))
+        if not pending or self.running >= self.max_workers:
+            return self.poll
+        busy = self.load() > self.busy_load
+        if busy and (self.running or self._backoff < WATCH_MAX_BACKOFF):
+            # 負荷が高い間は増やさず、確認の間隔を延ばしていく
+            first = self._backoff == 0.0
+            self._backoff = min(WATCH_MAX_BACKOFF, max(self.poll, self._backoff * 2))
+            if first:
+                self._log(
+                    f"負荷が高いため新しい変換を待ちます（未処理 {len(pending)} 件）"
+                )
+            return self._backoff
+        if not busy:
+            self._backoff = 0.0
+        # 負荷が高いまま待ちの上限に達した場合は1本だけ進める
+        slots = 1 if busy else self.max_workers - self.running
+        for path in pending[:slots]:
+            self._start(ex, path)
+        return self.poll
+
+    def _start(self, ex: ThreadPoolExecutor, path: Path) -> None:
+        try:
+            fingerprint = file_fingerprint(path)
+            task = self.make_task(path)
+        except Exception as e:
+            self._log(f"{path.name}: 変換の準備に失敗しました: {e}")
+            return
+        token = CancelToken()
+        with self._lock:
+            self._running[path] = token
+        self._log(f"{path.name}: 変換を開始します")
+        ex.submit(self._convert, path, fingerprint, task, token)
+
+    def _convert(
+        self, path: Path, fingerprint: str, task: ConversionTask, token: CancelToken
+    ) -> None:
+        converter = Converter(
+            on_log=lambda text: self._log(f"{path.name}: {text}"),
+            cancel_token=token,
+        )
+        out = ""
+        error = ""
+        try:
+            out = str(converter.convert(tune_task(task, self.max_workers)))
+        except ConversionCancelled:
+            # 停止による中断は記録しない（次に起動したときにやり直す）
+            return
+        except Exception as e:
+            error = str(e)
+        finally:
+            with self._lock:
+                self._running.pop(path, None)
+        attempts = self.store.record(fingerprint, not error, out, error)
+        if error and attempts < WATCH_MAX_ATTEMPTS:
+            self._log(
+                f"{path.name}: {retry_delay(attempts):.0f}秒後にもう一度試します"
+                f"（{attempts}/{WATCH_MAX_ATTEMPTS}回目が失敗）"
+            )
+        if self.on_done:
+            self.on_done(str(path), not error, out, error)
+
+    def run(self) -> None:
+        dirs = ", ".join(str(d) for d in self.dirs)
+        self._log(f"監視を開始しました: {dirs}（同時実行数 {self.max_workers}）")
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="gifwatch"
+        ) as ex:
+            try:
+                while not self._stopped.is_set():
+                    self._stopped.wait(self.poll_once(ex))
+            finally:
+                # Ctrl+C 等で抜ける場合も ffmpeg を残さない
+                self.stop()
@@ -1,9 +1,8 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Optional
-import tempfile
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from PyQt5.QtCore import Qt, QThread, pyqtSlot
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -19,23 +18,47 @@ from PyQt5.QtWidgets import (
     QMessageBox,
     QLineEdit,
     QDoubleSpinBox,
+    QSpinBox,
     QMenu,
     QAction,
+    QCheckBox,
 )
 
-from ..config import AppConfig, load_config, save_config, DEFAULT_TEMPLATE
-from ..core.converter import ConverterWorker, ConversionTask
+from ..config import (
+    AppConfig,
+    load_config,
+    save_config,
+    get_config_dir,
+    DEFAULT_TEMPLATE,
+    presets,
+)
 from ..core.utils import (
+    RgbFrame,
     ensure_output_dir,
-    extract_frame_png,
     build_output_filename,
-    probe_duration,
 )
 from .settings import SettingsPanel
 from .preview import PreviewWidget
+from .timeline import TimelineWidget
+
+# 起動を速くするため、変換本体（core.batch/converter/preview 等）と作業スレッドの
+# ワーカーはウィンドウを出すまで読み込まない（使う関数の中で import する）
+if TYPE_CHECKING:
+    from ..core.converter import ConversionTask
+    from ..core.jobs import JobQueue
+    from ..core.metadata import VideoInfo
+    from ..core.timeline import TimelineIndex
+    from .workers import BatchWorker, PreviewWorker
+
+# 設定変更からプレビュー生成までの待ち（この間の変更はまとめて1回にする）
+PREVIEW_DEBOUNCE_MS = 300
+# 描画されないまま（最小化で起動した等）でも、これだけ待ったら保存済みの状態を読み込む
+RESTORE_FALLBACK_MS = 500
 
 
 class FileListWidget(QListWidget):
+    filesAdded = pyqtSignal(list)  # List[Path]
+
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
         self.setAcceptDrops(True)
@@ -55,12 +78,16 @@ class FileListWidget(QListWidget):
 
     def dropEvent(self, e):  # type: ignore[override]
         if e.mimeData().hasUrls():
+            added: List[Path] = []
             for url in e.mimeData().urls():
                 p = Path(url.toLocalFile())
                 if p.suffix.lower() in {".mp4", ".mov", ".mkv", ".avi"} and p.exists():
                     if not self._has_path(p):
                         self.addItem(str(p))
+                        added.append(p)
             e.acceptProposedAction()
+            if added:
+                self.filesAdded.emit(added)
         else:
             super().dropEvent(e)
 
@@ -77,15 +104,75 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("MP4→GIF コンバーター")
         self.resize(900, 640)
 
-        self.cfg: AppConfig = load_config()
-        ensure_output_dir(Path(self.cfg.last_output_dir))
-
-        self.worker: Optional[ConverterWorker] = None
-        self.thread: Optional[QThread] = None
-        self._batch_tasks: List[ConversionTask] = []
-        self._batch_index: int = 0
+        # 画面は既定値で作り、保存済みの設定は表示後に _restore_state で読み込む
+        self.cfg: AppConfig = AppConfig()
+        self._restore_scheduled = False
+        self._state_restored = False
+
+        self.worker: Optional[PreviewWorker] = None  # 最新のプレビュー要求
+        self._preview_jobs: List[tuple] = []  # (QThread, PreviewWorker) 取り消し済みも含む
+        self._preview_file: Optional[str] = None
+        # 設定を続けて動かしたときは最後の1回だけ生成する
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self._preview_timer.timeout.connect(self._start_preview)
+        self.batch_worker: Optional[BatchWorker] = None
+        self.batch_thread: Optional[QThread] = None
+        self._batch_percents: Dict[str, float] = {}
+        self._probe_jobs: List[tuple] = []  # (QThread, ProbeWorker)
+        self._timeline_jobs: List[tuple] = []  # (QThread, TimelineWorker)
+        # 一括変換のジョブ記録（中断したものの再開と、最新の出力の省略）
+        self.job_queue: Optional[JobQueue] = None
 
         self._init_ui()
+        QTimer.singleShot(RESTORE_FALLBACK_MS, self._schedule_restore)
+
+    def paintEvent(self, e):  # type: ignore[override]
+        super().paintEvent(e)
+        # 最初の描画が済んでから読み込む（0ms のタイマーだけだと描画より先に動く）
+        if not self._restore_scheduled:
+            self._schedule_restore()
+
+    def _schedule_restore(self) -> None:
+        if not self._restore_scheduled:
+            self._restore_scheduled = True
+            QTimer.singleShot(0, self._restore_state)
+
+    def _restore_state(self) -> None:
+        """ウィンドウが出てから、設定・最近使ったファイル・ジョブ記録を読み込んで反映する"""
+        from ..core.batch import default_concurrency
+        from ..core.jobs import JobQueue
+
+        self.cfg = load_config()
+        ensure_output_dir(Path(self.cfg.last_output_dir))
+        self._apply_config()
+        self.spin_concurrency.setSpecialValueText(f"自動({default_concurrency()})")
+        self._rebuild_recent_menu()
+        self.job_queue = JobQueue()
+        self._state_restored = True
+        # 前回中断した変換の再開を確認する
+        self._offer_resume()
+
+    def _apply_config(self) -> None:
+        self.settings.apply_dict(
+            {
+                "preset": self.cfg.last_preset,
+                **self.cfg.custom_settings,
+            }
+        )
+        self.edit_output.setText(self.cfg.last_output_dir)
+        try:
+            self.start_sec.setValue(float(self.cfg.custom_settings.get("start", 0.0)))
+            self.duration_sec.setValue(
+                float(self.cfg.custom_settings.get("duration", 0.0))
+            )
+        except Exception:
+            pass
+        self.edit_template.setText(self.cfg.filename_template or DEFAULT_TEMPLATE)
+        for name, check in self.preset_checks.items():
+            check.setChecked(name in self.cfg.batch_presets)
+        self.spin_concurrency.setValue(self.cfg.max_concurrency)
 
     def _init_ui(self) -> None:
         # メニュー
@@ -126,18 +213,14 @@ class MainWindow(QMainWindow):
         right_v = QVBoxLayout(right)
         self.preview = PreviewWidget()
         right_v.addWidget(self.preview, 1)
+        self.timeline = TimelineWidget()
+        right_v.addWidget(self.timeline)
         self.settings = SettingsPanel()
-        self.settings.apply_dict(
-            {
-                "preset": self.cfg.last_preset,
-                **self.cfg.custom_settings,
-            }
-        )
         right_v.addWidget(self.settings)
 
         # 出力先/テンプレート
         out_row = QHBoxLayout()
-        self.edit_output = QLineEdit(self.cfg.last_output_dir)
+        self.edit_output = QLineEdit()
         self.btn_browse = QPushButton("出力先…")
         out_row.addWidget(QLabel("出力フォルダ:"))
         out_row.addWidget(self.edit_output, 1)
@@ -161,28 +244,39 @@ class MainWindow(QMainWindow):
         t_row.addStretch(1)
         right_v.addLayout(t_row)
 
-        # 設定の初期反映（時間）
-        try:
-            self.start_sec.setValue(float(self.cfg.custom_settings.get("start", 0.0)))
-            self.duration_sec.setValue(
-                float(self.cfg.custom_settings.get("duration", 0.0))
-            )
-        except Exception:
-            pass
-
         tpl_row = QHBoxLayout()
-        self.edit_template = QLineEdit(self.cfg.filename_template or DEFAULT_TEMPLATE)
+        self.edit_template = QLineEdit(DEFAULT_TEMPLATE)
         tpl_row.addWidget(QLabel("ファイル名テンプレート:"))
         tpl_row.addWidget(self.edit_template, 1)
         right_v.addLayout(tpl_row)
 
+        # 一括変換でまとめて書き出すプリセット（未選択なら上の設定で1種類）
+        fan_row = QHBoxLayout()
+        fan_row.addWidget(QLabel("まとめて出力:"))
+        self.preset_checks: Dict[str, QCheckBox] = {}
+        for name in presets:
+            check = QCheckBox(name)
+            check.setToolTip("選んだプリセットを1回のデコードでまとめて書き出します")
+            self.preset_checks[name] = check
+            fan_row.addWidget(check)
+        fan_row.addStretch(1)
+        right_v.addLayout(fan_row)
+
         # 実行/プレビュー
         act_row = QHBoxLayout()
         self.btn_preview = QPushButton("プレビュー生成")
         self.btn_convert = QPushButton("一括変換開始")
+        self.btn_stop = QPushButton("停止")
+        self.btn_stop.setEnabled(False)
         act_row.addWidget(self.btn_preview)
         act_row.addWidget(self.btn_convert)
+        act_row.addWidget(self.btn_stop)
         act_row.addStretch(1)
+        self.spin_concurrency = QSpinBox()
+        self.spin_concurrency.setRange(0, 64)
+        self.spin_concurrency.setSpecialValueText("自動")
+        act_row.addWidget(QLabel("同時変換数:"))
+        act_row.addWidget(self.spin_concurrency)
         right_v.addLayout(act_row)
 
         # 進捗/ログ
@@ -202,17 +296,39 @@ class MainWindow(QMainWindow):
         self.btn_clear.clicked.connect(self.list_files.clear)
         self.btn_browse.clicked.connect(self._on_browse_output)
         self.btn_convert.clicked.connect(self._on_convert)
+        self.btn_stop.clicked.connect(self._on_stop_batch)
         self.btn_preview.clicked.connect(self._on_make_preview)
         self.list_files.itemSelectionChanged.connect(self._on_selection_changed)
-
-        # 最近使ったファイルメニュー構築
-        self._rebuild_recent_menu()
+        self.list_files.filesAdded.connect(self._probe_files)
+        self.timeline.scrubbed.connect(self._on_timeline_scrubbed)
+        self.timeline.positionChosen.connect(self.start_sec.setValue)
+        self.start_sec.valueChanged.connect(self._sync_timeline_range)
+        self.duration_sec.valueChanged.connect(self._sync_timeline_range)
+        self._sync_timeline_range()
+        self.settings.changed.connect(self._on_preview_inputs_changed)
+        self.start_sec.valueChanged.connect(self._on_preview_inputs_changed)
+        self.duration_sec.valueChanged.connect(self._on_preview_inputs_changed)
 
     def closeEvent(self, e):  # type: ignore[override]
-        # 設定保存
+        if self._state_restored:
+            # 読み込む前に閉じた場合は、既定値で保存済みの設定を上書きしない
+            self._save_state()
+        self._shutdown_workers()
+        super().closeEvent(e)
+
+    def _save_state(self) -> None:
         s = self.settings.to_dict()
         self.cfg.last_preset = s.get("preset", self.cfg.last_preset)
-        self.cfg.custom_settings.update({k: s[k] for k in ("fps", "width", "colors")})
+        keys = (
+            "fps",
+            "width",
+            "colors",
+            "segments",
+            "diff_frames",
+            "decimate",
+            "target_mb",
+        )
+        self.cfg.custom_settings.update({k: s[k] for k in keys})
         self.cfg.custom_settings.update(
             {
                 "start": float(self.start_sec.value()),
@@ -225,8 +341,24 @@ class MainWindow(QMainWindow):
         self.cfg.filename_template = (
             self.edit_template.text().strip() or self.cfg.filename_template
         )
+        self.cfg.max_concurrency = int(self.spin_concurrency.value())
+        self.cfg.batch_presets = self._checked_presets()
         save_config(self.cfg)
-        super().closeEvent(e)
+
+    def _shutdown_workers(self) -> None:
+        """実行中の処理をすべて止め、ffmpeg が残らないよう作業スレッドの終了を待つ"""
+        self._preview_timer.stop()
+        self._cancel_preview()
+        jobs = self._preview_jobs + self._timeline_jobs + self._probe_jobs
+        for _thread, worker in jobs:
+            worker.cancel()
+        if self.batch_worker and self.batch_thread:
+            # 終了による中断は、次回の起動時に再開できるようジョブ記録に残す
+            self.batch_worker.cancel(resume=True)
+            jobs.append((self.batch_thread, self.batch_worker))
+        # 各ワーカーの finished は QThread.quit に直接つないであるので、ここで待っても詰まらない
+        for thread, _worker in jobs:
+            thread.wait()
 
     # 操作系
     def _on_add_files(self) -> None:
@@ -236,12 +368,15 @@ class MainWindow(QMainWindow):
             str(Path.cwd()),
             "Video (*.mp4 *.mov *.mkv *.avi)",
         )
+        added: List[Path] = []
         for f in files:
             p = Path(f)
             if not self._has_in_list(p):
                 self.list_files.addItem(str(p))
                 self.cfg.add_recent_file(p)
+                added.append(p)
         self._rebuild_recent_menu()
+        self._probe_files(added)
 
     def _on_remove_selected(self) -> None:
         for it in self.list_files.selectedItems():
@@ -256,7 +391,88 @@ class MainWindow(QMainWindow):
             self.edit_output.setText(d)
 
     def _on_selection_changed(self) -> None:
-        pass
+        it = self.list_files.currentItem()
+        if not it or not Path(it.text()).exists():
+            self.timeline.set_message("ファイルを選択するとサムネイルを表示します")
+            return
+        self.timeline.set_message("サムネイルを作成中…")
+        for _thread, old in self._timeline_jobs:
+            old.cancel()  # 前に選んでいたファイルの分は不要
+        from .workers import TimelineWorker
+
+        thread = QThread(self)
+        worker = TimelineWorker(Path(it.text()))
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.loaded.connect(self._on_timeline_loaded)
+        worker.failed.connect(self._on_timeline_failed)
+        worker.finished.connect(thread.quit, Qt.DirectConnection)
+        worker.finished.connect(lambda: self._finish_timeline(thread))
+        self._timeline_jobs.append((thread, worker))
+        thread.start()
+
+    def _finish_timeline(self, thread: QThread) -> None:
+        thread.quit()
+        thread.wait(2000)
+        self._timeline_jobs = [j for j in self._timeline_jobs if j[0] is not thread]
+
+    def _is_current_file(self, file: str) -> bool:
+        it = self.list_files.currentItem()
+        return bool(it) and it.text() == file
+
+    @pyqtSlot(str, object)
+    def _on_timeline_loaded(self, file: str, index: TimelineIndex) -> None:
+        # 選択が変わった後に届いた古い結果は捨てる
+        if self._is_current_file(file):
+            self.timeline.set_index(index)
+
+    @pyqtSlot(str, str)
+    def _on_timeline_failed(self, file: str, err: str) -> None:
+        if self._is_current_file(file):
+            self.timeline.set_message("サムネイルを作成できませんでした")
+            self._append_log(err)
+
+    def _on_timeline_scrubbed(self, t: float) -> None:
+        # ドラッグ中はサムネイル帯から切り出した画像だけを出す
+        pix = self.timeline.thumbnail_at(t)
+        if pix is not None:
+            self.preview.show_source_pixmap(pix)
+        self.start_sec.setValue(t)
+
+    def _sync_timeline_range(self, *_args) -> None:
+        self.timeline.set_range(
+            float(self.start_sec.value()), float(self.duration_sec.value())
+        )
+
+    def _probe_files(self, paths: List[Path]) -> None:
+        # 追加直後にまとめて調べておけば、プレビューや変換時は結果を再利用できる
+        if not paths:
+            return
+        from .workers import ProbeWorker
+
+        thread = QThread(self)
+        worker = ProbeWorker(paths)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.probed.connect(self._on_probed)
+        worker.finished.connect(thread.quit, Qt.DirectConnection)
+        worker.finished.connect(lambda: self._finish_probe(thread))
+        self._probe_jobs.append((thread, worker))
+        thread.start()
+
+    def _finish_probe(self, thread: QThread) -> None:
+        thread.quit()
+        thread.wait(2000)
+        self._probe_jobs = [j for j in self._probe_jobs if j[0] is not thread]
+
+    @pyqtSlot(str, object)
+    def _on_probed(self, file: str, info: VideoInfo) -> None:
+        for i in range(self.list_files.count()):
+            item = self.list_files.item(i)
+            if item.text() == file:
+                item.setToolTip(
+                    info.summary() if info.ok else "情報を取得できませんでした"
+                )
 
     def _has_in_list(self, p: Path) -> bool:
         for i in range(self.list_files.count()):
@@ -273,72 +489,98 @@ class MainWindow(QMainWindow):
         if not it:
             QMessageBox.information(self, "プレビュー", "ファイルを選択してください")
             return
-        input_path = Path(it.text())
-        if not input_path.exists():
+        if not Path(it.text()).exists():
             QMessageBox.warning(self, "プレビュー", "ファイルが存在しません")
             return
+        self._preview_file = it.text()
+        self._preview_timer.start()
+
+    def _on_preview_inputs_changed(self, *_args) -> None:
+        # 一度プレビューしたファイルを選んでいる間は、設定の変更に追従して作り直す
+        if self._preview_file and self._is_current_file(self._preview_file):
+            self._preview_timer.start()
+
+    def _start_preview(self) -> None:
+        it = self.list_files.currentItem()
+        if not it or not Path(it.text()).exists():
+            return
+        from ..core.converter import ConversionTask
+        from ..core.preview import get_preview_cache
+
         s = self.settings.to_dict()
-        out_dir = Path(tempfile.mkdtemp(prefix="gifprev_"))
-        # 静止画
-        png = out_dir / "frame.png"
-        extract_frame_png(
-            input_path, float(self.start_sec.value()), png, s["width"]
-        )  # 開始時刻のフレーム
-        self.preview.show_source_png(png)
-        # 短いGIF
-        base_dur = probe_duration(input_path)
-        preview_dur = 3.0
-        dur_from_ui = float(self.duration_sec.value())
-        dur = (
-            dur_from_ui
-            if dur_from_ui > 0
-            else min(preview_dur, max(0.1, base_dur - float(self.start_sec.value())))
-        )
         task = ConversionTask(
-            input_path=input_path,
-            output_dir=out_dir,
+            input_path=Path(it.text()),
+            output_dir=get_preview_cache().root,
             fps=int(s["fps"]),
             width=int(s["width"]),
             colors=int(s["colors"]),
             start=float(self.start_sec.value()),
-            duration=dur,
-            output_path=out_dir / "preview.gif",
+            duration=float(self.duration_sec.value()),  # 0なら作業スレッド側で決める
+            diff_frames=bool(s["diff_frames"]),
+            decimate=bool(s["decimate"]),
         )
-        self._run_worker_for_preview(task, out_dir)
-
-    def _run_worker_for_preview(self, task: ConversionTask, temp_dir: Path) -> None:
-        self._stop_worker()
-        self.thread = QThread(self)
-        self.worker = ConverterWorker()
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(lambda: self.worker.convert(task))
-        self.worker.progress.connect(self._on_progress)
-        self.worker.finished.connect(
-            lambda f, ok, out, err: self._on_preview_done(temp_dir, ok, out, err)
+        self._run_worker_for_preview(task)
+
+    def _run_worker_for_preview(self, task: ConversionTask) -> None:
+        # 前の要求は待たずに止める（スレッドは終わり次第 _reap_preview で片付ける）
+        from .workers import PreviewWorker
+
+        self._cancel_preview()
+        thread = QThread(self)
+        worker = PreviewWorker(task)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.render)
+        worker.frame.connect(
+            lambda f, frame, w=worker: self._on_preview_frame(w, frame)
         )
-        self.worker.log.connect(self._append_log)
-        self.thread.start()
+        worker.progress.connect(
+            lambda f, p, line, w=worker: self._on_preview_progress(w, p)
+        )
+        worker.finished.connect(
+            lambda f, ok, out, err, w=worker: self._on_preview_done(w, ok, out, err)
+        )
+        worker.log.connect(self._append_log)
+        # closeEvent で wait() している間もGUIスレッドを経由せずに終われるよう直接呼ぶ
+        worker.finished.connect(thread.quit, Qt.DirectConnection)
+        thread.finished.connect(lambda t=thread: self._reap_preview(t))
+        self._preview_jobs.append((thread, worker))
+        self.worker = worker
+        thread.start()
+
+    def _on_preview_frame(
+        self, worker: PreviewWorker, frame: Optional[RgbFrame]
+    ) -> None:
+        if worker is not self.worker:
+            return
+        if frame is None:
+            self.preview.clear_source("プレビュー画像がありません")
+        else:
+            self.preview.show_source_frame(frame)
 
-    @pyqtSlot(str, float, str)
-    def _on_progress(self, _file: str, percent: float, _line: str) -> None:
-        self.progress.setValue(int(percent))
+    def _on_preview_progress(self, worker: PreviewWorker, percent: float) -> None:
+        if worker is self.worker:
+            self.progress.setValue(int(percent))
 
     def _on_preview_done(
-        self, _temp_dir: Path, ok: bool, out_path: str, err: str
+        self, worker: PreviewWorker, ok: bool, out_path: str, err: str
     ) -> None:
-        self._stop_worker()
+        if worker is not self.worker:
+            return  # 取り消された要求の結果
+        self.worker = None
         if ok:
             self.preview.show_gif(Path(out_path))
             self._append_log("プレビューGIFを更新しました")
         else:
             QMessageBox.warning(self, "プレビュー失敗", err)
 
-    def _stop_worker(self) -> None:
-        if self.thread:
-            self.thread.quit()
-            self.thread.wait(2000)
-            self.thread = None
-        self.worker = None
+    def _cancel_preview(self) -> None:
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+
+    def _reap_preview(self, thread: QThread) -> None:
+        self._preview_jobs = [j for j in self._preview_jobs if j[0] is not thread]
+        thread.deleteLater()
 
     # 一括変換
     def _on_convert(self) -> None:
@@ -350,32 +592,21 @@ class MainWindow(QMainWindow):
         s = self.settings.to_dict()
         fps, width, colors = int(s["fps"]), int(s["width"]), int(s["colors"])
         template = self.edit_template.text().strip() or DEFAULT_TEMPLATE
-        start_val = float(self.start_sec.value())
-        duration_val = float(self.duration_sec.value())
 
         files: List[Path] = [
             Path(self.list_files.item(i).text()) for i in range(self.list_files.count())
         ]
+        # プリセットを複数選ぶと、同じファイルから1回のデコードでまとめて書き出す
+        variants = [dict(presets[name]) for name in self._checked_presets()] or [
+            {"fps": fps, "width": width, "colors": colors}
+        ]
         tasks: List[ConversionTask] = []
         for f in files:
             if not f.exists():
                 continue
             self.cfg.add_recent_file(f)
-            output_name = build_output_filename(
-                template, f, {"fps": fps, "width": width, "colors": colors}
-            )
-            tasks.append(
-                ConversionTask(
-                    input_path=f,
-                    output_dir=out_dir,
-                    fps=fps,
-                    width=width,
-                    colors=colors,
-                    start=start_val,
-                    duration=duration_val,
-                    output_path=out_dir / output_name,
-                )
-            )
+            for v in variants:
+                tasks.append(self._batch_task(f, out_dir, template, v, s))
         if not tasks:
             QMessageBox.warning(self, "変換", "有効なファイルがありません")
             return
@@ -384,31 +615,92 @@ class MainWindow(QMainWindow):
         self._rebuild_recent_menu()
         self._run_batch(tasks)
 
+    def _checked_presets(self) -> List[str]:
+        return [name for name, check in self.preset_checks.items() if check.isChecked()]
+
+    def _batch_task(
+        self,
+        f: Path,
+        out_dir: Path,
+        template: str,
+        variant: Dict[str, int],
+        s: Dict,
+    ) -> ConversionTask:
+        from ..core.converter import ConversionTask
+
+        return ConversionTask(
+            input_path=f,
+            output_dir=out_dir,
+            fps=int(variant["fps"]),
+            width=int(variant["width"]),
+            colors=int(variant["colors"]),
+            start=float(self.start_sec.value()),
+            duration=float(self.duration_sec.value()),
+            output_path=out_dir / build_output_filename(template, f, variant),
+            segments=int(s["segments"]),
+            diff_frames=bool(s["diff_frames"]),
+            decimate=bool(s["decimate"]),
+            target_bytes=int(float(s["target_mb"]) * 1024 * 1024),
+        )
+
     def _run_batch(self, tasks: List[ConversionTask]) -> None:
-        # 直列に1つずつ処理
-        self._batch_tasks = tasks  # type: ignore[attr-defined]
-        self._batch_index = 0  # type: ignore[attr-defined]
-        self._start_next_in_batch()
-
-    def _start_next_in_batch(self) -> None:
-        tasks: List[ConversionTask] = getattr(self, "_batch_tasks", [])
-        idx: int = getattr(self, "_batch_index", 0)
-        if idx >= len(tasks):
-            self._append_log("すべて完了しました")
-            self.progress.setValue(100)
-            save_config(self.cfg)
+        # 同時実行数の上限付きで並列に処理（スケジューラは別スレッドで動かす）
+        from .workers import BatchWorker
+
+        if self.batch_thread:
+            QMessageBox.information(self, "変換", "変換中です")
+            return
+        self._batch_percents = {str(t.input_path): 0.0 for t in tasks}
+        self.progress.setValue(0)
+        self.btn_convert.setEnabled(False)
+        self.btn_stop.setEnabled(True)
+        self.batch_thread = QThread(self)
+        self.batch_worker = BatchWorker(
+            tasks,
+            int(self.spin_concurrency.value()),
+            report_dir=get_config_dir() / "reports",
+            jobs=self.job_queue,
+        )
+        self.batch_worker.moveToThread(self.batch_thread)
+        self.batch_thread.started.connect(self.batch_worker.run)
+        self.batch_worker.progress.connect(self._on_batch_progress)
+        self.batch_worker.item_done.connect(self._on_batch_item_done)
+        self.batch_worker.finished.connect(self._on_batch_finished)
+        self.batch_worker.finished.connect(self.batch_thread.quit, Qt.DirectConnection)
+        self.batch_worker.log.connect(self._append_log)
+        self.batch_thread.start()
+
+    def _offer_resume(self) -> None:
+        assert self.job_queue is not None
+        tasks = [t for t in self.job_queue.unfinished() if t.input_path.exists()]
+        if not tasks:
+            self.job_queue.discard_unfinished()
             return
-        task = tasks[idx]
-        self._append_log(f"[{idx+1}/{len(tasks)}] 変換中: {task.input_path.name}")
-        self._stop_worker()
-        self.thread = QThread(self)
-        self.worker = ConverterWorker()
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(lambda: self.worker.convert(task))
-        self.worker.progress.connect(self._on_progress)
-        self.worker.finished.connect(self._on_batch_item_done)
-        self.worker.log.connect(self._append_log)
-        self.thread.start()
+        names = "\n".join(t.input_path.name for t in tasks[:10])
+        more = f"\n…ほか {len(tasks) - 10} 件" if len(tasks) > 10 else ""
+        answer = QMessageBox.question(
+            self,
+            "変換の再開",
+            f"前回終わらなかった変換が {len(tasks)} 件あります。再開しますか？\n\n"
+            f"{names}{more}",
+        )
+        # 再開するものは一括変換の開始時に登録し直す（入力が消えたものはここで片付く）
+        self.job_queue.discard_unfinished()
+        if answer != QMessageBox.Yes:
+            return
+        self._append_log(f"前回中断した {len(tasks)} 件の変換を再開します")
+        self._run_batch(tasks)
+
+    @pyqtSlot(str, float, float)
+    def _on_batch_progress(self, file: str, percent: float, aggregate: float) -> None:
+        self._batch_percents[file] = percent
+        self.progress.setValue(int(aggregate))
+        running = [
+            f"{Path(f).name} {p:.0f}%"
+            for f, p in self._batch_percents.items()
+            if 0.0 < p < 100.0
+        ]
+        self.statusBar().showMessage(" / ".join(running))
 
     @pyqtSlot(str, bool, str, str)
     def _on_batch_item_done(self, file: str, ok: bool, out_path: str, err: str) -> None:
@@ -416,10 +708,34 @@ class MainWindow(QMainWindow):
             self._append_log(f"完了: {Path(out_path).name}")
         else:
             self._append_log(f"失敗: {Path(file).name} -> {err}")
-        self._stop_worker()
-        # 次へ
-        self._batch_index += 1  # type: ignore[attr-defined]
-        self._start_next_in_batch()
+
+    def _on_stop_batch(self) -> None:
+        if self.batch_worker:
+            self.btn_stop.setEnabled(False)
+            self._append_log("停止しています…")
+            self.batch_worker.cancel()
+
+    @pyqtSlot(int, int, int)
+    def _on_batch_finished(self, ok: int, failed: int, cancelled: int) -> None:
+        self._stop_batch_worker()
+        self.btn_convert.setEnabled(True)
+        self.btn_stop.setEnabled(False)
+        self.statusBar().clearMessage()
+        if cancelled:
+            self._append_log(
+                f"停止しました（成功 {ok} / 失敗 {failed} / 中止 {cancelled}）"
+            )
+        else:
+            self._append_log(f"すべて完了しました（成功 {ok} / 失敗 {failed}）")
+            self.progress.setValue(100)
+        save_config(self.cfg)
+
+    def _stop_batch_worker(self) -> None:
+        if self.batch_thread:
+            self.batch_thread.quit()
+            self.batch_thread.wait(2000)
+            self.batch_thread = None
+        self.batch_worker = None
 
     def _rebuild_recent_menu(self) -> None:
         self.menu_recent.clear()
@@ -438,6 +754,7 @@ class MainWindow(QMainWindow):
         if p.exists() and p.suffix.lower() in {".mp4", ".mov", ".mkv", ".avi"}:
             if not self._has_in_list(p):
                 self.list_files.addItem(str(p))
+                self._probe_files([p])
         else:
             QMessageBox.warning(
                 self,
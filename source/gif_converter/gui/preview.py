@@ -2,13 +2,15 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout
 from PyQt5.QtGui import QMovie
 
-from PIL import Image
-from PIL import ImageQt as PilImageQt
+from ..core.utils import RgbFrame
+
+# ドラッグでのリサイズ中はこの間隔より頻繁にリスケールしない
+RESCALE_INTERVAL_MS = 60
 
 
 class PreviewWidget(QWidget):
@@ -26,31 +28,42 @@ class PreviewWidget(QWidget):
         root.addLayout(row)
 
         self._movie: Optional[QMovie] = None
+        # 縮小前の元画像。リスケールは常にここから行う（縮小済みを再縮小すると劣化する）
+        self._src_pixmap: Optional[QPixmap] = None
+        self._rescale_timer = QTimer(self)
+        self._rescale_timer.setSingleShot(True)
+        self._rescale_timer.setInterval(RESCALE_INTERVAL_MS)
+        self._rescale_timer.timeout.connect(self._rescale_source)
+
+    def clear_source(self, text: str) -> None:
+        self._src_pixmap = None
+        self.label_src.clear()
+        self.label_src.setText(text)
+
+    def show_source_frame(self, frame: RgbFrame) -> None:
+        # QImage は frame.data をコピーせずに参照し、QPixmap 化の1回だけ複製される
+        qim = QImage(
+            frame.data, frame.width, frame.height, frame.width * 3, QImage.Format_RGB888
+        )
+        self.show_source_pixmap(QPixmap.fromImage(qim))
 
-    def show_source_png(self, png_path: Path) -> None:
-        if not png_path.exists():
-            self.label_src.setText("プレビュー画像がありません")
+    def show_source_pixmap(self, pix: QPixmap) -> None:
+        self._src_pixmap = pix
+        self._rescale_source()
+
+    def _rescale_source(self) -> None:
+        if self._src_pixmap is None or self._src_pixmap.isNull():
             return
-        try:
-            im = Image.open(str(png_path))
-            qim = PilImageQt.ImageQt(im.convert("RGBA"))
-            pix = QPixmap.fromImage(qim)
-            self.label_src.setPixmap(
-                pix.scaled(
-                    self.label_src.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
+        self.label_src.setPixmap(
+            self._src_pixmap.scaled(
+                self.label_src.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
             )
-        except Exception:
-            self.label_src.setText("プレビュー読み込み失敗")
+        )
 
     def resizeEvent(self, e) -> None:  # type: ignore[override]
-        # サイズが変わったらリスケール
-        if pix := self.label_src.pixmap():
-            self.label_src.setPixmap(
-                pix.scaled(
-                    self.label_src.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-                )
-            )
+        # 連続するリサイズはまとめ、一定間隔ごとに元画像からリスケールする
+        if self._src_pixmap is not None and not self._rescale_timer.isActive():
+            self._rescale_timer.start()
         super().resizeEvent(e)
 
     def show_gif(self, gif_path: Path) -> None:
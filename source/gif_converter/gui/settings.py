@@ -1,11 +1,14 @@
 from __future__ import annotations
 from typing import Dict, Any
+from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget,
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
+    QCheckBox,
     QComboBox,
+    QDoubleSpinBox,
     QSpinBox,
     QGroupBox,
     QFormLayout,
@@ -15,6 +18,8 @@ from ..config import presets
 
 
 class SettingsPanel(QWidget):
+    changed = pyqtSignal()  # プレビューの見た目に影響する値が変わった
+
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
         self._building = False
@@ -44,15 +49,51 @@ class SettingsPanel(QWidget):
         self.width.setRange(64, 3840)
         self.colors = QSpinBox()
         self.colors.setRange(2, 256)
+        self.segments = QSpinBox()
+        self.segments.setRange(0, 32)
+        self.segments.setSpecialValueText("なし")
+        self.segments.setToolTip("長尺動画を時間で分割し、並列にGIF化して連結します")
+        self.diff_frames = QCheckBox("変化した部分だけ書き出す")
+        self.diff_frames.setToolTip(
+            "前フレームと同じ画素を透過にし、変化のないフレームは表示時間に統合します"
+            "（画面キャプチャ向け）"
+        )
+        self.decimate = QCheckBox("止まっている間のフレームを間引く")
+        self.decimate.setToolTip(
+            "ほぼ同じフレームが続く間は1枚にまとめ、表示時間を延ばします"
+            "（画面キャプチャ向け）"
+        )
+        self.target_mb = QDoubleSpinBox()
+        self.target_mb.setRange(0.0, 1000.0)
+        self.target_mb.setDecimals(1)
+        self.target_mb.setSingleStep(0.5)
+        self.target_mb.setSpecialValueText("なし")
+        self.target_mb.setSuffix(" MB")
+        self.target_mb.setToolTip(
+            "指定すると、上のFPS/幅/色数を上限として収まる設定を試し変換から予測します"
+        )
         form.addRow("FPS", self.fps)
         form.addRow("幅(px)", self.width)
         form.addRow("色数", self.colors)
+        form.addRow("分割並列数", self.segments)
+        form.addRow("差分フレーム", self.diff_frames)
+        form.addRow("静止フレーム", self.decimate)
+        form.addRow("目標サイズ", self.target_mb)
         root.addWidget(self.advanced)
         root.addStretch(1)
 
         # イベント
         self.preset.currentTextChanged.connect(self._on_preset_changed)
         self._apply_preset(self.preset.currentText())
+        for spin in (self.fps, self.width, self.colors):
+            spin.valueChanged.connect(self._emit_changed)
+        for box in (self.diff_frames, self.decimate):
+            box.toggled.connect(self._emit_changed)
+
+    def _emit_changed(self, *_args) -> None:
+        # プリセット適用中は値が続けて変わるので、最後にまとめて1回だけ通知する
+        if not self._building:
+            self.changed.emit()
 
     def _on_preset_changed(self, name: str) -> None:
         self._apply_preset(name)
@@ -68,6 +109,7 @@ class SettingsPanel(QWidget):
             self.colors.setValue(int(s["colors"]))
         finally:
             self._building = False
+        self.changed.emit()
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -75,6 +117,10 @@ class SettingsPanel(QWidget):
             "fps": int(self.fps.value()),
             "width": int(self.width.value()),
             "colors": int(self.colors.value()),
+            "segments": int(self.segments.value()),
+            "diff_frames": bool(self.diff_frames.isChecked()),
+            "decimate": bool(self.decimate.isChecked()),
+            "target_mb": float(self.target_mb.value()),
         }
 
     def apply_dict(self, data: Dict[str, Any]) -> None:
@@ -90,3 +136,11 @@ class SettingsPanel(QWidget):
             self.width.setValue(int(data["width"]))
         if "colors" in data:
             self.colors.setValue(int(data["colors"]))
+        if "segments" in data:
+            self.segments.setValue(int(data["segments"]))
+        if "diff_frames" in data:
+            self.diff_frames.setChecked(bool(data["diff_frames"]))
+        if "decimate" in data:
+            self.decimate.setChecked(bool(data["decimate"]))
+        if "target_mb" in data:
+            self.target_mb.setValue(float(data["target_mb"]))
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+
+from PyQt5.QtCore import QRect, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QWidget
+
+from ..core.utils import format_seconds_to_timestamp
+
+if TYPE_CHECKING:
+    from ..core.timeline import TimelineIndex
+
+
+class TimelineWidget(QWidget):
+    """
+    サムネイル帯の上で開始位置をドラッグして選ぶ。
+    ドラッグ中は帯の画像を表示するだけで ffmpeg は動かさず、
+    位置はキーフレームに吸着させる（Shift を押している間は吸着しない）。
+    """
+
+    scrubbed = pyqtSignal(float)  # ドラッグ中の位置（秒）
+    positionChosen = pyqtSignal(float)  # 確定した位置（秒）
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.setMinimumHeight(56)
+        self.setMouseTracking(True)
+        self._index: Optional[TimelineIndex] = None
+        self._strip: Optional[QPixmap] = None
+        self._start = 0.0
+        self._duration = 0.0
+        self._dragging = False
+        self._message = "ファイルを選択するとサムネイルを表示します"
+
+    def set_index(self, index: Optional[TimelineIndex]) -> None:
+        self._index = index
+        self._strip = None
+        if index is not None:
+            strip = index.strip
+            qim = QImage(
+                strip.data,
+                strip.width,
+                strip.height,
+                strip.width * 3,
+                QImage.Format_RGB888,
+            )
+            self._strip = QPixmap.fromImage(qim)
+        self.update()
+
+    def set_message(self, text: str) -> None:
+        self.set_index(None)
+        self._message = text
+        self.update()
+
+    def set_range(self, start: float, duration: float) -> None:
+        self._start = max(0.0, start)
+        self._duration = max(0.0, duration)
+        self.update()
+
+    def thumbnail_at(self, t: float) -> Optional[QPixmap]:
+        """t を含むサムネイル（帯から切り出すだけなので ffmpeg は動かない）"""
+        if self._index is None or self._strip is None or self._index.duration <= 0:
+            return None
+        count = self._index.count
+        i = min(count - 1, max(0, int(t / self._index.duration * count)))
+        w = self._index.thumb_width
+        return self._strip.copy(i * w, 0, w, self._strip.height())
+
+    def _time_at(self, x: int) -> float:
+        if self._index is None or self.width() <= 0:
+            return 0.0
+        ratio = min(1.0, max(0.0, x / self.width()))
+        return ratio * self._index.duration
+
+    def _x_at(self, t: float) -> int:
+        if self._index is None or self._index.duration <= 0:
+            return 0
+        return int(round(t / self._index.duration * self.width()))
+
+    def _position(self, e) -> float:
+        t = self._time_at(e.pos().x())
+        if self._index is not None and not (e.modifiers() & Qt.ShiftModifier):
+            t = self._index.snap(t)
+        return t
+
+    def mousePressEvent(self, e) -> None:  # type: ignore[override]
+        if self._index is None or e.button() != Qt.LeftButton:
+            return super().mousePressEvent(e)
+        self._dragging = True
+        self._start = self._position(e)
+        self.scrubbed.emit(self._start)
+        self.update()
+
+    def mouseMoveEvent(self, e) -> None:  # type: ignore[override]
+        if self._index is None:
+            return super().mouseMoveEvent(e)
+        t = self._time_at(e.pos().x())
+        self.setToolTip(format_seconds_to_timestamp(t))
+        if self._dragging:
+            self._start = self._position(e)
+            self.scrubbed.emit(self._start)
+            self.update()
+
+    def mouseReleaseEvent(self, e) -> None:  # type: ignore[override]
+        if not self._dragging:
+            return super().mouseReleaseEvent(e)
+        self._dragging = False
+        self._start = self._position(e)
+        self.positionChosen.emit(self._start)
+        self.update()
+
+    def paintEvent(self, e) -> None:  # type: ignore[override]
+        p = QPainter(self)
+        rect = self.rect()
+        p.fillRect(rect, QColor(32, 32, 32))
+        if self._index is None or self._strip is None:
+            p.setPen(QColor(200, 200, 200))
+            p.drawText(rect, Qt.AlignCenter, self._message)
+            return
+        # 縦横比を保ったまま幅に収まる枚数だけ、各枠の中央の時刻のサムネイルを並べる
+        tw, th = self._index.thumb_width, self._strip.height()
+        slot = max(1, int(tw * rect.height() / max(1, th)))
+        slots = max(1, -(-rect.width() // slot))
+        for j in range(slots):
+            i = (2 * j + 1) * self._index.count // (2 * slots)
+            p.drawPixmap(
+                QRect(j * slot, 0, slot, rect.height()),
+                self._strip,
+                QRect(i * tw, 0, tw, th),
+            )
+        # 変換範囲の外を暗くし、開始位置に線を引く
+        x0 = self._x_at(self._start)
+        end = self._index.duration
+        if self._duration > 0:
+            end = min(end, self._start + self._duration)
+        x1 = max(x0 + 1, self._x_at(end))
+        shade = QColor(0, 0, 0, 150)
+        p.fillRect(QRect(0, 0, x0, rect.height()), shade)
+        p.fillRect(QRect(x1, 0, rect.width() - x1, rect.height()), shade)
+        p.setPen(QColor(255, 200, 0))
+        p.drawLine(x0, 0, x0, rect.height())
+        # キーフレームの目盛り
+        p.setPen(QColor(255, 255, 255, 120))
+        for k in self._index.keyframes:
+            x = self._x_at(k)
+            p.drawLine(x, rect.height() - 4, x, rect.height())
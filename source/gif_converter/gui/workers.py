@@ -0,0 +1,169 @@
+from __future__ import annotations
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from ..core.batch import BatchScheduler
+from ..core.cancel import CancelToken, ConversionCancelled
+from ..core.converter import ConversionTask, Converter
+from ..core.jobs import JobQueue
+from ..core.metadata import VideoInfo, probe_many
+from ..core.preview import PreviewRenderer, get_preview_cache
+from ..core.telemetry import write_report
+from ..core.timeline import load_timeline
+from ..core.tuning import tune_task
+from ..core.utils import probe_duration
+
+# 長さ未指定のときのプレビューGIFの尺（秒）
+PREVIEW_SECONDS = 3.0
+
+
+class PreviewWorker(QObject):
+    """
+    静止画と短いプレビューGIFをキャッシュ経由で生成する（尺の取得も含めてGUIスレッド外で行う）。
+    cancel() はGUIスレッドから呼んでよく、実行中の ffmpeg をその場で止める。
+    """
+
+    frame = pyqtSignal(str, object)  # file, RgbFrame（取得できなければ None）
+    progress = pyqtSignal(str, float, str)  # file, percent[0-100], message
+    finished = pyqtSignal(str, bool, str, str)  # file, success, output_path, error
+    log = pyqtSignal(str)
+
+    def __init__(
+        self, task: ConversionTask, preview_seconds: float = PREVIEW_SECONDS
+    ) -> None:
+        super().__init__()
+        self.task = task
+        self.preview_seconds = preview_seconds
+        self.cancel_token = CancelToken()
+
+    def cancel(self) -> None:
+        self.cancel_token.cancel()
+
+    @pyqtSlot()
+    def render(self) -> None:
+        task = self.task
+        file = str(task.input_path)
+        renderer = PreviewRenderer(
+            Converter(
+                on_progress=self.progress.emit,
+                on_log=self.log.emit,
+                cancel_token=self.cancel_token,
+            )
+        )
+        try:
+            # 開始位置の静止画を先に出す（GIFより早く返る）
+            try:
+                frame = renderer.render_frame(task.input_path, task.start, task.width)
+            except ConversionCancelled:
+                raise
+            except Exception:
+                frame = None
+            self.frame.emit(file, frame)
+            if task.duration <= 0:
+                rest = probe_duration(task.input_path) - task.start
+                task = replace(task, duration=min(self.preview_seconds, max(0.1, rest)))
+            out_path = renderer.render_gif(tune_task(task))
+            self.finished.emit(file, True, str(out_path), "")
+        except Exception as e:
+            # キャンセル時も ConversionCancelled のメッセージで失敗として返る
+            self.finished.emit(file, False, "", str(e))
+
+
+class BatchWorker(QObject):
+    """BatchScheduler を QThread 上で動かし、結果をシグナルで中継する"""
+
+    progress = pyqtSignal(str, float, float)  # file, percent, aggregate percent
+    item_done = pyqtSignal(str, bool, str, str)  # file, success, output_path, error
+    finished = pyqtSignal(int, int, int)  # 成功数, 失敗数, 中止数
+    log = pyqtSignal(str)
+
+    def __init__(
+        self,
+        tasks: List[ConversionTask],
+        max_workers: int = 0,
+        report_dir: Optional[Path] = None,
+        jobs: Optional[JobQueue] = None,
+    ) -> None:
+        super().__init__()
+        self.tasks = tasks
+        self.report_dir = report_dir  # 指定があれば計測レポート（JSON/CSV）を書き出す
+        self.scheduler = BatchScheduler(
+            max_workers=max_workers,
+            on_progress=self.progress.emit,
+            on_done=self.item_done.emit,
+            on_log=self.log.emit,
+            jobs=jobs,
+        )
+
+    def cancel(self, resume: bool = False) -> None:
+        """
+        GUIスレッドから呼ぶ。実行中の ffmpeg を止め、残りは開始しない。
+        resume=True なら止めたタスクを次回の起動時に再開できるよう残す
+        """
+        self.scheduler.cancel(resume)
+
+    @pyqtSlot()
+    def run(self) -> None:
+        # QThread.started に直接つなぐ（ラムダだとGUIスレッドで実行されてしまう）
+        results = self.scheduler.run(self.tasks)
+        if self.report_dir and self.scheduler.report:
+            try:
+                json_path, _ = write_report(self.scheduler.report, self.report_dir)
+                self.log.emit(f"計測レポートを保存しました: {json_path}（.csv も同名）")
+            except OSError as e:
+                self.log.emit(f"計測レポートを保存できませんでした: {e}")
+        ok = sum(1 for r in results if r.ok)
+        cancelled = sum(1 for r in results if r.cancelled)
+        self.finished.emit(ok, len(results) - ok - cancelled, cancelled)
+
+
+class ProbeWorker(QObject):
+    """追加されたファイルをまとめて並列に ffprobe し、結果をキャッシュに載せる"""
+
+    probed = pyqtSignal(str, object)  # file, VideoInfo
+    finished = pyqtSignal()
+
+    def __init__(self, paths: List[Path]) -> None:
+        super().__init__()
+        self.paths = paths
+
+    def cancel(self) -> None:
+        pass  # ffprobe は短時間で終わるので終了を待つだけにする
+
+    @pyqtSlot()
+    def run(self) -> None:
+        probe_many(self.paths, on_result=self._emit)
+        self.finished.emit()
+
+    def _emit(self, path: Path, info: VideoInfo) -> None:
+        self.probed.emit(str(path), info)
+
+
+class TimelineWorker(QObject):
+    """サムネイル帯とキーフレーム索引を作る（キャッシュにあれば読むだけ）"""
+
+    loaded = pyqtSignal(str, object)  # file, TimelineIndex
+    failed = pyqtSignal(str, str)  # file, error
+    finished = pyqtSignal()
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self.path = path
+        self.cancel_token = CancelToken()
+
+    def cancel(self) -> None:
+        self.cancel_token.cancel()
+
+    @pyqtSlot()
+    def run(self) -> None:
+        try:
+            index = load_timeline(
+                self.path, get_preview_cache(), cancel_token=self.cancel_token
+            )
+            self.loaded.emit(str(self.path), index)
+        except Exception as e:
+            self.failed.emit(str(self.path), str(e))
+        self.finished.emit()
@@ -0,0 +1,469 @@
+"""
+変換サービスのHTTP入口（Qtを読み込まない。標準ライブラリの asyncio だけで動く）
+
+    python -m gif_converter.server --port 8765 -j 2
+
+    POST   /jobs               変換を依頼する。JSON（{"path": ..., 設定...}）でローカルのファイルを、
+                               または動画そのものを本文に（設定はクエリ）送る → ジョブの状態
+    GET    /jobs/<id>          ジョブの状態（JSON）
+    GET    /jobs/<id>/events   進捗（Server-Sent Events。終わると閉じる）
+    GET    /jobs/<id>/result   完成したGIF（?wait=1 で終わるまで待つ）
+    DELETE /jobs/<id>          中断する
+    POST   /convert            /jobs と同じ依頼をして、終わるまで待ってGIFを返す
+    GET    /health             ワーカー数と順番待ちの数
+
+設定のキーは preset, fps, width, colors, start, duration, two_pass, segments, engine,
+diff, decimate, target_mb（省略時は標準プリセット）。
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+import argparse
+import asyncio
+import json
+import sys
+
+from .config import presets
+from .core.converter import ConversionTask
+from .core.service import (
+    CANCELLED,
+    DONE,
+    FINISHED,
+    ConversionService,
+    Job,
+    ServiceBusy,
+    source_id,
+)
+from .core.utils import VIDEO_SUFFIXES
+
+DEFAULT_PORT = 8765
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024
+MAX_JSON_BYTES = 64 * 1024
+SEND_CHUNK_BYTES = 64 * 1024
+
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    410: "Gone",
+    411: "Length Required",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+_BOOL_TRUE = ("1", "true", "yes", "on")
+
+
+class HttpError(RuntimeError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]  # 名前は小文字
+
+    @property
+    def content_length(self) -> Optional[int]:
+        value = self.headers.get("content-length")
+        if value is None:
+            return None
+        try:
+            length = int(value)
+        except ValueError:
+            raise HttpError(400, "Content-Length が不正です")
+        if length < 0:
+            raise HttpError(400, "Content-Length が不正です")
+        return length
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """リクエスト行とヘッダを読む（本文は読まない）。接続が閉じられたら None"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "ヘッダが大きすぎます")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "リクエスト行が不正です")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HttpError(400, "ヘッダが不正です")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return Request(
+        method=method.upper(),
+        path=unquote(url.path),
+        query=dict(parse_qsl(url.query)),
+        headers=headers,
+    )
+
+
+async def body_chunks(
+    reader: asyncio.StreamReader, length: int
+) -> AsyncIterator[bytes]:
+    remaining = length
+    while remaining > 0:
+        chunk = await reader.read(min(SEND_CHUNK_BYTES, remaining))
+        if not chunk:
+            raise HttpError(400, "本文が途中で切れました")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _head(status: int, headers: Mapping[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, data: Any) -> None:
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "Connection": "close",
+    }
+    writer.write(_head(status, headers) + body)
+    await writer.drain()
+
+
+async def send_file(writer: asyncio.StreamWriter, path: Path) -> None:
+    try:
+        f = path.open("rb")
+    except OSError:
+        raise HttpError(410, "結果がキャッシュから削除されました。もう一度依頼してください")
+    with f:
+        size = path.stat().st_size
+        headers = {
+            "Content-Type": "image/gif",
+            "Content-Length": str(size),
+            "Connection": "close",
+        }
+        writer.write(_head(200, headers))
+        while True:
+            chunk = f.read(SEND_CHUNK_BYTES)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def send_events(writer: asyncio.StreamWriter, job: Job) -> None:
+    headers = {
+        "Content-Type": "text/event-stream; charset=utf-8",
+        "Cache-Control": "no-cache",
+        "Connection": "close",
+    }
+    writer.write(_head(200, headers))
+    async for snap in job.events():
+        # 途中は progress、最後は終わった状態（done/failed/cancelled）を名前にする
+        name = snap["state"] if snap["state"] in FINISHED else "progress"
+        data = json.dumps(snap, ensure_ascii=False)
+        writer.write(f"event: {name}\ndata: {data}\n\n".encode("utf-8"))
+        await writer.drain()
+
+
+def _int(params: Mapping[str, Any], key: str, default: int, lo: int, hi: int) -> int:
+    try:
+        value = int(params.get(key, default))
+    except (TypeError, ValueError):
+        raise HttpError(400, f"{key} は整数で指定してください")
+    if not lo <= value <= hi:
+        raise HttpError(400, f"{key} は {lo}〜{hi} で指定してください")
+    return value
+
+
+def _float(params: Mapping[str, Any], key: str) -> float:
+    try:
+        value = float(params.get(key, 0.0))
+    except (TypeError, ValueError):
+        raise HttpError(400, f"{key} は数値で指定してください")
+    if value < 0:
+        raise HttpError(400, f"{key} は0以上で指定してください")
+    return value
+
+
+def _bool(params: Mapping[str, Any], key: str) -> bool:
+    value = params.get(key, False)
+    if isinstance(value, str):
+        return value.lower() in _BOOL_TRUE
+    return bool(value)
+
+
+def task_from_params(params: Mapping[str, Any], input_path: Path) -> ConversionTask:
+    """依頼の設定（JSON/クエリ）から ConversionTask を作る。不正なら HttpError(400)"""
+    name = params.get("preset", "標準")
+    if name not in presets:
+        raise HttpError(400, f"プリセットがありません: {name}")
+    preset = presets[name]
+    engine = params.get("engine", "ffmpeg")
+    if engine not in ("ffmpeg", "numpy"):
+        raise HttpError(400, "engine は ffmpeg か numpy で指定してください")
+    return ConversionTask(
+        input_path=input_path,
+        output_dir=input_path.parent,
+        fps=_int(params, "fps", preset["fps"], 1, 60),
+        width=_int(params, "width", preset["width"], 16, 7680),
+        colors=_int(params, "colors", preset["colors"], 2, 256),
+        start=_float(params, "start"),
+        duration=_float(params, "duration"),
+        single_pass=not _bool(params, "two_pass"),
+        segments=_int(params, "segments", 0, 0, 64),
+        engine=engine,
+        diff_frames=_bool(params, "diff"),
+        decimate=_bool(params, "decimate"),
+        target_bytes=int(_float(params, "target_mb") * 1024 * 1024),
+    )
+
+
+class ConversionServer:
+    """ConversionService をHTTPで公開する（1リクエスト1接続、応答後に閉じる）"""
+
+    def __init__(
+        self,
+        service: ConversionService,
+        allowed_dirs: Optional[List[Path]] = None,
+        max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    ) -> None:
+        self.service = service
+        # 指定するとローカルのパスはこの中のファイルだけを受け付ける
+        self.allowed_dirs = [Path(d).resolve() for d in allowed_dirs or []]
+        self.max_upload_bytes = max_upload_bytes
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """待ち受けを始める（port=0 なら空いている番号。sockets から分かる）"""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            req = await read_request(reader)
+            if req is not None:
+                await self._dispatch(req, reader, writer)
+        except HttpError as e:
+            await self._send_error(writer, e.status, str(e))
+        except ServiceBusy as e:
+            await self._send_error(writer, 503, str(e))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # 相手が先に閉じた（進捗の購読をやめた等）
+            pass
+        except Exception as e:
+            await self._send_error(writer, 500, f"内部エラー: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _send_error(
+        self, writer: asyncio.StreamWriter, status: int, message: str
+    ) -> None:
+        try:
+            await send_json(writer, status, {"error": message})
+        except (ConnectionError, OSError):
+            pass
+
+    async def _dispatch(
+        self, req: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        parts = [p for p in req.path.split("/") if p]
+        if parts == ["health"] and req.method == "GET":
+            await send_json(
+                writer,
+                200,
+                {
+                    "workers": self.service.max_workers,
+                    "pending": self.service.pending(),
+                },
+            )
+        elif parts in (["jobs"], ["convert"]) and req.method == "POST":
+            job = await self._submit(req, reader)
+            if parts == ["convert"]:
+                await job.wait()
+                await self._send_result(writer, job)
+            else:
+                await send_json(writer, 200 if job.finished else 202, self._status(job))
+        elif len(parts) >= 2 and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                raise HttpError(404, "ジョブが見つかりません")
+            rest = parts[2:]
+            if not rest and req.method == "GET":
+                await send_json(writer, 200, self._status(job))
+            elif not rest and req.method == "DELETE":
+                self.service.cancel(job.id)
+                await send_json(writer, 200, self._status(job))
+            elif rest == ["events"] and req.method == "GET":
+                await send_events(writer, job)
+            elif rest == ["result"] and req.method == "GET":
+                if req.query.get("wait", "").lower() in _BOOL_TRUE:
+                    await job.wait()
+                await self._send_result(writer, job)
+            else:
+                raise HttpError(405, "対応していない操作です")
+        else:
+            raise HttpError(404, "見つかりません")
+
+    def _status(self, job: Job) -> Dict[str, Any]:
+        return {
+            **job.snapshot(),
+            "events": f"/jobs/{job.id}/events",
+            "result": f"/jobs/{job.id}/result",
+        }
+
+    async def _send_result(self, writer: asyncio.StreamWriter, job: Job) -> None:
+        if job.state == DONE and job.output is not None:
+            await send_file(writer, job.output)
+        elif job.state == CANCELLED:
+            raise HttpError(409, "変換は中断されました")
+        elif job.finished:
+            raise HttpError(500, f"変換に失敗しました: {job.error}")
+        else:
+            raise HttpError(409, "変換が終わっていません")
+
+    async def _submit(self, req: Request, reader: asyncio.StreamReader) -> Job:
+        length = req.content_length
+        if req.headers.get("content-type", "").startswith("application/json"):
+            if length is None:
+                raise HttpError(411, "Content-Length を指定してください")
+            if length > MAX_JSON_BYTES:
+                raise HttpError(413, "JSONが大きすぎます")
+            try:
+                data = json.loads(await reader.readexactly(length) or b"{}")
+            except ValueError:
+                raise HttpError(400, "JSONとして読めません")
+            if not isinstance(data, dict):
+                raise HttpError(400, "JSONはオブジェクトで指定してください")
+            params = {**req.query, **data}
+            path = self._local_path(params.get("path"))
+            task = task_from_params(params, path)
+            try:
+                source = source_id(path)
+            except OSError:
+                raise HttpError(400, f"入力ファイルを読めません: {path}")
+            return self.service.submit(task, source)
+        # それ以外は本文が動画そのもの（設定はクエリ）
+        if length is None:
+            raise HttpError(411, "Content-Length を指定してください")
+        if length == 0:
+            raise HttpError(400, "動画を本文に入れるか、JSONで path を指定してください")
+        if length > self.max_upload_bytes:
+            raise HttpError(413, "アップロードが大きすぎます")
+        # 先に設定を確かめ、不正なら受け取る前に断る
+        task_from_params(req.query, Path("upload"))
+        suffix = Path(req.query.get("name", "")).suffix.lower()
+        path, source = await self.service.store_upload(
+            body_chunks(reader, length), suffix if suffix in VIDEO_SUFFIXES else ""
+        )
+        return self.service.submit(task_from_params(req.query, path), source)
+
+    def _local_path(self, value: Any) -> Path:
+        if not isinstance(value, str) or not value:
+            raise HttpError(400, "path を指定してください")
+        path = Path(value).expanduser().resolve()
+        if self.allowed_dirs and not any(
+            path.is_relative_to(d) for d in self.allowed_dirs
+        ):
+            raise HttpError(403, f"このフォルダのファイルは変換できません: {path}")
+        if not path.is_file():
+            raise HttpError(400, f"入力ファイルが見つかりません: {path}")
+        if path.suffix.lower() not in VIDEO_SUFFIXES:
+            raise HttpError(400, f"対応していない形式です: {path.name}")
+        return path
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="gif_converter.server", description="GIF変換をHTTPで受け付けます"
+    )
+    ap.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help="ポート番号")
+    ap.add_argument("-j", "--jobs", type=int, default=0, help="同時変換数（0で自動）")
+    ap.add_argument(
+        "--allow-dir",
+        action="append",
+        metavar="DIR",
+        help="ローカルのパス指定をこのフォルダの中だけに限る（複数指定可）",
+    )
+    ap.add_argument(
+        "--max-upload",
+        type=float,
+        default=MAX_UPLOAD_BYTES / 1024 / 1024,
+        metavar="MB",
+        help="アップロードできる動画の上限(MB)",
+    )
+    ap.add_argument(
+        "--no-tune",
+        action="store_true",
+        help="スレッド数の調整とデコード側の縮小を行わない（比較用）",
+    )
+    ap.add_argument("-q", "--quiet", action="store_true", help="ログを表示しない")
+    return ap
+
+
+async def serve(args: argparse.Namespace) -> None:
+    def on_log(text: str) -> None:
+        if not args.quiet:
+            print(text, file=sys.stderr, flush=True)
+
+    service = ConversionService(
+        max_workers=args.jobs, tune=not args.no_tune, on_log=on_log
+    )
+    server = ConversionServer(
+        service,
+        allowed_dirs=[Path(d) for d in args.allow_dir or []],
+        max_upload_bytes=int(args.max_upload * 1024 * 1024),
+    )
+    listener = await server.start(args.host, args.port)
+    port = listener.sockets[0].getsockname()[1]
+    print(
+        f"待ち受けています: http://{args.host}:{port}（同時変換数 {service.max_workers}）",
+        file=sys.stderr,
+        flush=True,
+    )
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n終了しました", file=sys.stderr)
+        return 130
+    except OSError as e:
+        print(f"待ち受けを開始できません: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+# source/ 配下のパッケージをインストールせずにテストできるようにする
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "source")
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
+
+from gif_converter.core.converter import ConversionTask  # noqa: E402
+
+
+@pytest.fixture
+def make_task(tmp_path):
+    """
+    ConversionTask を作る（出力先は tmp_path）。name を渡すと tmp_path/<name>.mp4 に
+    data を書いた入力を置く。残りの引数は ConversionTask の値を上書きする
+    """
+
+    def make(
+        name: Optional[str] = None, data: bytes = b"video", **kw
+    ) -> ConversionTask:
+        if name is not None:
+            src = tmp_path / f"{name}.mp4"
+            if not src.exists():
+                src.write_bytes(data)
+            kw.setdefault("input_path", src)
+        fields = dict(
+            input_path=Path("in.mp4"),
+            output_dir=tmp_path,
+            fps=10,
+            width=320,
+            colors=64,
+            start=0.0,
+            duration=0.0,
+        )
+        fields.update(kw)
+        return ConversionTask(**fields)
+
+    return make
@@ -0,0 +1,72 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+from gif_converter.core.batch import BatchScheduler
+from gif_converter.core.cancel import ConversionCancelled
+from gif_converter.core.converter import ConversionTask, Converter
+
+
+def _slow_convert(self: Converter, task: ConversionTask) -> Path:
+    # ffmpeg の代わりに長く眠るプロセスを起動する（キャンセルで殺される）
+    out = task.output_dir / (task.input_path.stem + ".gif")
+    out.write_bytes(b"GIF89a partial")
+    try:
+        self.cancel_token.run([sys.executable, "-c", "import time; time.sleep(30)"])
+    except ConversionCancelled:
+        out.unlink()
+        raise
+    return out
+
+
+def test_cancel_stops_running_and_skips_pending(tmp_path, monkeypatch, make_task):
+    monkeypatch.setattr(Converter, "convert", _slow_convert)
+    tasks = [make_task(f"v{i}", data=b"") for i in range(4)]
+    done = []
+    scheduler = BatchScheduler(max_workers=2, on_done=lambda *a: done.append(a))
+    threading.Timer(0.5, scheduler.cancel).start()
+    started = time.monotonic()
+    results = scheduler.run(tasks)
+    assert time.monotonic() - started < 10
+    assert len(results) == 4
+    assert all(r.cancelled and not r.ok for r in results)
+    # 実行中だった2件だけが完了通知を出す
+    assert len(done) == 2
+    assert not list(tmp_path.glob("*.gif"))
+
+
+def test_cancel_task_frees_the_slot(monkeypatch, make_task):
+    monkeypatch.setattr(Converter, "convert", _slow_convert)
+    slow = make_task("slow", data=b"")
+    fast = make_task("fast", data=b"")
+    fast_done = threading.Event()
+
+    def convert(self, task):
+        # スケジューラは調整済みのコピー（tune_task）を渡すので入力パスで見分ける
+        if task.input_path == fast.input_path:
+            fast_done.set()
+            return task.output_dir / "fast.gif"
+        return _slow_convert(self, task)
+
+    monkeypatch.setattr(Converter, "convert", convert)
+    scheduler = BatchScheduler(max_workers=1)
+    scheduler.plan = lambda tasks: list(tasks)  # 尺の取得を省き、この順で流す
+    threading.Timer(0.5, scheduler.cancel_task, args=(slow,)).start()
+    results = scheduler.run([slow, fast])
+    by_name = {r.task.input_path.stem: r for r in results}
+    assert by_name["slow"].cancelled
+    assert by_name["fast"].ok and fast_done.is_set()
+
+
+def test_report_covers_every_task(monkeypatch, make_task):
+    monkeypatch.setattr(Converter, "convert", _slow_convert)
+    tasks = [make_task(f"v{i}", data=b"") for i in range(3)]
+    scheduler = BatchScheduler(max_workers=1)
+    scheduler.plan = lambda tasks: list(tasks)
+    threading.Timer(0.5, scheduler.cancel).start()
+    scheduler.run(tasks)
+    report = scheduler.report
+    assert report is not None and report.concurrency == 1
+    # 開始前に止めたタスクも「中止」として載る
+    assert sum(1 for t in report.tasks if t.cancelled) >= 2
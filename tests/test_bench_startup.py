@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from bench_startup import (  # noqa: E402
+    LAZY_MODULES,
+    SOURCE_DIR,
+    by_package,
+    over_budget,
+    parse_importtime,
+)
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2100 |       2100 |     PyQt5.QtCore
+import time:      9000 |      11100 |   PyQt5.QtWidgets
+import time:       300 |      11400 | gif_converter.main
+Traceback は無視する
+"""
+
+
+def test_parse_importtime():
+    entries = parse_importtime(IMPORTTIME)
+    assert entries[0] == ("_io", 120, 120)
+    assert entries[-1] == ("gif_converter.main", 300, 11400)
+    assert list(by_package(entries).items()) == [
+        ("PyQt5", 11100),
+        ("gif_converter", 300),
+        ("_io", 120),
+    ]
+
+
+def test_over_budget():
+    budget = {"import": 0.2, "ready": 1.0}
+    assert over_budget({"import": 0.1, "ready": 0.9}, budget) == []
+    (line,) = over_budget({"import": 0.3, "ready": 0.9}, budget)
+    assert line.startswith("import: 300 ms")
+    assert over_budget({"import": 0.3}, budget, scale=2.0) == []
+
+
+def test_main_window_import_defers_conversion_modules():
+    pytest.importorskip("PyQt5.QtWidgets")
+    code = (
+        "import sys, gif_converter.main\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=SOURCE_DIR),
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == ""
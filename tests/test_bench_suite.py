@@ -0,0 +1,40 @@
+import os
+import sys
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from bench_suite import compare  # noqa: E402
+
+BASE = {
+    "desktop/標準/ffmpeg": {
+        "wall": 2.0,
+        "cpu": 4.0,
+        "peak_rss": 100 * 1024 * 1024,
+        "size": 400_000,
+        "duration": 10.0,
+    }
+}
+
+
+def _current(**kw):
+    cur = dict(BASE["desktop/標準/ffmpeg"])
+    cur.update(kw)
+    return {"desktop/標準/ffmpeg": cur}
+
+
+def test_compare_flags_regression_over_threshold():
+    (line,) = compare(_current(wall=2.5), BASE, threshold=0.15)
+    assert line.startswith("desktop/標準/ffmpeg wall")
+
+
+def test_compare_ignores_noise_and_improvements():
+    assert compare(_current(wall=2.2, size=300_000), BASE, threshold=0.15) == []
+    # 割合を超えても最小差未満なら無視する
+    assert compare(_current(size=400_900), BASE, threshold=0.001) == []
+
+
+def test_compare_skips_different_clip_length_and_new_cases():
+    assert compare(_current(wall=9.0, duration=2.0), BASE) == []
+    assert compare({"motion/軽量/numpy": {"wall": 1.0}}, BASE) == []
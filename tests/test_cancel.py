@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from gif_converter.core.cancel import CancelToken, ConversionCancelled
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+def test_cancel_kills_running_process():
+    token = CancelToken()
+    timer = threading.Timer(0.2, token.cancel)
+    timer.start()
+    started = time.monotonic()
+    with pytest.raises(ConversionCancelled):
+        token.run(SLEEP)
+    assert time.monotonic() - started < 10
+
+
+def test_cancelled_token_refuses_new_processes():
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(ConversionCancelled):
+        token.popen(SLEEP)
+
+
+def test_run_returns_completed_process():
+    token = CancelToken()
+    proc = token.run([sys.executable, "-c", "print('ok')"], stdout=subprocess.PIPE)
+    assert proc.returncode == 0
+    assert proc.stdout.strip() == b"ok"
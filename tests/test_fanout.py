@@ -0,0 +1,127 @@
+from dataclasses import replace
+from pathlib import Path
+
+from gif_converter.config import presets
+from gif_converter.core.batch import BatchScheduler
+from gif_converter.core.converter import Converter
+from gif_converter.core.fanout import (
+    _encode,
+    build_fanout_cmd,
+    build_fanout_palettegen_cmd,
+    build_fanout_paletteuse_cmd,
+    group_tasks,
+)
+
+
+def _variants(make_task, tmp_path: Path, name: str = "rec", **kw):
+    """同じ入力・範囲を各プリセットで変換するタスク"""
+    return [
+        make_task(
+            name,
+            fps=p["fps"],
+            width=p["width"],
+            colors=p["colors"],
+            start=1.0,
+            duration=2.0,
+            output_path=tmp_path / f"{name}_{label}.gif",
+            **kw,
+        )
+        for label, p in presets.items()
+    ]
+
+
+def _graph(cmd):
+    return cmd[cmd.index("-filter_complex") + 1]
+
+
+def test_group_tasks_shares_only_same_input_and_range(tmp_path, make_task):
+    a = _variants(make_task, tmp_path, "a")
+    b = _variants(make_task, tmp_path, "b")
+    other_range = replace(a[0], start=5.0)
+    sized = replace(a[1], target_bytes=1024)
+    groups = group_tasks([a[0], b[0], a[1], other_range, sized, b[1], a[2]])
+    assert groups == [[a[0], a[1], a[2]], [b[0], b[1]], [other_range], [sized]]
+    # 分割並列のタスクはまとめず、区間ごとの並列変換に任せる
+    split = [replace(t, segments=4) for t in b]
+    assert group_tasks(split) == [[t] for t in split]
+
+
+def test_single_pass_failure_falls_back_to_two_pass(tmp_path, monkeypatch, make_task):
+    tasks = _variants(make_task, tmp_path, use_palette_cache=False)
+    outs = [t.output_path for t in tasks]
+    runs = []
+
+    def fake_run(self, cmd, task, total_duration, span=(0.0, 100.0)):
+        graph = _graph(cmd)
+        runs.append(graph)
+        if "paletteuse" in graph and "palettegen" in graph:
+            raise RuntimeError("ffmpeg が失敗しました")
+        if "palettegen" in graph:
+            for i in range(len(tasks)):
+                Path(cmd[cmd.index(f"[p{i}]") + 1]).write_bytes(b"PNG")
+
+    monkeypatch.setattr(Converter, "_run_with_progress", fake_run)
+    _encode(Converter(), tasks, outs, 2.0)
+    # 1パス → パレット生成 → パレット適用
+    assert len(runs) == 3 and "paletteuse" not in runs[1]
+
+
+def test_single_decode_splits_into_branches(tmp_path, make_task):
+    tasks = _variants(make_task, tmp_path)
+    outs = [t.output_path for t in tasks]
+    cmd = build_fanout_cmd(tasks, outs)
+    assert cmd.count("-i") == 1
+    graph = _graph(cmd)
+    assert graph.startswith("[0:v]split=3[s0][s1][s2];")
+    for i, t in enumerate(tasks):
+        assert f"fps={t.fps},scale={t.width}:-1" in graph
+        assert f"palettegen=max_colors={t.colors}" in graph
+        assert cmd[cmd.index(f"[o{i}]") + 3] == str(outs[i])
+
+
+def test_palette_outputs_for_cache(tmp_path, make_task):
+    tasks = _variants(make_task, tmp_path)
+    palettes = [tmp_path / f"p{i}.png" for i in range(3)]
+    cmd = build_fanout_cmd(tasks, [t.output_path for t in tasks], palettes)
+    for i, palette in enumerate(palettes):
+        assert f",split[p{i}][q{i}]" in _graph(cmd)
+        assert cmd[cmd.index(f"[q{i}]") + 5] == str(palette)
+
+
+def test_two_pass_decodes_twice(tmp_path, make_task):
+    tasks = _variants(make_task, tmp_path, decimate=True)
+    palettes = [tmp_path / f"p{i}.png" for i in range(3)]
+    gen = build_fanout_palettegen_cmd(tasks, palettes)
+    assert gen.count("-i") == 1 and gen[-1] == str(palettes[-1])
+    use = build_fanout_paletteuse_cmd(tasks, palettes, [t.output_path for t in tasks])
+    # 入力は動画1本とパレット3枚、パレットは枝ごとに対応する入力番号で参照する
+    assert use.count("-i") == 4
+    graph = _graph(use)
+    assert "[v2][3:v]paletteuse" in graph and graph.count("mpdecimate") == 3
+
+
+def test_scheduler_converts_group_in_one_call(tmp_path, monkeypatch, make_task):
+    calls = []
+
+    def fake_many(self, tasks):
+        calls.append(len(tasks))
+        outs = [t.output_path for t in tasks]
+        for out in outs:
+            out.write_bytes(b"GIF89a")
+        return outs
+
+    def fake_one(self, task):
+        calls.append(1)
+        task.output_path.write_bytes(b"GIF89a")
+        return task.output_path
+
+    monkeypatch.setattr(Converter, "convert_many", fake_many)
+    monkeypatch.setattr(Converter, "convert", fake_one)
+    a = _variants(make_task, tmp_path, "a")
+    tasks = a + _variants(make_task, tmp_path, "b")[:1]
+    done = []
+    results = BatchScheduler(
+        max_workers=2, tune=False, on_done=lambda f, ok, out, err: done.append(out)
+    ).run(tasks)
+    assert sorted(calls) == [1, 3]
+    assert all(r.ok for r in results) and len(done) == 4
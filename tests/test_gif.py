@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from gif_converter.core.gif import (  # noqa: E402
+    GifFrame,
+    decode_indices,
+    frame_delays,
+    is_empty_frame,
+    join_gifs,
+    merge_empty_frames,
+    parse_gif,
+    read_gif,
+)
+
+
+def write_gif(path: Path, colors, delay: int = 10, size=(8, 6)) -> Path:
+    frames = [Image.new("RGB", size, c).quantize(colors=4) for c in colors]
+    frames[0].save(
+        path,
+        save_all=True,
+        append_images=frames[1:],
+        duration=delay * 10,
+        loop=0,
+        optimize=False,
+        disposal=1,
+    )
+    return path
+
+
+def decoded_colors(path: Path):
+    out = []
+    with Image.open(path) as im:
+        for i in range(im.n_frames):
+            im.seek(i)
+            out.append(im.convert("RGB").getpixel((0, 0)))
+    return out
+
+
+def test_join_keeps_frames_and_applies_last_delays(tmp_path):
+    a = write_gif(tmp_path / "a.gif", [(255, 0, 0), (0, 255, 0)])
+    b = write_gif(tmp_path / "b.gif", [(0, 0, 255)])
+    out = tmp_path / "joined.gif"
+    count = join_gifs([a, b], out, last_delays=[7, None])
+    assert count == 3
+    assert frame_delays(out) == [10, 7, 10]
+
+
+def test_join_with_different_global_palettes(tmp_path):
+    red_green = [(255, 0, 0), (0, 255, 0)]
+    blue_white = [(0, 0, 255), (255, 255, 255)]
+    a = write_gif(tmp_path / "a.gif", red_green)
+    b = write_gif(tmp_path / "b.gif", blue_white)
+    assert read_gif(a).global_palette != read_gif(b).global_palette
+    out = tmp_path / "joined.gif"
+    join_gifs([a, b], out)
+    # 2本目はローカルパレットとして埋め込まれ、色が保たれる
+    assert decoded_colors(out) == red_green + blue_white
+    second = read_gif(out).frames[2]
+    assert second.image[9] & 0x80
+
+
+def test_join_rejects_mismatched_screen_size(tmp_path):
+    a = write_gif(tmp_path / "a.gif", [(255, 0, 0)], size=(8, 6))
+    b = write_gif(tmp_path / "b.gif", [(255, 0, 0)], size=(4, 4))
+    with pytest.raises(ValueError):
+        join_gifs([a, b], tmp_path / "out.gif")
+
+
+# ffmpeg が前フレームと同一のときに出力する 1x1 全透過フレーム（実出力から抜粋）
+EMPTY_GCE = bytes.fromhex("21f904050a00ff00")
+EMPTY_IMAGE = bytes.fromhex("2c3f01ef000100010000080400ff050400")
+
+
+def test_empty_frame_detection():
+    assert decode_indices(EMPTY_IMAGE) == bytes([0xFF])
+    assert is_empty_frame(GifFrame(EMPTY_GCE, EMPTY_IMAGE))
+    # 透過指定が無ければ「何も描かない」とは言えない
+    opaque = EMPTY_GCE[:3] + bytes([0x04]) + EMPTY_GCE[4:]
+    assert not is_empty_frame(GifFrame(opaque, EMPTY_IMAGE))
+
+
+def test_merge_empty_frames_adds_delay_to_previous(tmp_path):
+    src = read_gif(write_gif(tmp_path / "a.gif", [(255, 0, 0), (0, 255, 0)]))
+    first, last = src.frames
+    empty = GifFrame(EMPTY_GCE, EMPTY_IMAGE)
+    frames = [first, empty, empty, last]
+    merged = merge_empty_frames(frames)
+    assert len(merged) == 2
+    assert [fr.delay for fr in merged] == [first.delay + 20, last.delay]
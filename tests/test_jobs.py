@@ -0,0 +1,182 @@
+import json
+import os
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from gif_converter.core import jobs as jobs_mod
+from gif_converter.core.batch import BatchScheduler
+from gif_converter.core.cancel import ConversionCancelled
+from gif_converter.core.converter import (
+    ConversionTask,
+    Converter,
+    partial_output_path,
+    resolve_output_path,
+)
+from gif_converter.core.jobs import (
+    FAILED,
+    JobQueue,
+    job_id,
+    settings_key,
+    task_from_dict,
+    task_to_dict,
+)
+
+
+@pytest.fixture
+def job_task(make_task, tmp_path):
+    """出力先を tmp_path/out/<name>.gif に固定したタスク"""
+
+    def make(name: str = "rec", **kw) -> ConversionTask:
+        out = tmp_path / "out"
+        return make_task(name, output_dir=out, output_path=out / f"{name}.gif", **kw)
+
+    return make
+
+
+def _fake_output(task: ConversionTask, data: bytes = b"GIF89a") -> Path:
+    out = resolve_output_path(task)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(data)
+    return out
+
+
+def test_task_round_trip(job_task):
+    task = job_task(segments=3, diff_frames=True)
+    assert task_from_dict(json.loads(json.dumps(task_to_dict(task)))) == task
+
+
+def test_settings_key_ignores_tuning_and_paths(tmp_path, job_task):
+    task = job_task()
+    assert settings_key(task) == settings_key(replace(task, threads=4, lowres=1))
+    assert settings_key(task) != settings_key(replace(task, colors=128))
+    assert job_id(task) != job_id(replace(task, output_path=tmp_path / "x.gif"))
+
+
+def test_unfinished_survives_restart(tmp_path, job_task):
+    path = tmp_path / "jobs.jsonl"
+    a, b, c = (job_task(n) for n in "abc")
+    queue = JobQueue(path)
+    queue.add([a, b, c])
+    queue.mark(a, jobs_mod.RUNNING)
+    queue.done(b, _fake_output(b))
+    queue.mark(c, FAILED, "ffmpegエラー")
+    # 書きかけで落ちた行は読み飛ばす
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"op": "state", "id": ')
+    assert JobQueue(path).unfinished() == [a]
+
+
+def test_discard_removes_partial_output(tmp_path, job_task):
+    path = tmp_path / "jobs.jsonl"
+    task = job_task()
+    JobQueue(path).add([task])
+    partial = partial_output_path(resolve_output_path(task))
+    partial.parent.mkdir(parents=True)
+    partial.write_bytes(b"GIF89a partial")
+    JobQueue(path).discard_unfinished()
+    assert not partial.exists()
+    assert JobQueue(path).unfinished() == []
+
+
+def test_up_to_date_tracks_source_settings_and_output(tmp_path, job_task):
+    path = tmp_path / "jobs.jsonl"
+    task = job_task()
+    queue = JobQueue(path)
+    assert not queue.up_to_date(task)
+    out = _fake_output(task)
+    queue.done(task, out)
+    assert JobQueue(path).up_to_date(task)
+    assert not queue.up_to_date(replace(task, fps=12))
+    # 出力を書き換えられたら作り直す
+    os.utime(out, ns=(1, 1))
+    assert not queue.up_to_date(task)
+    queue.done(task, out)
+    assert queue.up_to_date(task)
+    # 入力が更新されたら作り直す
+    os.utime(task.input_path, ns=(2, 2))
+    assert not queue.up_to_date(task)
+
+
+def test_compacts_long_journal(tmp_path, monkeypatch, job_task):
+    monkeypatch.setattr(jobs_mod, "COMPACT_RATIO", 1)
+    path = tmp_path / "jobs.jsonl"
+    task = job_task()
+    queue = JobQueue(path)
+    for _ in range(60):
+        queue.add([task])
+        queue.mark(task, FAILED)
+    queue.add([task])
+    before = len(path.read_text(encoding="utf-8").splitlines())
+    reopened = JobQueue(path)
+    assert len(path.read_text(encoding="utf-8").splitlines()) < before
+    assert reopened.unfinished() == [task]
+
+
+def test_scheduler_skips_up_to_date_and_records(tmp_path, monkeypatch, job_task):
+    converted = []
+
+    def fake_convert(self, task):
+        converted.append(task.input_path.name)
+        return _fake_output(task)
+
+    monkeypatch.setattr(Converter, "convert", fake_convert)
+    monkeypatch.setattr("gif_converter.core.batch._task_duration", lambda t: 1.0)
+    queue = JobQueue(tmp_path / "jobs.jsonl")
+    tasks = [job_task(n) for n in "ab"]
+    BatchScheduler(max_workers=1, tune=False, jobs=queue).run(tasks)
+    assert sorted(converted) == ["a.mp4", "b.mp4"]
+    scheduler = BatchScheduler(max_workers=1, tune=False, jobs=queue)
+    results = scheduler.run(tasks)
+    assert all(r.ok and r.skipped for r in results)
+    assert len(converted) == 2
+    # すべて省略しても今回のレポートを作る
+    report = scheduler.report.to_dict()
+    assert (report["concurrency"], report["ok"], report["skipped"]) == (0, 2, 2)
+    BatchScheduler(
+        max_workers=1, tune=False, jobs=queue, skip_up_to_date=False
+    ).run(tasks[:1])
+    assert len(converted) == 3
+    assert queue.unfinished() == []
+
+
+def test_convert_writes_through_partial_file(tmp_path, monkeypatch, job_task):
+    task = job_task()
+    seen = []
+
+    def fake_checked(self, t):
+        seen.append(t.output_path)
+        assert not resolve_output_path(task).exists()
+        return _fake_output(t)
+
+    monkeypatch.setattr(Converter, "_convert_checked", fake_checked)
+    out = Converter().convert(task)
+    assert out == task.output_path and out.read_bytes() == b"GIF89a"
+    assert seen == [partial_output_path(out)] and not seen[0].exists()
+
+    def failing(self, t):
+        _fake_output(t, b"GIF89a partial")
+        raise RuntimeError("ffmpegエラー")
+
+    monkeypatch.setattr(Converter, "_convert_checked", failing)
+    with pytest.raises(RuntimeError):
+        Converter().convert(replace(task, output_path=tmp_path / "out" / "new.gif"))
+    assert not (tmp_path / "out" / "new.gif").exists()
+
+
+@pytest.mark.parametrize("resume", [True, False])
+def test_cancel_keeps_jobs_only_when_resuming(tmp_path, monkeypatch, resume, job_task):
+    queue = JobQueue(tmp_path / "jobs.jsonl")
+    scheduler = BatchScheduler(max_workers=1, tune=False, jobs=queue)
+
+    def interrupted(self, task):
+        scheduler.cancel(resume=resume)
+        raise ConversionCancelled()
+
+    monkeypatch.setattr(Converter, "convert", interrupted)
+    monkeypatch.setattr("gif_converter.core.batch._task_duration", lambda t: 1.0)
+    tasks = [job_task(n) for n in "ab"]
+    scheduler.run(tasks)
+    left = JobQueue(tmp_path / "jobs.jsonl").unfinished()
+    assert left == (tasks if resume else [])
@@ -0,0 +1,67 @@
+import json
+
+from gif_converter.core import metadata
+from gif_converter.core.metadata import MetadataStore, VideoInfo, probe_many
+
+
+def _videos(tmp_path, names):
+    paths = []
+    for name in names:
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(name.encode())
+        paths.append(path)
+    return paths
+
+
+def _fake_probe(monkeypatch):
+    probed = []
+
+    def run(path):
+        probed.append(path.name)
+        return VideoInfo(duration=1.0, width=320, height=240, fps=10.0)
+
+    monkeypatch.setattr(metadata, "_run_ffprobe", run)
+    return probed
+
+
+def _count_saves(monkeypatch, store):
+    saves = []
+    original = store._save
+
+    def save():
+        saves.append(1)
+        original()
+
+    monkeypatch.setattr(store, "_save", save)
+    return saves
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    probed = _fake_probe(monkeypatch)
+    monkeypatch.setattr(metadata, "STORE_MAX_ENTRIES", 2)
+    a, b, c = _videos(tmp_path, "abc")
+    store = MetadataStore(tmp_path / "probe.json")
+    store.get(a)
+    store.get(b)
+    store.get(a)  # a を使ったので、溢れたときに捨てるのは b
+    store.get(c)
+    assert probed == ["a.mp4", "b.mp4", "c.mp4"]
+    saved = json.loads((tmp_path / "probe.json").read_text(encoding="utf-8"))
+    assert len(saved) == 2
+    reopened = MetadataStore(tmp_path / "probe.json")
+    assert reopened.get(a).ok and reopened.get(c).ok
+    assert probed == ["a.mp4", "b.mp4", "c.mp4"]
+
+
+def test_batch_saves_once(tmp_path, monkeypatch):
+    probed = _fake_probe(monkeypatch)
+    store = MetadataStore(tmp_path / "probe.json")
+    monkeypatch.setattr(metadata, "_store", store)
+    saves = _count_saves(monkeypatch, store)
+    paths = _videos(tmp_path, "abcd")
+    results = probe_many(paths, max_workers=4)
+    assert all(results[p].ok for p in paths) and len(probed) == 4
+    assert len(saves) == 1
+    # すべてキャッシュにあれば書き出さない
+    probe_many(paths)
+    assert len(saves) == 1
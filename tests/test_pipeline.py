@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from gif_converter.core.gif import GifStreamWriter  # noqa: E402
+from gif_converter.core.pipeline import (  # noqa: E402
+    diff_patch,
+    encode_frame,
+    palette_image,
+    patch_image,
+)
+
+PALETTE = np.array([[0, 0, 0], [255, 0, 0], [0, 255, 0]], dtype=np.uint8)
+
+
+def indexed(arr):
+    img = Image.fromarray(np.asarray(arr, dtype=np.uint8), "P")
+    img.putpalette(palette_image(PALETTE).getpalette())
+    return img
+
+
+def test_diff_patch_crops_to_changed_rectangle():
+    prev = np.zeros((6, 8), dtype=np.uint8)
+    cur = prev.copy()
+    cur[2, 3] = 1
+    cur[4, 5] = 2
+    patch, x, y = diff_patch(cur, prev, transparent=3)
+    assert (x, y) == (3, 2)
+    assert patch.shape == (3, 3)
+    # 矩形内で変化していない画素は透過番号
+    assert patch[0, 0] == 1 and patch[2, 2] == 2
+    assert patch[1, 1] == 3
+    assert diff_patch(prev, prev.copy(), transparent=3) is None
+
+
+def test_stream_writer_places_patches_and_composites():
+    prev = np.zeros((6, 8), dtype=np.uint8)
+    cur = prev.copy()
+    cur[1:3, 2:5] = 1
+    buf = io.BytesIO()
+    writer = GifStreamWriter(buf)
+    writer.add_frame(encode_frame(indexed(prev)), 10)
+    patch, x, y = diff_patch(cur, prev, transparent=3)
+    pal = palette_image(PALETTE)
+    writer.add_frame(encode_frame(patch_image(patch, pal), 3), 10, offset=(x, y))
+    assert writer.extend_last(15)
+    writer.close()
+
+    buf.seek(0)
+    with Image.open(buf) as im:
+        assert im.n_frames == 2
+        im.seek(1)
+        assert im.info["duration"] == 250
+        rgb = np.asarray(im.convert("RGB"))
+    expected = PALETTE[cur]
+    assert np.array_equal(rgb, expected)
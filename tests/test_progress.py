@@ -0,0 +1,52 @@
+import io
+
+from gif_converter.core.progress import ProgressParser, RateLimiter, StderrTail
+
+BLOCK = """frame=120
+fps=59.80
+stream_0_0_q=-0.0
+bitrate=N/A
+total_size=1048576
+out_time_us=4000000
+out_time_ms=4000000
+out_time=00:00:04.000000
+dup_frames=0
+drop_frames=0
+speed=1.99x
+progress=continue
+"""
+
+
+def feed_all(parser, text):
+    return [p for p in map(parser.feed, text.splitlines()) if p is not None]
+
+
+def test_parser_emits_one_result_per_block():
+    (p,) = feed_all(ProgressParser(), BLOCK)
+    assert (p.frame, p.total_size, p.out_time_us) == (120, 1048576, 4000000)
+    assert p.fps == 59.8 and p.speed == 1.99 and p.out_time == 4.0
+    assert not p.done
+
+
+def test_parser_handles_na_and_end():
+    text = "frame=0\nfps=0.00\nout_time_us=N/A\nspeed=N/A\nprogress=end\n"
+    (p,) = feed_all(ProgressParser(), text)
+    assert p.done and p.out_time_us == 0 and p.speed == 0.0
+
+
+def test_parser_falls_back_to_out_time_ms():
+    (p,) = feed_all(ProgressParser(), "out_time_ms=2500000\nprogress=continue\n")
+    assert p.out_time == 2.5
+
+
+def test_rate_limiter_throttles_but_force_passes():
+    limiter = RateLimiter(interval=60.0)
+    assert limiter.ready()
+    assert not limiter.ready()
+    assert limiter.ready(force=True)
+
+
+def test_stderr_tail_keeps_last_lines():
+    stream = io.StringIO("".join(f"line {i}\n" for i in range(100)))
+    tail = StderrTail(stream, max_lines=3)
+    assert tail.text() == "line 97\nline 98\nline 99"
@@ -0,0 +1,72 @@
+from math import ceil, gcd
+
+import pytest
+
+from gif_converter.core.converter import (
+    MIN_SEGMENT_SECONDS,
+    gif_pts_cs,
+    plan_segments,
+)
+
+
+def local_delays(frames: int, fps: int):
+    return [gif_pts_cs(i + 1, fps) - gif_pts_cs(i, fps) for i in range(frames)]
+
+
+@pytest.mark.parametrize("fps", [7, 10, 12, 24, 30])
+@pytest.mark.parametrize("count", [2, 3, 4, 8])
+def test_boundaries_fall_on_whole_centiseconds(fps, count, make_task):
+    total = 40.0
+    segments = plan_segments(make_task(fps=fps), total, count)
+    assert len(segments) == count
+    for seg in segments:
+        # 境界フレームの表示時刻が 1/100 秒の整数倍
+        assert (seg.first_frame * 100) % fps == 0
+        assert seg.first_frame % (fps // gcd(fps, 100)) == 0
+
+
+@pytest.mark.parametrize("fps", [7, 12, 30])
+def test_segments_are_contiguous(fps, make_task):
+    total = 25.0
+    task = make_task(fps=fps, start=1.5)
+    segments = plan_segments(task, total, 4)
+    assert segments[0].first_frame == 0
+    for a, b in zip(segments, segments[1:]):
+        assert a.frames > 0
+        assert a.first_frame + a.frames == b.first_frame
+        assert b.task.start == pytest.approx(task.start + b.first_frame / fps)
+        # -t は半フレーム手前で止める
+        assert a.task.duration == pytest.approx((a.frames - 0.5) / fps)
+    # 最終区間は残りすべて
+    assert segments[-1].frames == 0
+    assert segments[-1].task.duration == 0.0
+
+
+def test_last_segment_keeps_explicit_duration(make_task):
+    task = make_task(fps=12, start=2.0, duration=30.0)
+    segments = plan_segments(task, 30.0, 3)
+    last = segments[-1]
+    assert last.task.start + last.task.duration == pytest.approx(32.0)
+
+
+@pytest.mark.parametrize("fps", [7, 12, 30])
+def test_joined_delays_match_single_encode(fps, make_task):
+    # 区間ごとのGIF（先頭からの丸め）を、最後の表示時間だけ差し替えて連結すると
+    # 通しで変換した場合と同じ表示時間の列になる
+    total = 20.0
+    total_frames = int(ceil(total * fps))
+    segments = plan_segments(make_task(fps=fps), total, 3)
+    joined = []
+    for seg in segments:
+        frames = seg.frames or total_frames - seg.first_frame
+        delays = local_delays(frames, fps)
+        if seg.frames:
+            end = seg.first_frame + seg.frames
+            delays[-1] = gif_pts_cs(end, fps) - gif_pts_cs(end - 1, fps)
+        joined.extend(delays)
+    assert joined == local_delays(total_frames, fps)
+
+
+def test_too_short_to_split(make_task):
+    assert plan_segments(make_task(fps=10), MIN_SEGMENT_SECONDS * 1.5, 4) == []
+    assert plan_segments(make_task(fps=10), 60.0, 1) == []
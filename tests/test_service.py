@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from gif_converter.core.converter import Converter
+from gif_converter.core.service import (
+    DONE,
+    RUNNING,
+    ConversionService,
+    ResultCache,
+    ServiceBusy,
+    source_id,
+)
+from gif_converter.server import ConversionServer, HttpError, task_from_params
+
+
+@pytest.fixture
+def fake_convert(monkeypatch):
+    """ffmpeg の代わりに入力の中身を埋め込んだGIFを書く。gate が閉じている間は待つ"""
+    calls = []
+    gate = threading.Event()
+    gate.set()
+
+    def convert(self, task):
+        calls.append(task)
+        self.on_progress(str(task.input_path), 50.0, "frame=5")
+        gate.wait(5)
+        self.cancel_token.check()
+        task.output_path.write_bytes(b"GIF89a" + task.input_path.read_bytes())
+        return task.output_path
+
+    monkeypatch.setattr(Converter, "convert", convert)
+    return calls, gate
+
+
+def _service(tmp_path: Path, **kw) -> ConversionService:
+    return ConversionService(
+        cache=ResultCache(tmp_path / "results"),
+        work_dir=tmp_path / "work",
+        tune=False,
+        **kw,
+    )
+
+
+def _video(tmp_path: Path, name: str = "rec.mp4", data: bytes = b"video") -> Path:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_task_from_params(tmp_path):
+    task = task_from_params({"preset": "軽量", "fps": "8", "two_pass": "1"}, tmp_path)
+    assert (task.fps, task.width, task.single_pass) == (8, 480, False)
+    assert task_from_params({"diff": True, "target_mb": 2}, tmp_path).diff_frames
+    for bad in ({"fps": 0}, {"colors": "many"}, {"preset": "?"}, {"engine": "gpu"}):
+        with pytest.raises(HttpError) as e:
+            task_from_params(bad, tmp_path)
+        assert e.value.status == 400
+
+
+def test_dedupes_in_flight_and_serves_cache(tmp_path, fake_convert):
+    calls, gate = fake_convert
+    src = _video(tmp_path)
+
+    async def scenario():
+        service = _service(tmp_path, max_workers=1)
+        gate.clear()
+        task = task_from_params({"fps": 8}, src)
+        first = service.submit(task, source_id(src))
+        second = service.submit(task, source_id(src))
+        assert second is first and first.requests == 2
+        gate.set()
+        await first.wait()
+        assert first.state == DONE and first.output.read_bytes() == b"GIF89avideo"
+        again = service.submit(task, source_id(src))
+        assert again is not first and again.cached and again.state == DONE
+        other = service.submit(task_from_params({"fps": 9}, src), source_id(src))
+        await other.wait()
+        await service.close()
+
+    asyncio.run(scenario())
+    assert [t.fps for t in calls] == [8, 9]
+
+
+def test_rejects_when_queue_is_full(tmp_path, fake_convert):
+    _, gate = fake_convert
+
+    async def scenario():
+        service = _service(tmp_path, max_workers=1, max_pending=1)
+        gate.clear()
+
+        def submit(name: str):
+            src = _video(tmp_path, f"{name}.mp4", name.encode())
+            return service.submit(task_from_params({}, src), source_id(src))
+
+        jobs = [submit("a")]
+        while jobs[0].state != RUNNING:
+            await asyncio.sleep(0.01)
+        # 実行中の1本とは別に、順番待ちは1本まで
+        jobs.append(submit("b"))
+        with pytest.raises(ServiceBusy):
+            submit("c")
+        service.cancel(jobs[1].id)
+        gate.set()
+        await asyncio.gather(*(job.wait() for job in jobs))
+        assert [job.state for job in jobs] == [DONE, "cancelled"]
+        await service.close()
+
+    asyncio.run(scenario())
+
+
+async def _http(port, method, path, body=b"", content_type="video/mp4"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode("utf-8") + body)
+    data = await reader.read()
+    writer.close()
+    head_bytes, _, payload = data.partition(b"\r\n\r\n")
+    return int(head_bytes.split()[1]), payload
+
+
+def test_http_upload_events_and_result(tmp_path, fake_convert):
+    calls, _ = fake_convert
+
+    async def scenario():
+        service = _service(tmp_path, max_workers=2)
+        listener = await ConversionServer(service).start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            status, body = await _http(port, "POST", "/jobs?fps=8&name=a.mp4", b"clip")
+            assert status in (200, 202)
+            job = json.loads(body)
+            status, events = await _http(port, "GET", job["events"])
+            assert status == 200 and b"event: done" in events
+            status, gif = await _http(port, "GET", job["result"])
+            assert (status, gif) == (200, b"GIF89aclip")
+            # 同じ内容のアップロードはキャッシュから返す
+            status, gif = await _http(port, "POST", "/convert?fps=8", b"clip")
+            assert (status, gif) == (200, b"GIF89aclip")
+            src = _video(tmp_path, "local.mp4", b"local")
+            status, gif = await _http(
+                port,
+                "POST",
+                "/convert",
+                json.dumps({"path": str(src), "fps": 8}).encode(),
+                "application/json",
+            )
+            assert (status, gif) == (200, b"GIF89alocal")
+            status, _ = await _http(port, "POST", "/jobs?fps=0", b"clip")
+            assert status == 400
+            status, _ = await _http(port, "GET", "/jobs/unknown")
+            assert status == 404
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            await service.close()
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    # 使い終わったアップロードは残さない
+    assert list((tmp_path / "work" / "uploads").iterdir()) == []
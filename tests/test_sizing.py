@@ -0,0 +1,55 @@
+from math import log2
+
+import pytest
+
+from gif_converter.core.sizing import (
+    SizeModel,
+    candidate_settings,
+    choose_settings,
+    probe_settings,
+    sample_spans,
+)
+
+
+# 高品質プリセット相当の上限
+UPPER = dict(fps=12, width=800, colors=256)
+
+
+def synthetic(fps, width, colors):
+    # 1秒あたりのバイト数 = 3 * fps^0.8 * 幅^1.9 * log2(色数)^0.7
+    return 3.0 * fps**0.8 * width**1.9 * log2(colors) ** 0.7
+
+
+def test_model_recovers_power_law(make_task):
+    settings = probe_settings(make_task(**UPPER))
+    samples = [(f, w, c, synthetic(f, w, c)) for f, w, c in settings]
+    model = SizeModel.fit(samples)
+    for f, w, c in [(10, 640, 128), (6, 320, 32)]:
+        assert model.bytes_per_second(f, w, c) == pytest.approx(
+            synthetic(f, w, c), rel=1e-3
+        )
+
+
+def test_choose_settings_fits_limit_and_respects_upper_bounds(make_task):
+    task = make_task(**UPPER)
+    samples = [(f, w, c, synthetic(f, w, c)) for f, w, c in probe_settings(task)]
+    model = SizeModel.fit(samples)
+    seconds = 20.0
+    limit = int(model.predict(12, 800, 256, seconds) * 0.3)
+    (fps, width, colors), predicted = choose_settings(model, task, seconds, limit)
+    assert predicted <= limit
+    assert fps <= task.fps and width <= task.width and colors <= task.colors
+
+
+def test_candidates_never_exceed_task_settings(make_task):
+    task = make_task(fps=8, width=480, colors=64)
+    for fps, width, colors in candidate_settings(task):
+        assert fps <= 8 and width <= 480 and colors <= 64
+        assert width % 2 == 0 or width == 480
+
+
+def test_sample_spans():
+    assert sample_spans(2.0, 4.0) == [(2.0, 4.0)]
+    spans = sample_spans(0.0, 30.0, count=3)
+    assert len(spans) == 3
+    assert all(0.0 <= s and s + d <= 30.0 for s, d in spans)
@@ -0,0 +1,93 @@
+import io
+from dataclasses import replace
+
+import pytest
+
+from gif_converter.core.converter import (
+    PIPE_OUTPUT,
+    Converter,
+    build_paletteuse_cmd,
+    build_single_pass_cmd,
+)
+from gif_converter.core.progress import StderrTail
+from gif_converter.core.stream import StreamSink, can_stream
+
+
+def test_pipe_output_args(tmp_path, make_task):
+    task = make_task("rec", duration=2.0)
+    use = build_paletteuse_cmd(task, tmp_path / "p.png", PIPE_OUTPUT)
+    assert use[-5:] == ["-loop", "0", "-f", "gif", "pipe:1"]
+    single = build_single_pass_cmd(task, PIPE_OUTPUT, tmp_path / "p.png")
+    # パレットはファイルへ、GIFだけを標準出力へ
+    i = single.index("pipe:1")
+    assert single[i - 2 : i] == ["-f", "gif"] and single[-1] == str(tmp_path / "p.png")
+
+
+def test_can_stream(make_task):
+    task = make_task("rec", duration=2.0)
+    assert can_stream(task)
+    assert not can_stream(replace(task, decimate=True))
+    assert not can_stream(replace(task, segments=4))
+    assert not can_stream(replace(task, target_bytes=1024))
+    assert can_stream(replace(task, engine="numpy", diff_frames=True))
+
+
+class _Closed(io.BytesIO):
+    def write(self, data):
+        raise BrokenPipeError(32, "Broken pipe")
+
+
+def test_sink_counts_and_reports_closed_reader():
+    buf = io.BytesIO()
+    sink = StreamSink(buf)
+    sink.write(b"GIF89a")
+    sink.write(b"")
+    assert sink.written == 6 and buf.getvalue() == b"GIF89a"
+    closed = StreamSink(_Closed())
+    with pytest.raises(RuntimeError, match="出力先に書き込めません"):
+        closed.write(b"GIF89a")
+    assert closed.failed and closed.written == 0
+
+
+def test_stderr_tail_separates_progress():
+    lines = [
+        "Input #0, mov,mp4 from 'a.mp4':",
+        "frame=10",
+        "stream_0_0_q=-0.0",
+        "out_time_us=1000000",
+        "speed=2.0x",
+        "progress=continue",
+        "Error while filtering",
+        "frame=20",
+        "out_time_us=2000000",
+        "progress=end",
+    ]
+    seen = []
+    tail = StderrTail(io.StringIO("\n".join(lines) + "\n"), on_progress=seen.append)
+    tail.join()
+    assert [(p.out_time, p.done) for p in seen] == [(1.0, False), (2.0, True)]
+    assert tail.text().splitlines() == [lines[0], "Error while filtering"]
+
+
+def test_unstreamable_settings_go_through_temp_file(tmp_path, monkeypatch, make_task):
+    def fake_convert(self, task, out_path, total_duration):
+        assert out_path == task.output_path and out_path.parent != tmp_path
+        out_path.write_bytes(b"GIF89a" + b"x" * 10)
+        return out_path
+
+    monkeypatch.setattr(Converter, "_convert", fake_convert)
+    writes = []
+
+    class Recorder(io.BytesIO):
+        def write(self, data):
+            writes.append(len(data))
+            return super().write(data)
+
+    converter = Converter()
+    written = converter.convert_to_stream(
+        make_task("rec", duration=2.0, decimate=True), Recorder(), chunk_size=4
+    )
+    assert written == 16 and writes == [4, 4, 4, 4]
+    assert converter.last_telemetry.ok
+    assert converter.last_telemetry.output_bytes == 16
+    assert converter.last_telemetry.output_path == "-"
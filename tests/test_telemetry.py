@@ -0,0 +1,78 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from gif_converter.core.telemetry import (
+    REPORT_STAGES,
+    BatchReport,
+    TaskTelemetry,
+    report_rows,
+    wait_with_rusage,
+    write_report,
+)
+
+
+def make_telemetry(**kw):
+    return TaskTelemetry(input_path="in.mp4", output_path="out.gif", ok=True, **kw)
+
+
+def test_stage_accumulates_and_rates():
+    tel = make_telemetry(media_seconds=6.0, frames=60)
+    tel.add_stage("palettegen", 0.5)
+    tel.add_stage("palettegen", 0.25)
+    with tel.stage("join"):
+        pass
+    tel.wall = 2.0
+    assert tel.stages["palettegen"] == 0.75
+    assert "join" in tel.stages
+    assert tel.speed == 3.0 and tel.fps == 30.0
+    assert "計測:" in tel.summary()
+
+
+def test_record_rss_keeps_peak():
+    tel = make_telemetry()
+    tel.record_rss(100)
+    tel.record_rss(None)
+    tel.record_rss(50)
+    assert tel.peak_rss_bytes == 100
+
+
+def test_report_rows_expand_stages():
+    tel = make_telemetry()
+    tel.stages = {"single_pass": 1.5, "custom": 0.5}
+    report = BatchReport("2026-01-01T00:00:00", 2.0, 2, [tel])
+    header, (row,) = report_rows(report)
+    values = dict(zip(header, row))
+    assert values["stage_single_pass"] == 1.5
+    assert values["stage_other"] == 0.5
+    assert len(header) == len(row) == 16 + len(REPORT_STAGES)
+
+
+def test_write_report(tmp_path):
+    ok = make_telemetry(input_bytes=10, output_bytes=4)
+    ng = TaskTelemetry(input_path="b.mp4", error="ffmpegエラー")
+    report = BatchReport("2026-01-01T00:00:00", 2.0, 2, [ok, ng], plan=0.1)
+    json_path, csv_path = write_report(report, tmp_path / "reports")
+    data = json.loads(json_path.read_text(encoding="utf-8"))
+    assert (data["ok"], data["failed"], data["cancelled"]) == (1, 1, 0)
+    assert data["input_bytes"] == 10 and len(data["tasks"]) == 2
+    with csv_path.open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "input_path" and rows[2][-1] == "ffmpegエラー"
+    # 同じ秒に始まった一括変換のレポートは上書きしない
+    again, again_csv = write_report(report, tmp_path / "reports")
+    assert again != json_path and again.stem == json_path.stem + "-2"
+    assert again_csv.stem == again.stem and len(list(json_path.parent.iterdir())) == 4
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="wait4 が無い環境")
+def test_wait_with_rusage_reports_child_peak():
+    code = "b = bytearray(64 * 1024 * 1024); b[::4096] = b'x' * len(b[::4096])"
+    proc = subprocess.Popen([sys.executable, "-c", code + "; raise SystemExit(3)"])
+    rss = wait_with_rusage(proc)
+    assert proc.returncode == 3
+    assert rss is not None and rss >= 64 * 1024 * 1024
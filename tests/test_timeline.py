@@ -0,0 +1,36 @@
+import pytest
+
+from gif_converter.core.timeline import (
+    TimelineIndex,
+    nearest_keyframe,
+    parse_keyframe_csv,
+)
+from gif_converter.core.utils import RgbFrame
+
+
+def test_parse_keyframe_csv_keeps_only_key_packets():
+    text = "0.000000,K__\n0.033333,___\nN/A,K__\n2.000000,K_\n2.033333,__\n"
+    assert parse_keyframe_csv(text) == [0.0, 2.0]
+
+
+def test_parse_keyframe_csv_sorts_and_dedupes():
+    # Bフレームを含むとパケット順と表示順が一致しない
+    assert parse_keyframe_csv("4.0,K_\n2.0,K_\n4.0,K_\n") == [2.0, 4.0]
+
+
+@pytest.mark.parametrize(
+    "t, expected", [(0.0, 0.0), (0.9, 0.0), (1.1, 2.0), (3.0, 2.0), (99.0, 4.0)]
+)
+def test_nearest_keyframe(t, expected):
+    assert nearest_keyframe([0.0, 2.0, 4.0], t) == expected
+
+
+def test_nearest_keyframe_without_index_keeps_time():
+    assert nearest_keyframe([], 1.234) == 1.234
+
+
+def test_timeline_index_thumb_width():
+    strip = RgbFrame(40 * 86, 48, b"")
+    index = TimelineIndex(duration=10.0, keyframes=[0.0, 5.0], strip=strip, count=40)
+    assert index.thumb_width == 86
+    assert index.snap(4.0) == 5.0
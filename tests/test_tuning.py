@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from gif_converter.core.converter import (
+    PRESCALE_FILTER,
+    build_single_pass_cmd,
+    palette_cache_key,
+    plan_segments,
+)
+from gif_converter.core.timeline import build_strip_cmd, keyframes_cover
+from gif_converter.core.tuning import lowres_level, needs_prescale, threads_for
+
+
+def test_threads_split_cores_between_tasks(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    assert threads_for(1) == 8
+    assert threads_for(2) == 4
+    assert threads_for(16) == 1
+
+
+def test_lowres_only_for_supported_codecs_and_never_below_target():
+    assert lowres_level("h264", 1920, 480) == 0
+    assert lowres_level("mjpeg", 1920, 480) == 2  # 1920 → 480
+    assert lowres_level("mjpeg", 1920, 640) == 1  # 960 ≥ 640 > 480
+    assert lowres_level("mpeg4", 1920, 1280) == 0
+    assert lowres_level("mjpeg", 7680, 100) == 3  # 上限
+
+
+def test_prescale_only_for_large_downscale():
+    assert needs_prescale(3840, 800)
+    assert not needs_prescale(1920, 640)
+
+
+def test_tuned_task_arguments(make_task):
+    task = make_task(threads=2, lowres=1, prescale=True)
+    cmd = build_single_pass_cmd(task, Path("out.gif"))
+    assert cmd[2:6] == ["-filter_threads", "2", "-filter_complex_threads", "2"]
+    assert cmd.index("-lowres") < cmd.index("-i")
+    assert cmd.index("-threads") < cmd.index("-i")
+    assert PRESCALE_FILTER in cmd[cmd.index("-filter_complex") + 1]
+    # 既定では何も足さない
+    plain = build_single_pass_cmd(make_task(), Path("out.gif"))
+    assert "-threads" not in plain and "-lowres" not in plain
+    assert PRESCALE_FILTER not in " ".join(plain)
+
+
+def test_palette_key_changes_with_decoder_downscale(make_task):
+    a = palette_cache_key(make_task("in"))
+    assert a == palette_cache_key(make_task("in", threads=4))
+    assert a != palette_cache_key(make_task("in", lowres=1))
+
+
+def test_segments_share_threads(make_task):
+    segments = plan_segments(make_task(threads=8), 20.0, 4)
+    assert [s.task.threads for s in segments] == [2, 2, 2, 2]
+
+
+def test_keyframes_cover():
+    assert keyframes_cover([0.0, 2.0, 4.0, 6.0, 8.0], 10.0, 5)
+    assert not keyframes_cover([0.0, 5.0], 10.0, 5)
+    assert not keyframes_cover([], 10.0, 5)
+    cmd = build_strip_cmd(Path("a.mp4"), 10.0, 5, 48, keyframes_only=True, lowres=1)
+    assert cmd[cmd.index("-skip_frame") + 1] == "nokey"
+    assert cmd.index("-lowres") < cmd.index("-i")
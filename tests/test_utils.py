@@ -0,0 +1,29 @@
+import pytest
+
+from gif_converter.core.utils import RgbFrame, parse_ppm
+
+
+def test_parse_ppm_splits_header_and_pixels():
+    pixels = bytes(range(2 * 3 * 3))
+    frame = parse_ppm(b"P6\n2 3\n255\n" + pixels)
+    assert frame == RgbFrame(2, 3, pixels)
+
+
+def test_parse_ppm_skips_comments_and_trailing_bytes():
+    pixels = b"\x01\x02\x03"
+    frame = parse_ppm(b"P6 # ffmpeg\n1 1 255\n" + pixels + b"extra")
+    assert (frame.width, frame.height, frame.data) == (1, 1, pixels)
+
+
+@pytest.mark.parametrize(
+    "blob",
+    [
+        b"P5\n1 1\n255\n\x00",  # グレースケール
+        b"P6\n1 1\n65535\n" + b"\x00" * 6,  # 16bit
+        b"P6\n2 2\n255\n\x00\x00\x00",  # データ不足
+        b"P6\n2",  # ヘッダ途中
+    ],
+)
+def test_parse_ppm_rejects_unsupported(blob):
+    with pytest.raises(ValueError):
+        parse_ppm(blob)
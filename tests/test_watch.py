@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gif_converter.core import watch
+from gif_converter.core.cache import file_fingerprint
+from gif_converter.core.converter import ConversionTask, Converter
+from gif_converter.core.watch import (
+    WATCH_MAX_ATTEMPTS,
+    WATCH_MAX_BACKOFF,
+    FolderWatcher,
+    ProcessedStore,
+    StabilityTracker,
+    retry_delay,
+)
+
+
+def _write(path: Path, data: bytes, mtime: int = 1_000_000_000) -> Path:
+    path.write_bytes(data)
+    os.utime(path, ns=(mtime, mtime))
+    return path
+
+
+def test_stability_waits_for_unchanged_size(tmp_path):
+    f = _write(tmp_path / "rec.mp4", b"a")
+    tracker = StabilityTracker(settle=5)
+    assert tracker.update([f], now=0) == []
+    assert tracker.update([f], now=3) == []
+    # 書き込みが続いていれば数え直す
+    _write(f, b"ab", mtime=2_000_000_000)
+    assert tracker.update([f], now=6) == []
+    assert tracker.update([f], now=10) == []
+    assert tracker.update([f], now=11) == [f]
+
+
+def test_stability_ignores_empty_and_forgets_removed(tmp_path):
+    empty = _write(tmp_path / "empty.mp4", b"")
+    tracker = StabilityTracker(settle=1)
+    tracker.update([empty], now=0)
+    assert tracker.update([empty], now=5) == []
+    empty.unlink()
+    assert tracker.update([empty], now=6) == []
+    assert tracker._states == {}
+
+
+def test_store_retries_failures_and_persists(tmp_path):
+    path = tmp_path / "watch.json"
+    store = ProcessedStore(path)
+    assert store.should_process("a")
+    store.record("a", True, "a.gif", "")
+    assert not store.should_process("a")
+    now = 1000.0
+    for attempt in range(1, WATCH_MAX_ATTEMPTS + 1):
+        assert store.should_process("b", now=now)
+        assert store.record("b", False, "", "ffmpegエラー", now=now) == attempt
+        # 失敗の直後は試さず、失敗するたびに間隔を延ばす
+        assert not store.should_process("b", now=now + 1)
+        now += retry_delay(attempt)
+    assert retry_delay(2) == 2 * retry_delay(1)
+    assert not store.should_process("b", now=now + 3600)
+    reloaded = ProcessedStore(path)
+    assert not reloaded.should_process("a") and not reloaded.should_process("b")
+    assert reloaded.should_process("c")
+
+
+def _watcher(tmp_path, make_task, load, **kw):
+    started = []
+
+    def watch_task(path: Path) -> ConversionTask:
+        started.append(path.name)
+        return make_task(input_path=path, width=64, colors=16)
+
+    w = FolderWatcher(
+        [tmp_path],
+        watch_task,
+        store=ProcessedStore(tmp_path / "watch.json"),
+        poll=1,
+        settle=0,
+        load=load,
+        **kw,
+    )
+    return w, started
+
+
+def test_poll_once_backs_off_under_load(tmp_path, monkeypatch, make_task):
+    monkeypatch.setattr(watch, "tune_task", lambda task, concurrency=1: task)
+    monkeypatch.setattr(
+        Converter, "convert", lambda self, task: task.output_dir / "x.gif"
+    )
+    _write(tmp_path / "a.mp4", b"a")
+    _write(tmp_path / "b.mp4", b"b")
+    load = [5.0]
+    w, started = _watcher(tmp_path, make_task, lambda: load[0], max_workers=2)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        w.poll_once(ex)  # 1回目は状態を覚えるだけ
+        waits = [w.poll_once(ex) for _ in range(8)]
+        assert waits[:3] == [1, 2, 4]
+        assert max(waits) == WATCH_MAX_BACKOFF
+        # 上限まで待っても負荷が下がらなければ1本だけ進める
+        assert len(started) == 1
+    load[0] = 0.0
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        assert w.poll_once(ex) == 1
+    assert len(started) == 2
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        w.poll_once(ex)
+    # 変換済みは記録され、もう一度は始めない
+    assert len(started) == 2
+    assert not w.store.should_process(file_fingerprint(tmp_path / "a.mp4"))